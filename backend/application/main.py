@@ -9,7 +9,7 @@ import os
 
 from domain.database import init_db
 from application.routes import upload, status, export, auth, websocket, projects
-from application.websocket import manager
+from application.websocket import manager, progress_bridge, heartbeat_scheduler
 
 # Criar aplicação FastAPI
 app = FastAPI(
@@ -47,9 +47,24 @@ async def startup_event():
     """Inicializar banco de dados ao iniciar"""
     init_db()
     print("✅ Banco de dados inicializado")
+    
+    # Eventos de progresso dos workers -> WebSockets deste processo
+    if os.getenv("PROGRESS_BRIDGE_ENABLED", "true").lower() == "true":
+        progress_bridge.start()
+    
+    # Ping e remoção de conexões meio abertas
+    heartbeat_scheduler.start()
     print("🔌 WebSocket pronto em /ws/project/{project_id}")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Parar a ponte de progresso, o heartbeat e as conexões WebSocket"""
+    await progress_bridge.stop()
+    await heartbeat_scheduler.stop()
+    await manager.shutdown()
+
+
 @app.get("/")
 async def root():
     """Health check"""
@@ -67,5 +82,7 @@ async def health():
     return {
         "status": "healthy",
         "websocket_connections": manager.get_connection_count(),
+        "websocket": manager.stats(),
+        "progress_bridge": progress_bridge.running,
     }
 
@@ -41,7 +41,16 @@ async def get_current_user(
     if not credentials:
         return None
     
-    token = credentials.credentials
+    return user_from_token(db, credentials.credentials)
+
+
+def user_from_token(db: Session, token: str) -> Optional[User]:
+    """
+    Usuário de um access token JWT (também usado pelos WebSockets).
+    
+    Returns:
+        Usuário ou None se o token for inválido
+    """
     payload = AuthService.decode_token(token)
     
     if not payload:
@@ -8,11 +8,14 @@ from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from typing import Optional, List
 from datetime import datetime
+from pathlib import Path
 
 from domain.database import get_db_session
 from domain.models.project import Project, ProjectStatus
 from application.routes.auth import get_current_user, require_user
 from domain.models.user import User
+from domain.services.time_budget import separation_time_limits
+from model.tasks import enqueue_processing
 
 router = APIRouter()
 
@@ -223,6 +226,77 @@ async def delete_project(
     }
 
 
+@router.post("/projects/{project_id}/reprocess")
+async def reprocess_project(
+    project_id: str,
+    user: User = Depends(require_user),
+    db: Session = Depends(get_db_session)
+):
+    """
+    Reprocessa um projeto que falhou.
+    
+    Etapas já concluídas (checkpoints com a versão atual e arquivos
+    presentes) são reaproveitadas: apenas as etapas que falharam rodam de novo.
+    """
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == user.id
+    ).first()
+    
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Projeto não encontrado"
+        )
+    
+    if project.status != ProjectStatus.FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Apenas projetos com falha podem ser reprocessados"
+        )
+    
+    if not Path(project.original_file_path).exists():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Arquivo original não está mais disponível"
+        )
+    
+    # Transição condicional: cliques repetidos enfileiram uma única tentativa
+    claimed = db.query(Project).filter(
+        Project.id == project.id,
+        Project.status == ProjectStatus.FAILED
+    ).update({
+        Project.status: ProjectStatus.PENDING,
+        Project.error_message: None,
+        Project.processing_attempts: Project.processing_attempts + 1,
+    }, synchronize_session=False)
+    db.commit()
+    
+    if not claimed:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Projeto já está sendo reprocessado"
+        )
+    
+    db.refresh(project)
+    task = enqueue_processing(
+        project.id,
+        project.original_file_path,
+        project.plan,
+        time_limits=separation_time_limits(db, project.duration_seconds),
+        attempt=project.processing_attempts,
+    )
+    project.task_id = task.id
+    db.commit()
+    
+    return {
+        "success": True,
+        "project_id": project.id,
+        "status": project.status.value,
+        "message": "Reprocessamento iniciado"
+    }
+
+
 @router.get("/projects/stats/summary")
 async def get_projects_stats(
     user: User = Depends(require_user),
@@ -3,16 +3,74 @@ Status Route - Application Layer
 
 Endpoint para consultar status de processamento.
 """
-from fastapi import APIRouter, HTTPException, Depends
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from domain.database import get_db_session
-from domain.models.project import Project, ProjectStatus
+from domain.models.analysis_job import AnalysisJobStatus
+from domain.models.project import Project, ProjectStatus, SeparationMode
 from domain.models.stem import Stem
-from application.schemas.project import ProjectStatusResponse, StemInfo
+from domain.models.user import User
+from domain.services.lazy_analysis import request_analysis
+from application.schemas.project import ProjectStatusResponse, StemInfo, QueueInfo
+from application.routes.auth import require_user
 from model.worker import celery_app
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def get_task_progress(task_id: Optional[str]) -> Tuple[Optional[int], str]:
+    """
+    Lê o progresso publicado pela tarefa de processamento no result backend.
+    
+    Args:
+        task_id: ID da tarefa Celery do projeto
+        
+    Returns:
+        (progresso em %, mensagem); progresso None se a tarefa ainda não
+        publicou nenhum (ex.: STARTED) ou o backend está indisponível
+    
+    Chamada bloqueante ao Redis (com retries): em rotas async, executar
+    com run_in_threadpool.
+    """
+    default = (None, "Processando áudio...")
+    if not task_id:
+        return default
+    
+    try:
+        meta = celery_app.backend.get_task_meta(task_id)
+    except Exception as e:
+        logger.warning(f"Progresso da tarefa {task_id} indisponível: {e}")
+        return default
+    
+    info = meta.get("result")
+    if meta.get("status") != "PROCESSING" or not isinstance(info, dict):
+        return default
+    
+    progress = info.get("progress")
+    return (int(progress) if progress is not None else None), info.get("status") or default[1]
+
+
+def last_reported_progress(project_id: str) -> Optional[int]:
+    """Último progresso recebido dos workers pela ponte de progresso (ou None)."""
+    from application.websocket.status_cache import status_cache
+    
+    text = status_cache.get(project_id)
+    if text is None:
+        return None
+    event = json.loads(text)
+    if event.get("status") != ProjectStatus.PROCESSING.value:
+        return None
+    return event.get("progress")
 
 
 @router.get("/status/{project_id}", response_model=ProjectStatusResponse)
@@ -26,6 +84,7 @@ async def get_project_status(
     Retorna:
     - Status atual (pending, processing, ready, failed)
     - Progresso (0-100%)
+    - Posição na fila e espera estimada (se aguardando)
     - URLs dos stems (se pronto)
     - Mensagens de erro (se falhou)
     """
@@ -50,14 +109,22 @@ async def get_project_status(
     )
     
     if project.status == ProjectStatus.PENDING:
+        from domain.services.job_queue import queue_position
+        
         response.progress = 0
         response.message = "Aguardando processamento..."
         
+        position = queue_position(db, project)
+        if position:
+            response.queue = QueueInfo(**position)
+            response.message = f"Aguardando processamento ({position['position']}º na fila)..."
+        
     elif project.status == ProjectStatus.PROCESSING:
-        # Tentar obter progresso da tarefa Celery
-        # TODO: Implementar tracking de progresso
-        response.progress = 50
-        response.message = "Processando áudio..."
+        # Progresso real publicado pela tarefa Celery (fora do event loop)
+        progress, response.message = await run_in_threadpool(get_task_progress, project.task_id)
+        if progress is None:
+            progress = last_reported_progress(project.id)
+        response.progress = progress or 0
         
     elif project.status == ProjectStatus.READY:
         response.progress = 100
@@ -81,22 +148,32 @@ async def get_project_status(
     return response
 
 
-@router.get("/chords/{project_id}")
-async def get_project_chords(
-    project_id: str,
-    db: Session = Depends(get_db_session)
-):
+def find_project_file(project_id: str, filename: str) -> Optional[Path]:
     """
-    Retorna os acordes detectados de um projeto.
+    Procura um arquivo de análise no diretório do projeto.
     
+    Args:
+        project_id: ID do projeto
+        filename: Nome do arquivo (ex.: chords.json)
+        
     Returns:
-        Lista de acordes com {time, chord, confidence, duration}
+        Caminho do arquivo ou None se não existir
     """
-    import os
-    import json
-    from pathlib import Path
+    project_dir = Path(os.getenv("STORAGE_PATH", "./storage")) / "stems" / project_id
+    path = project_dir / filename
+    if path.exists():
+        return path
     
-    # Buscar projeto
+    # Tentar em subpastas caso o Demucs tenha criado uma
+    if project_dir.is_dir():
+        for subdir in project_dir.iterdir():
+            if subdir.is_dir() and (subdir / filename).exists():
+                return subdir / filename
+    return None
+
+
+def get_ready_project(db: Session, project_id: str) -> Project:
+    """Busca o projeto e garante que ele está pronto (404/400 caso contrário)."""
     project = db.query(Project).filter(Project.id == project_id).first()
     
     if not project:
@@ -105,26 +182,87 @@ async def get_project_chords(
     if project.status != ProjectStatus.READY:
         raise HTTPException(status_code=400, detail="Projeto ainda não está pronto")
     
-    # Buscar arquivo de acordes
-    storage_path = Path(os.getenv("STORAGE_PATH", "./storage"))
-    chords_path = storage_path / "stems" / project_id / "chords.json"
+    return project
+
+
+def stem_path(db: Session, project: Project, stem_type: str) -> str:
+    """Caminho de um stem do projeto (o áudio original se não houver)."""
+    stem = db.query(Stem).filter(Stem.project_id == project.id, Stem.stem_type == stem_type).first()
+    return stem.file_path if stem else project.original_file_path
+
+
+async def request_lazy_analysis(db: Session, project: Project, stage: str, message: str, key: Optional[str] = None) -> JSONResponse:
+    """
+    Pede uma análise sob demanda e responde com o status do job.
+    
+    Pedidos concorrentes compartilham o mesmo job; enquanto ele roda a
+    resposta é 202 e o cliente consulta a rota de novo. O enfileiramento
+    fala com o broker e roda fora do event loop.
+    
+    Args:
+        db: Sessão do banco de dados
+        project: Projeto pronto
+        stage: Etapa (chords, lyrics, transcription)
+        message: Nome da análise nas mensagens ao usuário
+        key: Chave da lista (vazia) na resposta, compatível com a resposta pronta
+        
+    Returns:
+        202 com {"status": queued|running} ou 200 com {"status": "failed"}
+    """
+    from model.tasks import analyze_chords, transcribe_score, transcribe_lyrics
+    
+    def enqueue() -> str:
+        if stage == "chords":
+            task = analyze_chords.delay(project.id, project.original_file_path)
+        elif stage == "transcription":
+            task = transcribe_score.delay(project.id, stem_path(db, project, "other"))
+        else:
+            task = transcribe_lyrics.delay(project.id, stem_path(db, project, "vocals"))
+        return task.id
+    
+    try:
+        job = await run_in_threadpool(request_analysis, db, project.id, stage, enqueue)
+    except Exception as e:
+        logger.error(f"Falha ao enfileirar análise {stage} do projeto {project.id}: {e}")
+        raise HTTPException(status_code=503, detail="Análise indisponível no momento")
+    
+    content = {"status": job.status.value}
+    if key:
+        content[key] = []
+    
+    if job.status == AnalysisJobStatus.FAILED:
+        # Nova tentativa só depois do intervalo de retry
+        content["message"] = f"{message} falhou"
+        return JSONResponse(content)
+    
+    content["message"] = f"{message} em andamento"
+    return JSONResponse(status_code=202, content=content)
+
+
+@router.get("/chords/{project_id}")
+async def get_project_chords(
+    project_id: str,
+    db: Session = Depends(get_db_session)
+):
+    """
+    Retorna os acordes detectados de um projeto.
+    
+    A detecção roda sob demanda: o primeiro acesso enfileira a análise e
+    responde 202 até ela terminar.
     
-    if not chords_path.exists():
-        # Se não encontrar direto, buscar em subpastas
-        for subdir in (storage_path / "stems" / project_id).iterdir():
-            if subdir.is_dir():
-                alt_path = subdir / "chords.json"
-                if alt_path.exists():
-                    chords_path = alt_path
-                    break
+    Returns:
+        Lista de acordes com {time, chord, confidence, duration}
+    """
+    project = get_ready_project(db, project_id)
     
-    if not chords_path.exists():
-        return {"chords": [], "message": "Acordes não disponíveis para este projeto"}
+    chords_path = find_project_file(project_id, "chords.json")
+    if not chords_path:
+        return await request_lazy_analysis(db, project, "chords", "Detecção de acordes", key="chords")
     
     with open(chords_path, 'r', encoding='utf-8') as f:
         chords = json.load(f)
     
-    return {"chords": chords, "count": len(chords)}
+    return {"chords": chords, "count": len(chords), "status": "ready"}
 
 
 @router.get("/lyrics/{project_id}")
@@ -135,39 +273,111 @@ async def get_project_lyrics(
     """
     Retorna a letra transcrita de um projeto.
     
+    A transcrição roda sob demanda: o primeiro acesso enfileira a análise
+    e responde 202 até ela terminar.
+    
     Returns:
         Lista de frases com {start, end, text}
     """
-    import os
-    import json
-    from pathlib import Path
+    project = get_ready_project(db, project_id)
     
-    # Buscar projeto
-    project = db.query(Project).filter(Project.id == project_id).first()
+    lyrics_path = find_project_file(project_id, "lyrics.json")
+    if not lyrics_path:
+        return await request_lazy_analysis(db, project, "lyrics", "Transcrição da letra", key="lyrics")
     
-    if not project:
-        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    with open(lyrics_path, 'r', encoding='utf-8') as f:
+        lyrics = json.load(f)
     
-    if project.status != ProjectStatus.READY:
-        raise HTTPException(status_code=400, detail="Projeto ainda não está pronto")
+    return {"lyrics": lyrics, "count": len(lyrics), "status": "ready"}
+
+
+@router.get("/score/{project_id}")
+async def get_project_score(
+    project_id: str,
+    db: Session = Depends(get_db_session)
+):
+    """
+    Retorna os links da partitura (MIDI e MusicXML) de um projeto.
     
-    # Buscar arquivo de letras
-    storage_path = Path(os.getenv("STORAGE_PATH", "./storage"))
-    lyrics_path = storage_path / "stems" / project_id / "lyrics.json"
+    A transcrição roda sob demanda: o primeiro acesso enfileira a análise
+    e responde 202 até ela terminar. Não disponível no modo de dois stems.
     
-    if not lyrics_path.exists():
-        # Tentar em subpastas caso o Demucs tenha criado uma
-        for item in (storage_path / "stems" / project_id).iterdir():
-            if item.is_dir():
-                alt_path = item / "lyrics.json"
-                if alt_path.exists():
-                    lyrics_path = alt_path
-                    break
+    Returns:
+        {"midi": url, "score": url} (score ausente se a conversão falhou)
+    """
+    project = get_ready_project(db, project_id)
     
-    if not lyrics_path.exists():
-        return {"lyrics": [], "message": "Letra não disponível para este projeto"}
+    if project.separation_mode == SeparationMode.TWO_STEMS:
+        raise HTTPException(status_code=400, detail="Partitura não disponível no modo de dois stems")
     
-    with open(lyrics_path, 'r', encoding='utf-8') as f:
-        lyrics = json.load(f)
+    stems = {
+        stem.stem_type: stem
+        for stem in db.query(Stem).filter(
+            Stem.project_id == project_id,
+            Stem.stem_type.in_(("midi", "score")),
+        ).all()
+        if Path(stem.file_path).exists()
+    }
+    if "midi" not in stems:
+        return await request_lazy_analysis(db, project, "transcription", "Transcrição da partitura")
+    
+    response = {"status": "ready"}
+    for stem_type in stems:
+        response[stem_type] = f"/api/download/{project_id}/{stem_type}"
+    return response
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    user: User = Depends(require_user),
+    db: Session = Depends(get_db_session)
+):
+    """
+    Retorna métricas do cache de análises.
+    
+    Requer autenticação.
+    
+    Returns:
+        Hits, misses, evictions, taxa de acerto e ocupação do cache
+    """
+    from domain.services.analysis_cache import AnalysisCache
+    
+    return AnalysisCache().stats(db)
+
+
+@router.get("/queue")
+async def get_queue_estimates(
+    user: User = Depends(require_user),
+    db: Session = Depends(get_db_session)
+):
+    """
+    Retorna a espera estimada de um novo upload em cada plano.
+    
+    Requer autenticação.
+    
+    Returns:
+        Por plano: projetos aguardando, jobs à frente e espera estimada
+    """
+    from domain.services.job_queue import plan_wait_estimates
+    
+    return plan_wait_estimates(db)
+
+
+@router.get("/metrics/stages")
+async def get_stage_metrics(
+    limit: int = Query(10000, ge=1, le=100000, description="Medições mais recentes consideradas"),
+    user: User = Depends(require_user),
+    db: Session = Depends(get_db_session)
+):
+    """
+    Percentis de tempo e recursos por etapa do processamento.
+    
+    Requer autenticação.
+    
+    Returns:
+        Por etapa: quantidade de medições e p50/p90/p99 de tempo de parede,
+        tempo de CPU, pico de memória e tempo por segundo de áudio
+    """
+    from domain.services.processing_metrics import stage_percentiles
     
-    return {"lyrics": lyrics, "count": len(lyrics)}
+    return stage_percentiles(db, limit=limit)
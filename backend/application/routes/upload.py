@@ -3,39 +3,133 @@ Upload Route - Application Layer
 
 Endpoint para upload de arquivos de áudio.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pathlib import Path
+from typing import Optional
+import hashlib
+import shutil
 import uuid
 import os
 from datetime import datetime, timedelta
 
 from domain.database import get_db_session
-from domain.models.project import Project, ProjectStatus
+from domain.models.project import Project, ProjectStatus, SeparationMode
+from domain.models.user import User
 from domain.validators.audio import AudioValidator
 from business.usage_limiter import UsageLimiter, SubscriptionPlan
-from model.tasks import process_audio
+from domain.services.analysis_cache import AnalysisCache, CACHE_ENABLED
+from domain.services.time_budget import check_admission, separation_time_limits
+from model.tasks import (
+    enqueue_processing, complete_project, report_finished, separation_model_name, ANALYSIS_VERSION,
+)
 from application.schemas.project import UploadResponse
+from application.routes.auth import get_current_user
 
 router = APIRouter()
 
+# Tamanho dos blocos lidos do upload (memória usada por upload em andamento)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+def _write_chunk(f, digest, chunk: bytes):
+    """Grava um bloco e atualiza o hash (executado fora do event loop)."""
+    digest.update(chunk)
+    f.write(chunk)
+
+
+def restore_cached_result(db: Session, cache: AnalysisCache, entry, project: Project, output_dir: Path):
+    """
+    Restaura o resultado em cache de um áudio idêntico e marca o projeto como READY.
+    
+    Análises sob demanda (acordes, letras, partitura) não fazem parte da
+    entrada: são calculadas no primeiro acesso do novo projeto.
+    
+    Args:
+        db: Sessão do banco de dados
+        cache: Cache de análises
+        entry: Entrada encontrada por lookup_source
+        project: Projeto recém-criado
+        output_dir: Diretório de stems do projeto
+    """
+    cached = cache.restore(db, entry, output_dir)
+    complete_project(db, project.id, cached["artifacts"])
+    db.refresh(project)
+    report_finished(project.id)
+
+
+def discard_upload(file_path: Path):
+    """Remove o arquivo recusado junto com o diretório uploads/<project_id>/."""
+    shutil.rmtree(file_path.parent, ignore_errors=True)
+
+
+async def save_upload(
+    file: UploadFile,
+    destination: Path,
+    max_bytes: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Optional[tuple[int, str]]:
+    """
+    Grava o upload em disco em blocos, calculando o SHA-256 no caminho.
+    
+    Só um bloco fica em memória por vez; a escrita roda no threadpool.
+    A gravação é interrompida assim que o tamanho passa de max_bytes.
+    
+    Args:
+        file: Arquivo recebido
+        destination: Caminho de destino
+        max_bytes: Tamanho máximo permitido
+        chunk_size: Tamanho dos blocos de leitura
+    
+    Returns:
+        (tamanho em bytes, hash SHA-256) ou None se o arquivo passou do
+        limite (o arquivo parcial é removido)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    f = await run_in_threadpool(open, destination, "wb")
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                break
+            await run_in_threadpool(_write_chunk, f, digest, chunk)
+    finally:
+        await run_in_threadpool(f.close)
+    
+    if size > max_bytes:
+        await run_in_threadpool(destination.unlink, True)
+        return None
+    return size, digest.hexdigest()
+
 
 @router.post("/upload", response_model=UploadResponse)
 async def upload_audio(
     file: UploadFile = File(...),
+    separation_mode: SeparationMode = Form(SeparationMode.FULL),
+    user: Optional[User] = Depends(get_current_user),
     db: Session = Depends(get_db_session)
 ):
     """
     Upload de arquivo de áudio para processamento.
     
+    - separation_mode: "full" (4 stems) ou "two_stems" (vocals + acompanhamento)
     - Valida formato e tamanho
-    - Salva arquivo temporário
+    - Salva arquivo temporário em blocos (interrompe ao passar do limite do plano)
     - Cria projeto no banco
-    - Enfileira tarefa de processamento
+    - Reaproveita o resultado se o mesmo arquivo já foi processado
+    - Recusa (400) ou adia (503 + Retry-After) jobs que não terminariam no
+      orçamento de tempo com a fila atual
+    - Enfileira tarefa de processamento na fila do plano (PRO tem prioridade),
+      com tempo limite proporcional à duração do áudio
     """
     try:
-        # TODO: Obter plano do usuário (por enquanto, usar Free)
-        user_plan = SubscriptionPlan.FREE
+        # Plano do usuário autenticado (anônimos usam Free)
+        user_plan = SubscriptionPlan.PRO if user and user.is_pro else SubscriptionPlan.FREE
         limiter = UsageLimiter(user_plan)
         
         # Salvar arquivo temporariamente para validação
@@ -47,19 +141,22 @@ async def upload_audio(
         temp_file_path = uploads_dir / project_id / file.filename
         temp_file_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Salvar arquivo
-        with open(temp_file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Obter tamanho do arquivo
-        file_size_bytes = temp_file_path.stat().st_size
+        # Salvar arquivo em blocos, abortando assim que passar do limite do plano
+        max_file_size_mb = limiter.get_max_file_size_mb()
+        saved = await save_upload(file, temp_file_path, max_file_size_mb * 1024 * 1024)
+        if saved is None:
+            discard_upload(temp_file_path)
+            raise HTTPException(
+                status_code=400,
+                detail=f"Arquivo muito grande. Limite: {max_file_size_mb}MB"
+            )
+        file_size_bytes, source_hash = saved
         file_size_mb = file_size_bytes / (1024 * 1024)
         
         # Validar formato
         is_valid, error_msg = AudioValidator.validate_format(temp_file_path)
         if not is_valid:
-            temp_file_path.unlink()  # Deletar arquivo inválido
+            discard_upload(temp_file_path)  # Deletar arquivo inválido
             raise HTTPException(status_code=400, detail=error_msg)
         
         # Obter metadados
@@ -70,7 +167,7 @@ async def upload_audio(
         # Validar tamanho
         can_upload, error_msg = limiter.can_upload(file_size_mb, duration_minutes)
         if not can_upload:
-            temp_file_path.unlink()
+            discard_upload(temp_file_path)
             raise HTTPException(status_code=400, detail=error_msg)
         
         # TODO: Verificar cota diária
@@ -83,19 +180,64 @@ async def upload_audio(
         
         project = Project(
             id=project_id,
+            user_id=user.id if user else None,
             original_filename=file.filename,
             original_file_path=str(temp_file_path),
             file_size_mb=int(file_size_mb),
             duration_seconds=int(duration_seconds),
             status=ProjectStatus.PENDING,
+            separation_mode=separation_mode,
+            plan=user_plan.value,
             expires_at=expires_at,
         )
         
         db.add(project)
         db.commit()
         
+        # Mesmo arquivo já processado: restaurar stems sem enfileirar
+        if CACHE_ENABLED:
+            try:
+                cache = AnalysisCache()
+                entry = cache.lookup_source(
+                    db, source_hash, separation_model_name(separation_mode.value), ANALYSIS_VERSION
+                )
+                if entry:
+                    # Cópia dos stems e publicação do READY fora do event loop
+                    await run_in_threadpool(
+                        restore_cached_result, db, cache, entry, project, storage_path / "stems" / project_id
+                    )
+                    
+                    return UploadResponse(
+                        project_id=project_id,
+                        status=ProjectStatus.READY,
+                        message="Upload realizado com sucesso. Resultado reaproveitado de processamento anterior."
+                    )
+            except Exception:
+                db.rollback()
+        
+        # Controle de admissão: não enfileirar jobs que não terminariam no orçamento
+        admission = check_admission(db, duration_seconds, user_plan.value)
+        if admission["decision"] != "accept":
+            db.delete(project)
+            db.commit()
+            discard_upload(temp_file_path)
+            if admission["decision"] == "reject":
+                raise HTTPException(status_code=400, detail=admission["message"])
+            raise HTTPException(
+                status_code=503,
+                detail=admission["message"],
+                headers={"Retry-After": str(admission["retry_after"])},
+            )
+        
         # Enfileirar tarefa de processamento
-        task = process_audio.delay(project_id, str(temp_file_path))
+        task = enqueue_processing(
+            project_id,
+            str(temp_file_path),
+            user_plan.value,
+            time_limits=separation_time_limits(db, duration_seconds),
+        )
+        project.task_id = task.id
+        db.commit()
         
         return UploadResponse(
             project_id=project_id,
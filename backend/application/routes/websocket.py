@@ -3,13 +3,159 @@ WebSocket Routes - Application Layer
 
 Endpoints WebSocket para comunicação em tempo real.
 """
+import os
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 
-from application.websocket import manager
+from domain.database import SessionLocal
+from domain.models.project import Project, ProjectStatus
+from domain.services.progress_events import progress_event
+from application.websocket import manager, status_cache
+from application.websocket.manager import serialize
 
 router = APIRouter()
 
+# Projetos acompanhados por uma conexão de usuário
+MAX_SUBSCRIPTIONS = int(os.getenv("WS_MAX_SUBSCRIPTIONS", "100"))
+
+# Status em que o projeto ainda recebe eventos de progresso
+ACTIVE_STATUSES = (ProjectStatus.PENDING, ProjectStatus.PROCESSING)
+
+# Código de fechamento para conexões sem token válido (Policy Violation)
+UNAUTHORIZED_CLOSE_CODE = 1008
+
+
+def open_session():
+    """
+    Sessão curta do banco (as conexões WebSocket vivem muito mais que uma query).
+    
+    As consultas são bloqueantes: os handlers chamam as funções que usam
+    o banco (e o result backend) com run_in_threadpool, para não travar
+    os demais sockets do processo.
+    """
+    return SessionLocal()
+
+
+def authenticate(token: Optional[str]) -> Optional[str]:
+    """
+    Valida o access token de uma conexão WebSocket.
+    
+    Args:
+        token: Access token JWT (query string ?token=)
+    
+    Returns:
+        ID do usuário ou None se o token for inválido
+    """
+    from application.routes.auth import user_from_token
+    
+    if not token:
+        return None
+    
+    db = open_session()
+    try:
+        user = user_from_token(db, token)
+        return user.id if user and user.is_active else None
+    finally:
+        db.close()
+
+
+def project_status_event(project: Project) -> dict:
+    """Evento project_status montado a partir do banco."""
+    from application.routes.status import get_task_progress
+    
+    status = project.status.value
+    if project.status == ProjectStatus.PROCESSING:
+        progress, message = get_task_progress(project.task_id)
+        return progress_event(project.id, status, progress or 0, message)
+    if project.status == ProjectStatus.READY:
+        return progress_event(project.id, status, 100, "Processamento concluído!")
+    if project.status == ProjectStatus.FAILED:
+        return progress_event(
+            project.id, status, message="Erro no processamento",
+            error=project.error_message or "Erro desconhecido no processamento",
+        )
+    return progress_event(project.id, status, 0, "Aguardando processamento...")
+
+
+def load_status(project_id: str) -> Optional[str]:
+    """
+    Status de um projeto lido do banco (e do result backend, se em processamento).
+    
+    Args:
+        project_id: ID do projeto
+    
+    Returns:
+        Evento project_status serializado ou None se o projeto não existe
+    """
+    db = open_session()
+    try:
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if not project:
+            return None
+        return serialize(project_status_event(project))
+    finally:
+        db.close()
+
+
+def active_projects(user_id: str) -> List[str]:
+    """Projetos em andamento do usuário (mais recentes primeiro)."""
+    db = open_session()
+    try:
+        return [
+            project_id for (project_id,) in db.query(Project.id).filter(
+                Project.user_id == user_id,
+                Project.status.in_(ACTIVE_STATUSES),
+            ).order_by(Project.created_at.desc()).limit(MAX_SUBSCRIPTIONS).all()
+        ]
+    finally:
+        db.close()
+
+
+def owns_project(user_id: str, project_id: str) -> bool:
+    """Verifica se o projeto pertence ao usuário."""
+    db = open_session()
+    try:
+        return db.query(Project.id).filter(
+            Project.id == project_id,
+            Project.user_id == user_id,
+        ).first() is not None
+    finally:
+        db.close()
+
+
+async def status_snapshot(project_id: str) -> Optional[str]:
+    """
+    Último status de um projeto: do cache ou, na falta, do banco (e guardado).
+    
+    Args:
+        project_id: ID do projeto
+    
+    Returns:
+        Evento project_status serializado ou None se o projeto não existe
+    """
+    text = status_cache.get(project_id)
+    if text is not None:
+        return text
+    
+    text = await run_in_threadpool(load_status, project_id)
+    if text is not None:
+        status_cache.update(project_id, text)
+    return text
+
+
+async def send_status(websocket: WebSocket, project_id: str):
+    """Envia o último status do projeto para uma conexão."""
+    text = await status_snapshot(project_id)
+    if text is None:
+        manager.send_text(websocket, serialize({
+            "type": "error",
+            "project_id": project_id,
+            "message": "Projeto não encontrado",
+        }))
+        return
+    manager.send_text(websocket, text)
+
 
 @router.websocket("/ws/project/{project_id}")
 async def websocket_project(
@@ -40,7 +186,7 @@ async def websocket_project(
     try:
         while True:
             # Aguardar mensagens do cliente (keep-alive ou comandos)
-            data = await websocket.receive_json()
+            data = await manager.receive_json(websocket)
             
             # Responder a pings
             if data.get("type") == "ping":
@@ -49,14 +195,9 @@ async def websocket_project(
                     "project_id": project_id
                 })
             
-            # Solicitar status atual
+            # Solicitar status atual (do cache de status)
             elif data.get("type") == "get_status":
-                # Aqui poderia buscar status do banco e enviar
-                await manager.send_personal(websocket, {
-                    "type": "status_requested",
-                    "project_id": project_id,
-                    "message": "Status será enviado automaticamente"
-                })
+                await send_status(websocket, project_id)
     
     except WebSocketDisconnect:
         manager.disconnect(websocket, project_id)
@@ -64,21 +205,126 @@ async def websocket_project(
         manager.disconnect(websocket, project_id)
 
 
+@router.websocket("/ws/user")
+async def websocket_user(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None)
+):
+    """
+    WebSocket único por usuário, multiplexando todos os seus projetos.
+    
+    Autenticado pelo access token (?token=). Ao conectar, a conexão já
+    fica inscrita nos projetos em andamento do usuário.
+    
+    Mensagens do cliente:
+    - {"type": "subscribe", "project_id"}: acompanhar um projeto
+    - {"type": "unsubscribe", "project_id"}: parar de acompanhar
+    - {"type": "get_status", "project_id"}: último status (do cache)
+    - {"type": "ping"}
+    
+    Eventos enviados:
+    - connected: Conexão aceita, com os projetos inscritos
+    - subscribed / unsubscribed: Confirmação das inscrições
+    - project_status: Atualização de status de um projeto inscrito
+    - error: Pedido inválido
+    
+    Exemplo de uso (JavaScript):
+    ```js
+    const ws = new WebSocket(`ws://localhost:8000/ws/user?token=${accessToken}`);
+    ws.onopen = () => ws.send(JSON.stringify({type: 'subscribe', project_id: 'abc123'}));
+    ```
+    """
+    user_id = await run_in_threadpool(authenticate, token)
+    if not user_id:
+        await websocket.close(code=UNAUTHORIZED_CLOSE_CODE)
+        return
+    
+    active = await run_in_threadpool(active_projects, user_id)
+    
+    await manager.connect(websocket)
+    for project_id in active:
+        manager.subscribe(websocket, project_id)
+    await manager.send_personal(websocket, {
+        "type": "connected",
+        "projects": active,
+        "message": "Conectado"
+    })
+    
+    try:
+        while True:
+            data = await manager.receive_json(websocket)
+            message_type = data.get("type")
+            project_id = data.get("project_id")
+            subscribed = manager.connection_projects.get(websocket, set())
+            
+            if message_type == "ping":
+                await manager.send_personal(websocket, {"type": "pong"})
+            
+            elif message_type == "subscribe" and project_id:
+                if project_id not in subscribed:
+                    if len(subscribed) >= MAX_SUBSCRIPTIONS:
+                        await manager.send_personal(websocket, {
+                            "type": "error",
+                            "project_id": project_id,
+                            "message": f"Limite de {MAX_SUBSCRIPTIONS} projetos por conexão"
+                        })
+                        continue
+                    
+                    if not await run_in_threadpool(owns_project, user_id, project_id):
+                        await manager.send_personal(websocket, {
+                            "type": "error",
+                            "project_id": project_id,
+                            "message": "Projeto não encontrado"
+                        })
+                        continue
+                    manager.subscribe(websocket, project_id)
+                
+                await manager.send_personal(websocket, {"type": "subscribed", "project_id": project_id})
+                await send_status(websocket, project_id)
+            
+            elif message_type == "unsubscribe" and project_id:
+                manager.unsubscribe(websocket, project_id)
+                await manager.send_personal(websocket, {"type": "unsubscribed", "project_id": project_id})
+            
+            elif message_type == "get_status" and project_id:
+                # Só projetos inscritos (a inscrição já verificou o dono)
+                if project_id in subscribed:
+                    await send_status(websocket, project_id)
+                else:
+                    await manager.send_personal(websocket, {
+                        "type": "error",
+                        "project_id": project_id,
+                        "message": "Projeto não inscrito nesta conexão"
+                    })
+    
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)
+    except Exception:
+        manager.disconnect(websocket)
+
+
 @router.websocket("/ws/global")
-async def websocket_global(websocket: WebSocket):
+async def websocket_global(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None)
+):
     """
-    WebSocket global para notificações do sistema.
+    WebSocket global para notificações do sistema (autenticado por ?token=).
     
     Recebe broadcasts de:
     - Novos projetos
     - Atualizações de sistema
     - Métricas de uso
     """
+    if not await run_in_threadpool(authenticate, token):
+        await websocket.close(code=UNAUTHORIZED_CLOSE_CODE)
+        return
+    
     await manager.connect(websocket)
     
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await manager.receive_json(websocket)
             
             if data.get("type") == "ping":
                 await manager.send_personal(websocket, {"type": "pong"})
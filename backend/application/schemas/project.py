@@ -40,6 +40,14 @@ class StemInfo(BaseModel):
     size_mb: Optional[float] = None
 
 
+class QueueInfo(BaseModel):
+    """Posição de um projeto na fila de separação"""
+    plan: str = Field(..., description="Plano do usuário (define a fila)")
+    position: int = Field(..., ge=1, description="Posição na fila (1 = próximo a ser processado)")
+    jobs_ahead: int = Field(..., ge=0)
+    estimated_wait_seconds: float = Field(..., ge=0, description="Espera estimada até o início do processamento")
+
+
 class ProjectStatusResponse(BaseModel):
     """Resposta do endpoint de status"""
     project_id: str
@@ -48,6 +56,7 @@ class ProjectStatusResponse(BaseModel):
     message: Optional[str] = None
     error: Optional[str] = None
     stems: Optional[List[StemInfo]] = None
+    queue: Optional[QueueInfo] = None
     created_at: datetime
     
     class Config:
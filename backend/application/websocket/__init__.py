@@ -1,2 +1,5 @@
 # WebSocket Module
 from .manager import manager, ConnectionManager
+from .bridge import progress_bridge, ProgressBridge
+from .status_cache import status_cache, ProjectStatusCache
+from .heartbeat import heartbeat_scheduler, HeartbeatScheduler
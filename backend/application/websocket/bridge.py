@@ -0,0 +1,152 @@
+"""
+Progress Bridge - Application Layer
+
+Ponte entre os eventos de progresso publicados pelos workers (Redis
+pub/sub) e as conexões WebSocket deste processo da API.
+
+Cada processo uvicorn roda a sua ponte em uma tarefa de fundo: assina o
+canal de progresso e entrega cada evento ao ConnectionManager local.
+Funciona com vários workers uvicorn, já que todos recebem todos os
+eventos e cada um só tem os seus sockets.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+from domain.services.progress_events import PROGRESS_CHANNEL
+from .coalescer import ProgressCoalescer, MAX_PER_SECOND, TERMINAL_STATUSES
+from .manager import manager
+from .status_cache import status_cache as process_status_cache
+
+logger = logging.getLogger(__name__)
+
+# Espera antes de reconectar ao Redis após uma falha
+RECONNECT_DELAY_SECONDS = float(os.getenv("PROGRESS_BRIDGE_RECONNECT_SECONDS", "2"))
+
+
+def default_redis_factory():
+    """Cliente Redis assíncrono da ponte."""
+    import redis.asyncio as redis
+
+    return redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+
+
+class ProgressBridge:
+    """
+    Assina o canal de progresso e repassa os eventos aos WebSockets locais.
+    """
+
+    def __init__(
+        self,
+        manager,
+        redis_factory: Optional[Callable] = None,
+        channel: str = PROGRESS_CHANNEL,
+        reconnect_delay: float = RECONNECT_DELAY_SECONDS,
+        max_per_second: float = MAX_PER_SECOND,
+        status_cache=None,
+    ):
+        """
+        Args:
+            manager: ConnectionManager deste processo
+            redis_factory: Cria o cliente Redis assíncrono
+            channel: Canal de eventos de progresso
+            reconnect_delay: Espera (s) antes de reconectar após falha
+            max_per_second: Eventos de progresso por segundo por projeto
+            status_cache: Cache do último status por projeto (get_status)
+        """
+        self.manager = manager
+        self.redis_factory = redis_factory or default_redis_factory
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.events_delivered = 0
+        self.coalescer = ProgressCoalescer(self._send, max_per_second)
+        self.status_cache = status_cache if status_cache is not None else process_status_cache
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Inicia a tarefa de fundo (no event loop atual)."""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancela a tarefa de fundo."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        """Assina o canal, reconectando após falhas do Redis."""
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Ponte de progresso desconectada do Redis: {e}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self):
+        client = self.redis_factory()
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            logger.info(f"Ponte de progresso assinando {self.channel}")
+
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                await self.dispatch(message["data"])
+        finally:
+            await pubsub.close()
+
+    async def dispatch(self, data):
+        """
+        Entrega um evento publicado aos sockets do projeto.
+
+        Args:
+            data: Evento serializado (JSON)
+        """
+        try:
+            text = data.decode() if isinstance(data, bytes) else data
+            event = json.loads(text)
+            project_id = event["project_id"]
+        except (ValueError, TypeError, KeyError):
+            logger.warning(f"Evento de progresso inválido: {data!r}")
+            return
+
+        if event.get("type") == "project_status":
+            self.status_cache.update(project_id, text)
+
+        # Progresso é agrupado por projeto; os demais eventos seguem na hora
+        terminal = event.get("type") != "project_status" or event.get("status") in TERMINAL_STATUSES
+
+        if not self.manager.get_connection_count(project_id):
+            # Sem sockets agora: o progresso pendente não pode sair depois
+            # do evento terminal para quem assinar em seguida
+            if terminal:
+                self.coalescer.discard(project_id)
+            return
+
+        self.coalescer.submit(project_id, text, terminal=terminal)
+
+    def _send(self, project_id: str, text: str) -> int:
+        # O evento já vem serializado pelo worker: repassado sem reserializar
+        delivered = self.manager.send_serialized(project_id, text)
+        if delivered:
+            self.events_delivered += 1
+        return delivered
+
+
+# Ponte do processo (iniciada no startup da API)
+progress_bridge = ProgressBridge(manager)
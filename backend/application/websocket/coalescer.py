@@ -0,0 +1,128 @@
+"""
+Progress Coalescer - Application Layer
+
+Agrupa eventos de progresso por projeto antes do envio aos WebSockets.
+
+Os workers podem publicar progresso por trecho da separação (centenas de
+eventos por segundo em áudios longos). Por projeto, apenas o evento mais
+recente fica pendente e no máximo `max_per_second` eventos são enviados
+por segundo; eventos terminais (ready, failed) são enviados na hora e
+descartam o progresso pendente. O tráfego por socket (e as re-renderizações
+no cliente) fica limitado qualquer que seja o detalhamento do worker.
+"""
+import asyncio
+import os
+from typing import Callable, Dict, Optional
+
+# Eventos de progresso por segundo enviados para cada projeto
+MAX_PER_SECOND = float(os.getenv("WS_PROGRESS_MAX_PER_SECOND", "4"))
+
+# Status que encerram o processamento (sempre enviados na hora)
+TERMINAL_STATUSES = ("ready", "failed")
+
+# Projetos acompanhados antes de descartar os inativos
+PRUNE_THRESHOLD = 1024
+
+
+class _ProjectChannel:
+    """Estado do agrupamento de um projeto."""
+
+    __slots__ = ("last_sent", "pending", "timer")
+
+    def __init__(self):
+        self.last_sent = float("-inf")
+        self.pending: Optional[str] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class ProgressCoalescer:
+    """
+    Limita os eventos de progresso enviados por projeto.
+    """
+
+    def __init__(self, send: Callable[[str, str], int], max_per_second: float = MAX_PER_SECOND):
+        """
+        Args:
+            send: Envia um evento serializado aos sockets de um projeto
+                (project_id, texto) -> número de conexões
+            max_per_second: Eventos de progresso por segundo por projeto
+                (0 desativa o limite)
+        """
+        self.send = send
+        self.interval = 1 / max_per_second if max_per_second > 0 else 0.0
+        self.coalesced = 0
+        self._channels: Dict[str, _ProjectChannel] = {}
+
+    def submit(self, project_id: str, text: str, terminal: bool = False):
+        """
+        Envia o evento agora ou o guarda como o pendente do projeto.
+
+        Args:
+            project_id: ID do projeto
+            text: Evento serializado
+            terminal: Evento final (ready/failed): enviado na hora
+        """
+        if terminal:
+            self.discard(project_id)
+            self.send(project_id, text)
+            return
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        channel = self._channels.get(project_id)
+        if channel is None:
+            if len(self._channels) >= PRUNE_THRESHOLD:
+                self._prune(now)
+            channel = self._channels[project_id] = _ProjectChannel()
+
+        if channel.timer is None and now - channel.last_sent >= self.interval:
+            channel.last_sent = now
+            self.send(project_id, text)
+            return
+
+        # Dentro do intervalo: fica só o mais recente
+        if channel.pending is not None:
+            self.coalesced += 1
+        channel.pending = text
+        if channel.timer is None:
+            channel.timer = loop.call_later(channel.last_sent + self.interval - now, self._flush, project_id)
+
+    def discard(self, project_id: str):
+        """
+        Descarta o evento pendente de um projeto (e o timer do envio).
+
+        Chamado em todo evento terminal, mesmo sem sockets conectados:
+        progresso anterior nunca é enviado depois do ready/failed.
+
+        Args:
+            project_id: ID do projeto
+        """
+        channel = self._channels.pop(project_id, None)
+        if channel and channel.timer:
+            channel.timer.cancel()
+            self.coalesced += channel.pending is not None
+
+    def _flush(self, project_id: str):
+        """Envia o evento pendente de um projeto ao fim do intervalo."""
+        channel = self._channels.get(project_id)
+        if channel is None:
+            return
+
+        channel.timer = None
+        if channel.pending is not None:
+            text, channel.pending = channel.pending, None
+            channel.last_sent = asyncio.get_running_loop().time()
+            self.send(project_id, text)
+
+    def _prune(self, now: float):
+        """Descarta projetos sem evento pendente fora do intervalo."""
+        idle = [
+            project_id for project_id, channel in self._channels.items()
+            if channel.timer is None and now - channel.last_sent >= self.interval
+        ]
+        for project_id in idle:
+            del self._channels[project_id]
+
+    def pending_count(self) -> int:
+        """Projetos com evento aguardando o fim do intervalo."""
+        return sum(1 for channel in self._channels.values() if channel.pending is not None)
@@ -0,0 +1,64 @@
+"""
+Heartbeat Scheduler - Application Layer
+
+Tarefa de fundo que roda o heartbeat do ConnectionManager a cada
+intervalo: pinga conexões sem atividade e remove as meio abertas, para
+que active_connections e project_connections não cresçam com clientes
+que sumiram sem fechar o socket.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from .manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatScheduler:
+    """
+    Executa `manager.heartbeat()` periodicamente.
+    """
+
+    def __init__(self, manager, interval: Optional[float] = None):
+        """
+        Args:
+            manager: ConnectionManager deste processo
+            interval: Segundos entre execuções (padrão: metade do intervalo
+                de heartbeat do manager, para pingar e remover a tempo)
+        """
+        self.manager = manager
+        self.interval = interval or manager.heartbeat_interval / 2
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Inicia a tarefa de fundo (no event loop atual)."""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancela a tarefa de fundo."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.manager.heartbeat()
+            except Exception as e:
+                logger.warning(f"Falha no heartbeat dos WebSockets: {e}")
+
+
+# Heartbeat do processo (iniciado no startup da API)
+heartbeat_scheduler = HeartbeatScheduler(manager)
@@ -2,11 +2,141 @@
 WebSocket Manager - Application Layer
 
 Gerenciador de conexões WebSocket para atualizações em tempo real.
+
+Cada conexão tem uma fila de envio limitada, drenada por uma tarefa
+própria: o fan-out só enfileira (não espera nenhum cliente), então um
+cliente lento não atrasa os demais. Quando a fila de um cliente enche,
+a política de consumidor lento decide entre descartar a mensagem mais
+antiga (drop_oldest) ou desconectar o cliente (disconnect). Cada
+mensagem é serializada uma única vez, qualquer que seja o número de
+destinatários.
+
+Conexões meio abertas (clientes móveis que somem sem fechar o socket)
+são detectadas pelo heartbeat: conexões sem atividade recebem um ping a
+cada `HEARTBEAT_INTERVAL` segundos e são removidas quando passam de
+`IDLE_TIMEOUT` segundos sem responder.
 """
-from typing import Dict, List, Set, Optional
+from typing import Callable, Dict, List, Set, Optional
 from fastapi import WebSocket
 import json
 import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Mensagens pendentes por conexão antes de aplicar a política
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+
+# Política para clientes que não acompanham: drop_oldest ou disconnect
+SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+
+# Código de fechamento para clientes lentos desconectados (Try Again Later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Intervalo do heartbeat e tempo sem atividade até remover a conexão
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))
+IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "75"))
+
+# Código de fechamento para conexões removidas pelo heartbeat (Going Away)
+IDLE_CLOSE_CODE = 1001
+
+
+def serialize(message: dict) -> str:
+    """Serializa uma mensagem (mesmo formato de WebSocket.send_json)."""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class ConnectionSender:
+    """
+    Fila de envio limitada de uma conexão, drenada por uma tarefa própria.
+    """
+    
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_closed: Callable[[WebSocket], None],
+        max_queue: int = SEND_QUEUE_SIZE,
+        policy: str = SLOW_CONSUMER_POLICY,
+    ):
+        """
+        Args:
+            websocket: Conexão WebSocket (já aceita)
+            on_closed: Chamado quando a conexão morre ou é desconectada
+            max_queue: Mensagens pendentes antes de aplicar a política
+            policy: "drop_oldest" ou "disconnect"
+        """
+        self.websocket = websocket
+        self.on_closed = on_closed
+        self.policy = policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.closed = False
+        self.too_slow = False
+        self.last_seen = asyncio.get_running_loop().time()
+        self._close_task: Optional[asyncio.Task] = None
+        self._writer = asyncio.create_task(self._drain())
+    
+    def touch(self):
+        """Registra atividade do cliente (qualquer mensagem recebida)."""
+        self.last_seen = asyncio.get_running_loop().time()
+    
+    def enqueue(self, text: str) -> bool:
+        """
+        Enfileira uma mensagem serializada (não bloqueia).
+        
+        Returns:
+            False se a conexão está fechada ou foi desconectada pela política
+        """
+        if self.closed:
+            return False
+        
+        if self.queue.full():
+            if self.policy == "disconnect":
+                logger.info("WebSocket lento desconectado (fila de envio cheia)")
+                self.too_slow = True
+                self.close(SLOW_CONSUMER_CLOSE_CODE)
+                return False
+            self.queue.get_nowait()
+            self.dropped += 1
+        
+        self.queue.put_nowait(text)
+        return True
+    
+    async def _drain(self):
+        """Envia as mensagens da fila, na ordem, até a conexão fechar."""
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Conexão fechada pelo cliente
+            self.closed = True
+            self.on_closed(self.websocket)
+    
+    def stop(self):
+        """Para a tarefa de envio (conexão já encerrada)."""
+        self.closed = True
+        self._writer.cancel()
+    
+    def close(self, code: int):
+        """Para o envio e fecha a conexão com `code`."""
+        self.stop()
+        self._close_task = asyncio.create_task(self._close_socket(code))
+        self.on_closed(self.websocket)
+    
+    async def wait_closed(self):
+        """Aguarda a tarefa de envio cancelada (e o fechamento do socket)."""
+        tasks = [task for task in (self._writer, self._close_task) if task]
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
 
 
 class ConnectionManager:
@@ -17,13 +147,40 @@ class ConnectionManager:
     - Conexões por projeto (para status de processamento)
     - Broadcast para todos os conectados
     - Mensagens tipadas com JSON
+    - Envio concorrente com fila limitada por conexão
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        max_queue: int = SEND_QUEUE_SIZE,
+        policy: str = SLOW_CONSUMER_POLICY,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        idle_timeout: float = IDLE_TIMEOUT,
+    ):
+        """
+        Args:
+            max_queue: Tamanho da fila de envio de cada conexão
+            policy: Política para consumidores lentos (drop_oldest ou disconnect)
+            heartbeat_interval: Segundos sem atividade até enviar um ping
+            idle_timeout: Segundos sem atividade até remover a conexão
+        """
+        self.max_queue = max_queue
+        self.policy = policy
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
         # Conexões por projeto_id
         self.project_connections: Dict[str, Set[WebSocket]] = {}
         # Todas as conexões ativas
         self.active_connections: Set[WebSocket] = set()
+        # Fila de envio e projetos de cada conexão
+        self.senders: Dict[WebSocket, ConnectionSender] = {}
+        self.connection_projects: Dict[WebSocket, Set[str]] = {}
+        # Clientes lentos desconectados pela política
+        self.slow_disconnects = 0
+        # Conexões removidas pelo heartbeat
+        self.evicted = 0
+        # Encerramento das conexões removidas (aguardado em shutdown)
+        self._closing: Set[asyncio.Task] = set()
     
     async def connect(self, websocket: WebSocket, project_id: Optional[str] = None):
         """
@@ -35,11 +192,13 @@ class ConnectionManager:
         """
         await websocket.accept()
         self.active_connections.add(websocket)
+        self.connection_projects[websocket] = set()
+        self.senders[websocket] = ConnectionSender(
+            websocket, self._connection_closed, self.max_queue, self.policy
+        )
         
         if project_id:
-            if project_id not in self.project_connections:
-                self.project_connections[project_id] = set()
-            self.project_connections[project_id].add(websocket)
+            self.subscribe(websocket, project_id)
             
             # Enviar confirmação de conexão
             await self.send_personal(websocket, {
@@ -48,22 +207,60 @@ class ConnectionManager:
                 "message": "Conectado ao projeto"
             })
     
+    def subscribe(self, websocket: WebSocket, project_id: str):
+        """Inscreve uma conexão nos eventos de um projeto."""
+        if project_id not in self.project_connections:
+            self.project_connections[project_id] = set()
+        self.project_connections[project_id].add(websocket)
+        self.connection_projects.setdefault(websocket, set()).add(project_id)
+    
+    def unsubscribe(self, websocket: WebSocket, project_id: str):
+        """Cancela a inscrição de uma conexão em um projeto."""
+        if project_id in self.project_connections:
+            self.project_connections[project_id].discard(websocket)
+            
+            # Limpar set vazio
+            if not self.project_connections[project_id]:
+                del self.project_connections[project_id]
+        
+        if websocket in self.connection_projects:
+            self.connection_projects[websocket].discard(project_id)
+    
     def disconnect(self, websocket: WebSocket, project_id: Optional[str] = None):
         """
-        Remove conexão WebSocket.
+        Remove conexão WebSocket (de todos os projetos em que está inscrita).
         
         Args:
             websocket: Conexão WebSocket
-            project_id: ID do projeto (opcional)
+            project_id: ID do projeto (opcional, mantido por compatibilidade)
         """
         self.active_connections.discard(websocket)
         
-        if project_id and project_id in self.project_connections:
-            self.project_connections[project_id].discard(websocket)
-            
-            # Limpar set vazio
-            if not self.project_connections[project_id]:
-                del self.project_connections[project_id]
+        subscribed = self.connection_projects.pop(websocket, set())
+        if project_id:
+            subscribed.add(project_id)
+        for subscribed_id in subscribed:
+            self.unsubscribe(websocket, subscribed_id)
+        
+        sender = self.senders.pop(websocket, None)
+        if sender:
+            sender.stop()
+            closing = asyncio.ensure_future(sender.wait_closed())
+            self._closing.add(closing)
+            closing.add_done_callback(self._closing.discard)
+    
+    async def shutdown(self):
+        """Remove todas as conexões e aguarda as tarefas de envio terminarem."""
+        for websocket in list(self.senders):
+            self.disconnect(websocket)
+        await asyncio.gather(*self._closing, return_exceptions=True)
+    
+    def _connection_closed(self, websocket: WebSocket):
+        """Conexão morta (erro de envio) ou desconectada pela política."""
+        sender = self.senders.get(websocket)
+        if sender and sender.too_slow:
+            self.slow_disconnects += 1
+        self.disconnect(websocket)
     
     async def send_personal(self, websocket: WebSocket, message: dict):
         """
@@ -73,55 +270,143 @@ class ConnectionManager:
             websocket: Conexão WebSocket
             message: Mensagem como dicionário
         """
+        sender = self.senders.get(websocket)
+        if sender:
+            sender.enqueue(serialize(message))
+            return
+        
         try:
             await websocket.send_json(message)
         except Exception:
             # Conexão pode ter sido fechada
             pass
     
-    async def send_to_project(self, project_id: str, message: dict):
+    async def receive_json(self, websocket: WebSocket) -> dict:
+        """
+        Aguarda a próxima mensagem do cliente e registra a atividade.
+        
+        Raises:
+            asyncio.TimeoutError: Cliente sem atividade por `idle_timeout`
+                segundos (conexão meio aberta); a conexão é removida como
+                no heartbeat
+        """
+        try:
+            data = await asyncio.wait_for(websocket.receive_json(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            sender = self.senders.get(websocket)
+            if sender:
+                self._evict(sender)
+            raise
+        sender = self.senders.get(websocket)
+        if sender:
+            sender.touch()
+        return data
+    
+    def heartbeat(self) -> int:
+        """
+        Envia ping às conexões sem atividade recente e remove as que
+        passaram do tempo limite.
+        
+        Returns:
+            Número de conexões removidas
+        """
+        now = asyncio.get_running_loop().time()
+        ping = serialize({"type": "ping"})
+        
+        expired = []
+        for websocket, sender in list(self.senders.items()):
+            idle = now - sender.last_seen
+            if idle >= self.idle_timeout:
+                expired.append(sender)
+            elif idle >= self.heartbeat_interval:
+                sender.enqueue(ping)
+        
+        for sender in expired:
+            self._evict(sender)
+        return len(expired)
+    
+    def _evict(self, sender: ConnectionSender):
+        """Remove uma conexão sem atividade (Going Away)."""
+        idle = asyncio.get_running_loop().time() - sender.last_seen
+        logger.info(f"WebSocket sem atividade há {idle:.0f}s removido")
+        sender.close(IDLE_CLOSE_CODE)
+        self.evicted += 1
+    
+    def stats(self) -> Dict[str, int]:
+        """Medidores das conexões deste processo (para o /health)."""
+        now = asyncio.get_running_loop().time()
+        return {
+            "open": len(self.active_connections),
+            "idle": sum(1 for sender in self.senders.values() if now - sender.last_seen >= self.heartbeat_interval),
+            "evicted": self.evicted,
+            "slow_disconnected": self.slow_disconnects,
+            "dropped_messages": self.dropped_messages(),
+            "projects": len(self.project_connections),
+        }
+    
+    def send_text(self, websocket: WebSocket, text: str) -> bool:
+        """
+        Enfileira uma mensagem já serializada para uma conexão.
+        
+        Args:
+            websocket: Conexão WebSocket
+            text: Mensagem em JSON
+        """
+        sender = self.senders.get(websocket)
+        return bool(sender and sender.enqueue(text))
+    
+    def _enqueue(self, connections, text: str) -> int:
+        """Enfileira `text` para cada conexão; retorna quantas aceitaram."""
+        delivered = 0
+        for websocket in list(connections):
+            sender = self.senders.get(websocket)
+            if sender and sender.enqueue(text):
+                delivered += 1
+        return delivered
+    
+    def send_serialized(self, project_id: str, text: str) -> int:
+        """
+        Enfileira uma mensagem já serializada para os conectados a um projeto.
+        
+        Args:
+            project_id: ID do projeto
+            text: Mensagem em JSON
+            
+        Returns:
+            Número de conexões que receberam a mensagem na fila
+        """
+        return self._enqueue(self.project_connections.get(project_id, ()), text)
+    
+    async def send_to_project(self, project_id: str, message: dict) -> int:
         """
         Envia mensagem para todos os conectados a um projeto.
         
         Args:
             project_id: ID do projeto
             message: Mensagem como dicionário
+            
+        Returns:
+            Número de conexões que receberam a mensagem na fila
         """
         if project_id not in self.project_connections:
-            return
-        
-        # Coletar conexões mortas para remoção
-        dead_connections = []
-        
-        for websocket in self.project_connections[project_id]:
-            try:
-                await websocket.send_json(message)
-            except Exception:
-                dead_connections.append(websocket)
-        
-        # Remover conexões mortas
-        for ws in dead_connections:
-            self.project_connections[project_id].discard(ws)
-            self.active_connections.discard(ws)
+            return 0
+        return self.send_serialized(project_id, serialize(message))
     
-    async def broadcast(self, message: dict):
+    async def broadcast(self, message: dict) -> int:
         """
         Envia mensagem para TODAS as conexões ativas.
         
         Args:
             message: Mensagem como dicionário
+            
+        Returns:
+            Número de conexões que receberam a mensagem na fila
         """
-        dead_connections = []
-        
-        for websocket in self.active_connections:
-            try:
-                await websocket.send_json(message)
-            except Exception:
-                dead_connections.append(websocket)
-        
-        # Remover conexões mortas
-        for ws in dead_connections:
-            self.active_connections.discard(ws)
+        return self._enqueue(self.active_connections, serialize(message))
+    
+    def dropped_messages(self) -> int:
+        """Mensagens descartadas pela política drop_oldest (conexões ativas)."""
+        return sum(sender.dropped for sender in self.senders.values())
     
     async def notify_project_status(
         self,
@@ -0,0 +1,56 @@
+"""
+Status Cache - Application Layer
+
+Último evento de status de cada projeto visto por este processo da API.
+
+A ponte de progresso grava cada evento recebido dos workers; o pedido
+get_status dos WebSockets é respondido daqui, sem consultar o banco nem
+o result backend. Projetos sem evento em cache são lidos do banco uma
+vez e guardados. O cache é limitado (LRU).
+"""
+import os
+from collections import OrderedDict
+from typing import Optional
+
+# Projetos mantidos no cache
+STATUS_CACHE_SIZE = int(os.getenv("WS_STATUS_CACHE_SIZE", "10000"))
+
+
+class ProjectStatusCache:
+    """
+    Cache LRU do último evento (serializado) por projeto.
+    """
+
+    def __init__(self, max_size: int = STATUS_CACHE_SIZE):
+        """
+        Args:
+            max_size: Número máximo de projetos no cache
+        """
+        self.max_size = max_size
+        self._events: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, project_id: str, text: str):
+        """Guarda o evento mais recente de um projeto."""
+        self._events[project_id] = text
+        self._events.move_to_end(project_id)
+        while len(self._events) > self.max_size:
+            self._events.popitem(last=False)
+
+    def get(self, project_id: str) -> Optional[str]:
+        """Evento mais recente do projeto (None se não está no cache)."""
+        text = self._events.get(project_id)
+        if text is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._events.move_to_end(project_id)
+        return text
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+
+# Cache do processo (gravado pela ponte de progresso)
+status_cache = ProjectStatusCache()
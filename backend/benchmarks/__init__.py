@@ -0,0 +1 @@
+# IsoMix Studio - Backend Benchmarks
@@ -0,0 +1,76 @@
+"""
+Benchmark - Escalabilidade da separação segmentada em paralelo
+
+Mede o tempo de parede da separação segmentada de um clipe sintético
+(10 minutos por padrão) variando o número de processos do pool, e
+confere se a saída paralela é idêntica à serial.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_parallel_segments --workers 1 2 4 8 16
+    python -m benchmarks.bench_parallel_segments --random-weights --minutes 1 --workers 1 2
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from benchmarks.common import make_synthetic_clip, install_random_weights
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="htdemucs")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Duração do clipe sintético")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--cpu-cores", type=int, default=os.cpu_count(), help="Orçamento de núcleos")
+    parser.add_argument("--segment", type=float, default=30.0, help="Janela em segundos")
+    parser.add_argument("--random-weights", action="store_true", help="Usar HTDemucs com pesos aleatórios")
+    args = parser.parse_args()
+    
+    from model.demucs_engine import ResidentDemucsEngine, get_resident_model
+    
+    if args.random_weights:
+        install_random_weights(args.model)
+    get_resident_model(args.model)
+    
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        clip = make_synthetic_clip(tmp / "clip.wav", args.minutes * 60)
+        reference = None
+        
+        for workers in args.workers:
+            engine = ResidentDemucsEngine(
+                args.model,
+                segment_seconds=args.segment,
+                workers=workers,
+                cpu_cores=args.cpu_cores,
+            )
+            start = time.perf_counter()
+            stems = engine.separate(clip, tmp / f"workers_{workers}")
+            elapsed = time.perf_counter() - start
+            
+            # Comparar com a primeira execução (referência)
+            output = {k.value: sf.read(str(p), dtype="int16")[0] for k, p in stems.items()}
+            if reference is None:
+                reference = output
+                max_diff = 0
+            else:
+                max_diff = max(
+                    int(np.abs(output[k].astype(np.int32) - reference[k]).max()) for k in reference
+                )
+            rows.append((workers, elapsed, max_diff))
+    
+    base = rows[0][1]
+    print(f"\nClipe: {args.minutes:.1f} min | janela: {args.segment:.0f}s | núcleos: {args.cpu_cores}")
+    print(f"{'processos':>10}{'tempo (s)':>12}{'speedup':>10}{'dif. máx (LSB)':>16}")
+    for workers, elapsed, max_diff in rows:
+        print(f"{workers:>10}{elapsed:>12.1f}{base / elapsed:>10.2f}{max_diff:>16}")
+
+
+if __name__ == "__main__":
+    main()
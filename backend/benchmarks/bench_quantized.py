@@ -0,0 +1,113 @@
+"""
+Benchmark - Modelo float vs quantizado (int8) em CPU
+
+Separa o mesmo clipe sintético com o modelo float e com o modelo de
+quantização dinâmica int8 (AI_MODEL=demucs_fast), cada um em um processo
+novo, e reporta tempo de parede, pico de memória (RSS) e o SDR de cada
+stem int8 tendo a saída float como referência.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_quantized --seconds 30
+    python -m benchmarks.bench_quantized --random-weights --seconds 10   # sem baixar pesos
+
+Com --random-weights o SDR mede apenas o erro numérico da quantização
+(os pesos não separam nada); para avaliar a perda de qualidade real use
+o modelo pré-treinado.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from benchmarks.common import make_synthetic_clip, install_random_weights
+
+
+def sdr(reference: np.ndarray, estimate: np.ndarray) -> float:
+    """Signal-to-Distortion Ratio (dB) da estimativa em relação à referência."""
+    noise = np.sum((reference - estimate) ** 2)
+    signal = np.sum(reference ** 2)
+    if noise == 0:
+        return float("inf")
+    return float(10 * np.log10((signal + 1e-12) / noise))
+
+
+def run_child(args) -> None:
+    """Separa o clipe com uma variante e reporta tempos e pico de memória."""
+    from model.demucs_engine import ResidentDemucsEngine, get_resident_model
+
+    start = time.perf_counter()
+    if args.random_weights:
+        install_random_weights(args.model, quantized=args.quantized)
+    get_resident_model(args.model, args.quantized)
+    loaded = time.perf_counter()
+
+    engine = ResidentDemucsEngine(args.model, shifts=0, quantized=args.quantized)
+    stems = engine.separate(Path(args.clip), Path(args.out))
+    done = time.perf_counter()
+
+    print(json.dumps({
+        "load": loaded - start,
+        "separate": done - loaded,
+        # ru_maxrss é em KB no Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stems": {stem.value: str(path) for stem, path in stems.items()},
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="htdemucs")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Duração do clipe sintético")
+    parser.add_argument("--random-weights", action="store_true", help="Usar HTDemucs com pesos aleatórios")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--quantized", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--clip", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        clip = make_synthetic_clip(tmp / "clip.wav", args.seconds)
+        results = {}
+
+        for variant in ("float", "int8"):
+            cmd = [
+                sys.executable, "-m", "benchmarks.bench_quantized", "--child",
+                "--model", args.model, "--clip", str(clip), "--out", str(tmp / variant),
+            ]
+            if variant == "int8":
+                cmd.append("--quantized")
+            if args.random_weights:
+                cmd.append("--random-weights")
+            output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+            results[variant] = json.loads(output.strip().splitlines()[-1])
+
+        sdrs = {}
+        for name, reference_path in results["float"]["stems"].items():
+            reference, _ = sf.read(reference_path, dtype="float32")
+            estimate, _ = sf.read(results["int8"]["stems"][name], dtype="float32")
+            sdrs[name] = sdr(reference, estimate)
+
+    print(f"\nClipe: {args.seconds:.0f}s | modelo: {args.model}")
+    print(f"{'variante':<10}{'carga (s)':>12}{'separação (s)':>16}{'pico RSS (MB)':>16}")
+    for variant, row in results.items():
+        print(f"{variant:<10}{row['load']:>12.2f}{row['separate']:>16.2f}{row['peak_rss_mb']:>16.0f}")
+
+    speedup = results["float"]["separate"] / results["int8"]["separate"]
+    print(f"\nSpeedup int8: {speedup:.2f}x")
+    print("SDR int8 vs float (dB): " + ", ".join(f"{name}={value:.1f}" for name, value in sdrs.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark - Overhead por job: processo novo vs modelo residente
+
+Compara o custo fixo por projeto de executar o Demucs em um processo novo
+(como a CLI: novo interpretador, import do torch e carga dos pesos a cada
+job) com o ResidentDemucsEngine, que carrega o modelo uma vez por processo.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_resident_engine --jobs 3 --seconds 10
+    python -m benchmarks.bench_resident_engine --random-weights   # sem baixar pesos
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import make_synthetic_clip, install_random_weights, timer
+
+
+def run_child(args) -> None:
+    """Um job "CLI": carrega tudo do zero, separa uma vez e reporta os tempos."""
+    start = time.perf_counter()
+    
+    from model.demucs_engine import ResidentDemucsEngine, get_resident_model
+    
+    if args.random_weights:
+        install_random_weights(args.model)
+    get_resident_model(args.model)
+    loaded = time.perf_counter()
+    
+    engine = ResidentDemucsEngine(args.model, shifts=0)
+    engine.separate(Path(args.clip), Path(args.out))
+    done = time.perf_counter()
+    
+    print(json.dumps({"load": loaded - start, "separate": done - loaded}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="htdemucs")
+    parser.add_argument("--jobs", type=int, default=3, help="Jobs por modo")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duração do clipe sintético")
+    parser.add_argument("--random-weights", action="store_true", help="Usar HTDemucs com pesos aleatórios")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--clip", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        run_child(args)
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        clip = make_synthetic_clip(tmp / "clip.wav", args.seconds)
+        results = {}
+        
+        # Antes: um processo novo por job
+        child_loads = []
+        for i in range(args.jobs):
+            cmd = [
+                sys.executable, "-m", "benchmarks.bench_resident_engine", "--child",
+                "--model", args.model, "--clip", str(clip), "--out", str(tmp / f"cli_{i}"),
+            ]
+            if args.random_weights:
+                cmd.append("--random-weights")
+            with timer(results, "process_per_job"):
+                output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+            child_loads.append(json.loads(output.strip().splitlines()[-1])["load"])
+        
+        # Depois: modelo residente neste processo
+        from model.demucs_engine import ResidentDemucsEngine, get_resident_model
+        
+        with timer(results, "resident_first_load"):
+            if args.random_weights:
+                install_random_weights(args.model)
+            get_resident_model(args.model)
+        
+        engine = ResidentDemucsEngine(args.model, shifts=0)
+        for i in range(args.jobs):
+            with timer(results, "resident_per_job"):
+                engine.separate(clip, tmp / f"resident_{i}")
+    
+    before = statistics.mean(results["process_per_job"])
+    after = statistics.mean(results["resident_per_job"])
+    
+    print(f"\nClipe: {args.seconds:.0f}s | modelo: {args.model} | jobs: {args.jobs}")
+    print(f"{'modo':<28}{'tempo/job (s)':>15}")
+    print(f"{'processo novo por job':<28}{before:>15.2f}")
+    print(f"{'modelo residente':<28}{after:>15.2f}")
+    print(f"\nCarga no processo novo (import + pesos): {statistics.mean(child_loads):.2f}s/job")
+    print(f"Carga única do modelo residente: {results['resident_first_load'][0]:.2f}s")
+    print(f"Overhead eliminado por job: {before - after:.2f}s ({(before - after) / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
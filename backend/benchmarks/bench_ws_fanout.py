@@ -0,0 +1,137 @@
+"""
+Benchmark - Fan-out WebSocket: envio sequencial vs fila por conexão
+
+Simula N conexões inscritas no mesmo projeto (uma parte delas lenta) e
+envia uma sequência de eventos de progresso. Compara o padrão antigo
+(send_json aguardado conexão por conexão, serializando para cada uma)
+com o ConnectionManager atual (fila limitada por conexão, serialização
+única), e reporta a latência de entrega p50/p99 nos clientes rápidos e
+quanto tempo a chamada de fan-out bloqueia o event loop.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_ws_fanout --connections 10000
+    python -m benchmarks.bench_ws_fanout --connections 10000 --slow 0.01 --slow-delay 0.05
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from application.websocket.manager import ConnectionManager
+
+
+class SimulatedSocket:
+    """Conexão simulada: registra a latência de cada mensagem recebida."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.latencies = []
+        self.sent_at = None
+
+    async def accept(self):
+        pass
+
+    async def _receive(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        message = json.loads(text)
+        self.latencies.append(time.perf_counter() - message["sent_at"])
+
+    async def send_text(self, text: str):
+        await self._receive(text)
+
+    async def send_json(self, message: dict):
+        await self._receive(json.dumps(message))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def make_sockets(connections: int, slow_fraction: float, slow_delay: float):
+    """Conexões simuladas, com as lentas espalhadas entre as rápidas."""
+    slow_every = int(1 / slow_fraction) if slow_fraction else 0
+    return [
+        SimulatedSocket(slow_delay if slow_every and i % slow_every == 0 else 0.0)
+        for i in range(connections)
+    ]
+
+
+async def sequential_fan_out(sockets, message: dict):
+    """Padrão antigo: send_json aguardado conexão por conexão."""
+    for websocket in sockets:
+        try:
+            await websocket.send_json(message)
+        except Exception:
+            pass
+
+
+async def run(name: str, connections: int, events: int, slow_fraction: float, slow_delay: float, queued: bool) -> dict:
+    sockets = make_sockets(connections, slow_fraction, slow_delay)
+    manager = ConnectionManager()
+    if queued:
+        for websocket in sockets:
+            await manager.connect(websocket)
+
+    blocked = []
+    started = time.perf_counter()
+    for progress in range(events):
+        message = {"type": "project_status", "project_id": "p1", "progress": progress, "sent_at": time.perf_counter()}
+        call_start = time.perf_counter()
+        if queued:
+            await manager.broadcast(message)
+        else:
+            await sequential_fan_out(sockets, message)
+        blocked.append(time.perf_counter() - call_start)
+        await asyncio.sleep(0)
+
+    # Aguardar a entrega aos clientes rápidos
+    fast = [websocket for websocket in sockets if not websocket.delay]
+    while any(len(websocket.latencies) < events for websocket in fast):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+
+    for websocket in sockets:
+        manager.disconnect(websocket)
+
+    latencies = sorted(latency for websocket in fast for latency in websocket.latencies)
+    return {
+        "name": name,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "blocked_ms": statistics.mean(blocked) * 1000,
+        "elapsed_s": elapsed,
+        "dropped": manager.dropped_messages(),
+    }
+
+
+async def main_async(args) -> None:
+    results = [
+        await run("sequencial", args.connections, args.events, args.slow, args.slow_delay, queued=False),
+        await run("fila por conexão", args.connections, args.events, args.slow, args.slow_delay, queued=True),
+    ]
+
+    print(f"\nConexões: {args.connections} | eventos: {args.events} | lentas: {args.slow:.1%} (+{args.slow_delay * 1000:.0f} ms)")
+    print(f"{'variante':<20}{'p50 (ms)':>12}{'p99 (ms)':>12}{'bloqueio (ms)':>16}{'total (s)':>12}{'descartadas':>14}")
+    for row in results:
+        print(
+            f"{row['name']:<20}{row['p50_ms']:>12.1f}{row['p99_ms']:>12.1f}"
+            f"{row['blocked_ms']:>16.1f}{row['elapsed_s']:>12.2f}{row['dropped']:>14}"
+        )
+
+    print(f"\nSpeedup p99 (clientes rápidos): {results[0]['p99_ms'] / results[1]['p99_ms']:.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=10)
+    parser.add_argument("--slow", type=float, default=0.001, help="Fração de conexões lentas")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="Atraso (s) por mensagem das conexões lentas")
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
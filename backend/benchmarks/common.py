@@ -0,0 +1,90 @@
+"""
+Benchmark Helpers - IsoMix Studio
+
+Utilitários compartilhados pelos benchmarks: geração de áudio sintético
+e registro de um modelo Demucs com pesos aleatórios (mesmo custo de
+inferência do modelo real, sem precisar baixar os pesos).
+"""
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+DEMUCS_SOURCES = ["drums", "bass", "other", "vocals"]
+
+
+def make_synthetic_clip(path: Path, seconds: float, samplerate: int = 44100, seed: int = 0) -> Path:
+    """
+    Gera um clipe estéreo sintético (bateria, baixo, acorde e "voz").
+    
+    Args:
+        path: Caminho do WAV a gerar
+        seconds: Duração em segundos
+        samplerate: Taxa de amostragem
+        seed: Semente do gerador (clipe determinístico)
+        
+    Returns:
+        Caminho do arquivo gerado
+    """
+    rng = np.random.default_rng(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    block = samplerate * 10
+    total = int(seconds * samplerate)
+    
+    # Escrever em blocos para não alocar o clipe inteiro (clipes longos)
+    with sf.SoundFile(str(path), "w", samplerate=samplerate, channels=2, subtype="PCM_16") as f:
+        for start in range(0, total, block):
+            n = min(block, total - start)
+            t = (start + np.arange(n)) / samplerate
+            
+            beat = np.exp(-((t % 0.5) * 40)) * rng.standard_normal(n) * 0.3
+            bass = 0.3 * np.sin(2 * np.pi * 55 * t)
+            chord = 0.1 * sum(np.sin(2 * np.pi * f * t) for f in (261.6, 329.6, 392.0))
+            voice = 0.2 * np.sin(2 * np.pi * (440 + 30 * np.sin(2 * np.pi * 5 * t)) * t)
+            
+            left = beat + bass + chord + voice
+            right = beat + bass + 0.8 * chord + voice
+            f.write(np.clip(np.stack([left, right], axis=1), -1, 1).astype(np.float32))
+    
+    return path
+
+
+def random_weights_model(model_name: str = "htdemucs", seed: int = 0):
+    """
+    Cria um HTDemucs com pesos aleatórios.
+    
+    A arquitetura (e portanto o custo de CPU) é a mesma do modelo
+    pré-treinado; apenas a qualidade da separação não tem significado.
+    A semente fixa gera os mesmos pesos em processos diferentes.
+    """
+    import torch
+    from demucs.htdemucs import HTDemucs
+    
+    torch.manual_seed(seed)
+    model = HTDemucs(sources=DEMUCS_SOURCES)
+    model.eval()
+    return model
+
+
+def install_random_weights(model_name: str = "htdemucs", quantized: bool = False):
+    """Registra um modelo com pesos aleatórios como residente no processo."""
+    from model import demucs_engine
+    
+    model = random_weights_model(model_name)
+    if quantized:
+        model = demucs_engine.quantize_model(model)
+    demucs_engine._resident_models[demucs_engine.resident_model_key(model_name, quantized)] = model
+    return model
+
+
+@contextmanager
+def timer(results: dict, key: str):
+    """Mede o tempo de parede de um bloco e acumula em results[key]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        results.setdefault(key, []).append(time.perf_counter() - start)
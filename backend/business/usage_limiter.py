@@ -89,6 +89,10 @@ class UsageLimiter:
         """Verifica se deve adicionar marca d'água"""
         return self.limits["watermark"]
     
+    def get_max_file_size_mb(self) -> int:
+        """Retorna o tamanho máximo de arquivo do plano (MB)"""
+        return self.limits["max_file_size_mb"]
+    
     def get_retention_hours(self) -> int:
         """Retorna o tempo de retenção dos arquivos"""
         return self.limits["retention_hours"]
@@ -5,16 +5,27 @@ Expondo todos os modelos para facilitar imports e garantir
 que o SQLAlchemy carregue todos os relacionamentos corretamente.
 """
 from .base import Base
-from .project import Project, ProjectStatus
+from .project import Project, ProjectStatus, SeparationMode
 from .stem import Stem
+from .project_stage import ProjectStage
+from .analysis_job import AnalysisJob, AnalysisJobStatus
 from .user import User, UserPlan
+from .analysis_cache import AnalysisCacheEntry, AnalysisCacheCounter
+from .processing_metric import ProcessingMetric
 
 __all__ = [
     "Base",
     "Project",
     "ProjectStatus",
+    "SeparationMode",
     "Stem",
+    "ProjectStage",
+    "AnalysisJob",
+    "AnalysisJobStatus",
     "User",
     "UserPlan",
+    "AnalysisCacheEntry",
+    "AnalysisCacheCounter",
+    "ProcessingMetric",
 ]
 
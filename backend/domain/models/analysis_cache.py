@@ -0,0 +1,49 @@
+"""
+Analysis Cache Models - Domain Layer
+
+Índice do cache de separação/análise endereçado por conteúdo.
+"""
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger
+from datetime import datetime
+
+from .base import Base
+
+
+class AnalysisCacheEntry(Base):
+    """
+    Resultado de processamento reaproveitável (stems + análises).
+    
+    A chave combina o hash do áudio decodificado, o modelo de separação
+    e a versão das análises; os artefatos ficam em `path`.
+    """
+    __tablename__ = "analysis_cache"
+    
+    key = Column(String, primary_key=True)
+    
+    # Hash do arquivo enviado (atalho para acertos já no upload)
+    source_sha256 = Column(String, nullable=True, index=True)
+    
+    model_name = Column(String, nullable=False)
+    analysis_version = Column(String, nullable=False)
+    
+    # Diretório dos artefatos e tamanho total
+    path = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, default=0, nullable=False)
+    
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<AnalysisCacheEntry {self.key[:12]} - {self.size_bytes} bytes>"
+
+
+class AnalysisCacheCounter(Base):
+    """Contadores globais do cache (hits, misses, evictions)."""
+    __tablename__ = "analysis_cache_counters"
+    
+    name = Column(String, primary_key=True)
+    value = Column(BigInteger, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<AnalysisCacheCounter {self.name}={self.value}>"
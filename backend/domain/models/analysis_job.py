@@ -0,0 +1,49 @@
+"""
+Analysis Job Model - Domain Layer
+
+Análises sob demanda (acordes, letra, partitura) pedidas para um projeto.
+"""
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import enum
+
+from .base import Base
+
+
+class AnalysisJobStatus(str, enum.Enum):
+    """Status de uma análise sob demanda"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class AnalysisJob(Base):
+    """
+    Análise sob demanda de um projeto.
+    
+    Existe no máximo um job por (projeto, etapa): pedidos concorrentes
+    para a mesma análise compartilham o job já enfileirado.
+    """
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (UniqueConstraint("project_id", "stage", name="uq_analysis_job"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(String, ForeignKey("projects.id"), nullable=False, index=True)
+    
+    # Etapa (chords, lyrics, transcription) e tarefa Celery que a executa
+    stage = Column(String, nullable=False)
+    task_id = Column(String, nullable=True)
+    
+    status = Column(SQLEnum(AnalysisJobStatus), default=AnalysisJobStatus.QUEUED, nullable=False)
+    error_message = Column(String, nullable=True)
+    
+    requested_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Relacionamentos
+    project = relationship("Project", back_populates="analysis_jobs")
+    
+    def __repr__(self):
+        return f"<AnalysisJob {self.stage} ({self.status.value}) - Project {self.project_id}>"
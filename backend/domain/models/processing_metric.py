@@ -0,0 +1,44 @@
+"""
+Processing Metric Model - Domain Layer
+
+Tempo e recursos gastos em cada etapa do processamento de um projeto.
+"""
+from sqlalchemy import Column, String, DateTime, Integer, Float
+from datetime import datetime
+
+from .base import Base
+
+
+class ProcessingMetric(Base):
+    """
+    Medição de uma etapa do pipeline (decode, separate, bpm, click...).
+    
+    Não referencia o projeto por chave estrangeira: as medições continuam
+    valendo para planejamento de capacidade depois que o projeto expira.
+    """
+    __tablename__ = "processing_metrics"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(String, nullable=False, index=True)
+    task_id = Column(String, nullable=True)
+    
+    stage = Column(String, nullable=False, index=True)
+    
+    # Tempo de parede e de CPU (processo + filhos) em segundos
+    wall_seconds = Column(Float, nullable=False)
+    cpu_seconds = Column(Float, nullable=False)
+    
+    # Pico de memória residente do processo durante a etapa
+    peak_rss_mb = Column(Float, nullable=True)
+    
+    # Duração do áudio processado (para normalizar por segundo de áudio)
+    audio_seconds = Column(Float, nullable=True)
+    
+    # ok: etapa concluída; failed: falhou/tempo limite; resumed: retomada
+    # de checkpoint (só processou parte do áudio)
+    status = Column(String, default="ok", nullable=False, index=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<ProcessingMetric {self.stage} - {self.wall_seconds:.2f}s>"
@@ -21,6 +21,12 @@ class ProjectStatus(str, enum.Enum):
     EXPIRED = "expired"
 
 
+class SeparationMode(str, enum.Enum):
+    """Modos de separação que podem ser pedidos por projeto"""
+    FULL = "full"            # vocals, drums, bass, other
+    TWO_STEMS = "two_stems"  # vocals + acompanhamento (karaokê)
+
+
 class Project(Base):
     """
     Projeto de separação de áudio.
@@ -45,8 +51,24 @@ class Project(Base):
     status = Column(SQLEnum(ProjectStatus), default=ProjectStatus.PENDING, nullable=False)
     error_message = Column(String, nullable=True)
     
+    # Tarefa Celery do processamento (progresso no result backend)
+    task_id = Column(String, nullable=True)
+    
+    # Plano do usuário no upload: define a fila (prioridade) da separação
+    plan = Column(String, default="free", nullable=False)
+    
+    # Tentativas de processamento (compõe o ID idempotente da tarefa)
+    processing_attempts = Column(Integer, default=0, nullable=False)
+    
+    # Lease do processamento: só uma execução por projeto de cada vez
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    
     # Modelo de IA usado
     ai_model = Column(String, nullable=True)
+    separation_mode = Column(
+        SQLEnum(SeparationMode), default=SeparationMode.FULL, nullable=False
+    )
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -55,6 +77,8 @@ class Project(Base):
     
     # Relacionamentos
     stems = relationship("Stem", back_populates="project", cascade="all, delete-orphan")
+    stages = relationship("ProjectStage", back_populates="project", cascade="all, delete-orphan")
+    analysis_jobs = relationship("AnalysisJob", back_populates="project", cascade="all, delete-orphan")
     user = relationship("User", back_populates="projects")
     
     def __repr__(self):
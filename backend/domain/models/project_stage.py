@@ -0,0 +1,40 @@
+"""
+Project Stage Model - Domain Layer
+
+Checkpoint de cada etapa concluída do processamento de um projeto.
+"""
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from .base import Base
+
+
+class ProjectStage(Base):
+    """
+    Etapa concluída do pipeline de um projeto (separação, BPM, acordes...).
+    
+    Um retry ou reprocessamento pula a etapa se a versão gravada for a
+    atual e todos os arquivos de saída ainda existirem.
+    """
+    __tablename__ = "project_stages"
+    __table_args__ = (UniqueConstraint("project_id", "stage", name="uq_project_stage"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(String, ForeignKey("projects.id"), nullable=False, index=True)
+    
+    # Nome da etapa e versão que produziu o resultado
+    stage = Column(String, nullable=False)
+    version = Column(String, nullable=False)
+    
+    # Resultado da etapa e arquivos que ele referencia
+    result = Column(String, nullable=False, default="{}")  # JSON
+    files = Column(String, nullable=False, default="[]")  # JSON: lista de caminhos
+    
+    completed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relacionamentos
+    project = relationship("Project", back_populates="stages")
+    
+    def __repr__(self):
+        return f"<ProjectStage {self.stage} ({self.version}) - Project {self.project_id}>"
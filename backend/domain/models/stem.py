@@ -3,7 +3,7 @@ Stem Model - Domain Layer
 
 Entidade que representa uma faixa de áudio separada (stem).
 """
-from sqlalchemy import Column, String, ForeignKey, Integer
+from sqlalchemy import Column, String, ForeignKey, Integer, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -14,8 +14,10 @@ class Stem(Base):
     Faixa de áudio separada (stem).
     
     Cada projeto gera 4 stems: vocals, drums, bass, other
+    (no máximo um registro por tipo em cada projeto)
     """
     __tablename__ = "stems"
+    __table_args__ = (UniqueConstraint("project_id", "stem_type", name="uq_stem_type"),)
     
     id = Column(String, primary_key=True)
     project_id = Column(String, ForeignKey("projects.id"), nullable=False)
@@ -0,0 +1,393 @@
+"""
+Analysis Cache Service - Domain Layer
+
+Cache endereçado por conteúdo dos resultados de processamento.
+
+A chave combina o hash do áudio decodificado (independe de container e
+tags), o modelo de separação e a versão das análises. Em um acerto, os
+stems e artefatos de análise são copiados para o novo projeto, sem
+nenhum processamento. Entradas são removidas por LRU
+quando o tamanho total excede o limite configurado.
+
+A entrada é gravada quando o projeto fica pronto, antes das análises sob
+demanda (acordes, letras, partitura): esses resultados não entram no
+cache e são calculados no primeiro acesso de cada projeto.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from domain.models.analysis_cache import AnalysisCacheEntry, AnalysisCacheCounter
+from domain.validators.audio import AudioValidator
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_BYTES = int(float(os.getenv("ANALYSIS_CACHE_MAX_GB", "20")) * 1024 ** 3)
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash SHA-256 dos bytes do arquivo.
+
+    Args:
+        path: Caminho do arquivo
+        chunk_size: Tamanho dos blocos de leitura
+
+    Returns:
+        Hash hexadecimal
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def decoded_audio_sha256(path: Path, block_frames: int = 1 << 18) -> str:
+    """
+    Hash SHA-256 do áudio decodificado (PCM 16-bit).
+
+    Dois arquivos com as mesmas amostras (ex.: WAV e FLAC, ou o mesmo MP3
+    com tags diferentes) geram o mesmo hash. A decodificação é feita em
+    blocos, sem carregar a faixa inteira em memória.
+
+    Args:
+        path: Caminho do arquivo de áudio
+        block_frames: Amostras por bloco
+
+    Returns:
+        Hash hexadecimal
+    """
+    import soundfile as sf
+
+    digest = hashlib.sha256()
+
+    try:
+        with sf.SoundFile(str(path)) as f:
+            digest.update(f"{f.samplerate}:{f.channels}".encode())
+            for block in f.blocks(blocksize=block_frames, dtype="int16", always_2d=True):
+                digest.update(block.tobytes())
+        return digest.hexdigest()
+    except RuntimeError:
+        pass
+
+    # Formatos não suportados pelo soundfile (m4a, aac): decodificar via ffmpeg
+    metadata = AudioValidator.get_audio_metadata(path)
+    digest.update(f"{metadata.get('sample_rate', 0)}:{metadata.get('channels', 0)}".encode())
+
+    process = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", str(path), "-f", "s16le", "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    for chunk in iter(lambda: process.stdout.read(1 << 20), b""):
+        digest.update(chunk)
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg falhou ao decodificar {path.name}")
+
+    return digest.hexdigest()
+
+
+def _copy_artifact(src: Path, dst: Path):
+    """
+    Copia um artefato entre o cache e um projeto.
+
+    Cópia e não hardlink: os arquivos de projeto podem ser regravados no
+    lugar (ex.: stems retomados a partir do checkpoint), o que corromperia
+    a entrada do cache e todos os projetos ligados a ela.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    shutil.copy2(src, dst)
+
+
+class AnalysisCache:
+    """
+    Cache de stems e análises indexado no banco de dados.
+
+    Os artefatos ficam em `<root>/<chave>/` junto com um manifest que
+    mapeia cada artefato (vocals, click, midi...) para seu caminho relativo.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: int = CACHE_MAX_BYTES):
+        """
+        Args:
+            root: Diretório do cache (padrão: STORAGE_PATH/cache)
+            max_bytes: Tamanho máximo do cache antes de remover entradas (LRU)
+        """
+        self.root = root or Path(os.getenv("STORAGE_PATH", "./storage")) / "cache"
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(content_hash: str, model_name: str, analysis_version: Tuple) -> str:
+        """Chave do cache: hash do conteúdo + modelo + versão das análises."""
+        version = ",".join(str(v) for v in analysis_version)
+        return hashlib.sha256(f"{content_hash}|{model_name}|{version}".encode()).hexdigest()
+
+    # ===============================
+    # Contadores
+    # ===============================
+
+    def _increment(self, db: Session, name: str, amount: int = 1):
+        """Incrementa um contador global de forma atômica."""
+        updated = db.query(AnalysisCacheCounter).filter(
+            AnalysisCacheCounter.name == name
+        ).update({AnalysisCacheCounter.value: AnalysisCacheCounter.value + amount})
+
+        if not updated:
+            try:
+                db.add(AnalysisCacheCounter(name=name, value=amount))
+                db.commit()
+                return
+            except IntegrityError:
+                # Outro processo criou o contador ao mesmo tempo
+                db.rollback()
+                db.query(AnalysisCacheCounter).filter(
+                    AnalysisCacheCounter.name == name
+                ).update({AnalysisCacheCounter.value: AnalysisCacheCounter.value + amount})
+        db.commit()
+
+    def stats(self, db: Session) -> dict:
+        """
+        Retorna contadores e ocupação do cache.
+
+        Returns:
+            Dicionário com hits, misses, evictions, hit_rate, entries e size_bytes
+        """
+        counters = {c.name: c.value for c in db.query(AnalysisCacheCounter).all()}
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        entries, size = db.query(
+            func.count(AnalysisCacheEntry.key),
+            func.coalesce(func.sum(AnalysisCacheEntry.size_bytes), 0),
+        ).one()
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "entries": entries,
+            "size_bytes": int(size),
+            "max_bytes": self.max_bytes,
+        }
+
+    # ===============================
+    # Consulta
+    # ===============================
+
+    def lookup(self, db: Session, key: str, record_miss: bool = True) -> Optional[AnalysisCacheEntry]:
+        """
+        Busca uma entrada pela chave de conteúdo.
+
+        Args:
+            db: Sessão do banco de dados
+            key: Chave gerada por make_key
+            record_miss: Se deve contabilizar um miss quando não encontrar
+
+        Returns:
+            Entrada do cache ou None
+        """
+        entry = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.key == key).first()
+        return self._checked(db, entry, record_miss)
+
+    def lookup_source(
+        self,
+        db: Session,
+        source_sha256: str,
+        model_name: str,
+        analysis_version: Tuple,
+        record_miss: bool = False,
+    ) -> Optional[AnalysisCacheEntry]:
+        """
+        Busca uma entrada pelo hash do arquivo enviado (sem decodificar).
+
+        Usado no upload: o mesmo arquivo reenviado é reconhecido apenas
+        pelos bytes. Por padrão não contabiliza miss, já que o worker fará
+        a consulta definitiva pelo áudio decodificado.
+        """
+        entry = db.query(AnalysisCacheEntry).filter(
+            AnalysisCacheEntry.source_sha256 == source_sha256,
+            AnalysisCacheEntry.model_name == model_name,
+            AnalysisCacheEntry.analysis_version == ",".join(str(v) for v in analysis_version),
+        ).first()
+        return self._checked(db, entry, record_miss)
+
+    def _checked(self, db: Session, entry: Optional[AnalysisCacheEntry], record_miss: bool):
+        """Descarta entradas cujos arquivos sumiram e contabiliza o miss."""
+        if entry and not (Path(entry.path) / MANIFEST_FILENAME).exists():
+            logger.warning(f"Entrada de cache sem arquivos, removendo: {entry.key}")
+            db.delete(entry)
+            db.commit()
+            entry = None
+
+        if entry is None and record_miss:
+            self._increment(db, "misses")
+        return entry
+
+    # ===============================
+    # Restauração e armazenamento
+    # ===============================
+
+    def restore(self, db: Session, entry: AnalysisCacheEntry, output_dir: Path) -> dict:
+        """
+        Copia os artefatos de uma entrada para o diretório de um novo projeto.
+
+        Args:
+            db: Sessão do banco de dados
+            entry: Entrada encontrada por lookup/lookup_source
+            output_dir: Diretório de saída do projeto
+
+        Returns:
+            Manifest com "artifacts" (tipo -> caminho absoluto) e "extra"
+        """
+        entry_dir = Path(entry.path)
+        with open(entry_dir / MANIFEST_FILENAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        for relative in manifest["files"]:
+            _copy_artifact(entry_dir / relative, output_dir / relative)
+
+        entry.hit_count += 1
+        entry.last_accessed_at = datetime.utcnow()
+        db.commit()
+        self._increment(db, "hits")
+
+        logger.info(f"Cache hit {entry.key[:12]}: {len(manifest['files'])} arquivos restaurados")
+        return {
+            "artifacts": {
+                name: str(output_dir / relative)
+                for name, relative in manifest["artifacts"].items()
+            },
+            "extra": manifest.get("extra", {}),
+        }
+
+    def store(
+        self,
+        db: Session,
+        key: str,
+        output_dir: Path,
+        artifacts: Dict[str, str],
+        model_name: str,
+        analysis_version: Tuple,
+        source_sha256: Optional[str] = None,
+        extra: Optional[dict] = None,
+    ) -> Optional[AnalysisCacheEntry]:
+        """
+        Guarda os artefatos de um projeto processado.
+
+        Todos os arquivos de `output_dir` (exceto temporários ocultos) são
+        copiados para o cache; em seguida o cache é podado por LRU.
+
+        Args:
+            db: Sessão do banco de dados
+            key: Chave gerada por make_key
+            output_dir: Diretório de saída do projeto
+            artifacts: Tipo do artefato -> caminho absoluto (dentro de output_dir)
+            model_name: Modelo de separação usado
+            analysis_version: Versão das análises
+            source_sha256: Hash do arquivo enviado (para acertos no upload)
+            extra: Dados adicionais do resultado (ex.: BPM)
+
+        Returns:
+            Entrada criada ou None se já existia
+        """
+        if db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.key == key).first():
+            return None
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.root / f".tmp-{uuid.uuid4().hex}"
+        entry_dir = self.root / key
+
+        files = [
+            path.relative_to(output_dir).as_posix()
+            for path in sorted(output_dir.rglob("*"))
+            if path.is_file() and not any(part.startswith(".") for part in path.relative_to(output_dir).parts)
+        ]
+
+        try:
+            size = 0
+            for relative in files:
+                _copy_artifact(output_dir / relative, tmp_dir / relative)
+                size += (tmp_dir / relative).stat().st_size
+
+            manifest = {
+                "artifacts": {
+                    name: Path(path).resolve().relative_to(output_dir.resolve()).as_posix()
+                    for name, path in artifacts.items()
+                },
+                "files": files,
+                "extra": extra or {},
+            }
+            with open(tmp_dir / MANIFEST_FILENAME, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+
+            if entry_dir.exists():
+                shutil.rmtree(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        entry = AnalysisCacheEntry(
+            key=key,
+            source_sha256=source_sha256,
+            model_name=model_name,
+            analysis_version=",".join(str(v) for v in analysis_version),
+            path=str(entry_dir),
+            size_bytes=size,
+        )
+        try:
+            db.add(entry)
+            db.commit()
+        except IntegrityError:
+            # Outro worker guardou o mesmo conteúdo ao mesmo tempo
+            db.rollback()
+            return None
+
+        logger.info(f"Cache store {key[:12]}: {len(files)} arquivos, {size / (1024 * 1024):.1f} MB")
+        self.evict(db)
+        return entry
+
+    def evict(self, db: Session) -> int:
+        """
+        Remove as entradas menos usadas recentemente até caber no limite.
+
+        Returns:
+            Número de entradas removidas
+        """
+        total = db.query(func.coalesce(func.sum(AnalysisCacheEntry.size_bytes), 0)).scalar()
+        evicted = 0
+
+        while total > self.max_bytes:
+            oldest = db.query(AnalysisCacheEntry).order_by(
+                AnalysisCacheEntry.last_accessed_at.asc()
+            ).first()
+            if oldest is None:
+                break
+
+            shutil.rmtree(oldest.path, ignore_errors=True)
+            total -= oldest.size_bytes
+            db.delete(oldest)
+            db.commit()
+            evicted += 1
+
+        if evicted:
+            self._increment(db, "evictions", evicted)
+            logger.info(f"Cache: {evicted} entradas removidas (LRU)")
+        return evicted
@@ -0,0 +1,124 @@
+"""
+Job Queue Service - Domain Layer
+
+Posição na fila e espera estimada dos projetos aguardando separação.
+
+Cada plano tem sua fila de separação (PRO em separation_priority, FREE em
+separation) e os workers alternam entre elas a cada job. Um projeto
+espera, portanto, os jobs do próprio plano enviados antes dele e, no
+máximo, o mesmo número de jobs do outro plano. A espera é estimada com
+o tempo medido da separação por segundo de áudio (processing_metrics).
+"""
+import os
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from domain.models.project import Project, ProjectStatus
+from domain.services.processing_metrics import seconds_per_audio_second
+
+# Planos na ordem em que os workers atendem quando as duas filas têm jobs
+PLANS = ("pro", "free")
+
+# Processos de separação somando todos os workers (docker-compose: worker -c 2)
+SEPARATION_SLOTS = int(os.getenv("SEPARATION_SLOTS", "2"))
+
+# Segundos de separação por segundo de áudio enquanto não há medições
+DEFAULT_SECONDS_PER_AUDIO_SECOND = float(os.getenv("DEFAULT_SEPARATION_SECONDS_PER_AUDIO_SECOND", "0.5"))
+
+# Duração assumida para projetos sem duração conhecida
+DEFAULT_DURATION_SECONDS = 240
+
+
+def _duration(project: Project) -> float:
+    """Duração do áudio do projeto em segundos."""
+    return project.duration_seconds or DEFAULT_DURATION_SECONDS
+
+
+def _pending_by_plan(db: Session) -> Dict[str, List[Project]]:
+    """Projetos aguardando separação por plano, na ordem de envio."""
+    pending = db.query(Project).filter(
+        Project.status == ProjectStatus.PENDING,
+    ).order_by(Project.created_at).all()
+
+    by_plan = {plan: [] for plan in PLANS}
+    for project in pending:
+        by_plan[project.plan if project.plan in by_plan else "free"].append(project)
+    return by_plan
+
+
+def _estimate_wait(db: Session, ahead: List[Project]) -> float:
+    """Espera (s) até os jobs à frente e os em andamento liberarem um slot."""
+    rate = seconds_per_audio_second(db, "separate") or DEFAULT_SECONDS_PER_AUDIO_SECOND
+
+    processing = db.query(Project.duration_seconds).filter(
+        Project.status == ProjectStatus.PROCESSING,
+    ).all()
+    # Em média os jobs em andamento estão na metade
+    busy = sum((duration or DEFAULT_DURATION_SECONDS) / 2 for (duration,) in processing)
+    queued = sum(_duration(project) for project in ahead)
+
+    return round((busy + queued) * rate / max(SEPARATION_SLOTS, 1), 1)
+
+
+def _jobs_ahead(by_plan: Dict[str, List[Project]], plan: str, same_plan_ahead: int) -> List[Project]:
+    """
+    Jobs atendidos antes de um job com `same_plan_ahead` jobs do próprio
+    plano à frente: esses, mais até o mesmo número do outro plano (o
+    worker alterna entre as filas; PRO é atendido primeiro no empate).
+    """
+    ahead = by_plan[plan][:same_plan_ahead]
+    other_turns = same_plan_ahead if plan == PLANS[0] else same_plan_ahead + 1
+    for other in PLANS:
+        if other != plan:
+            ahead += by_plan[other][:other_turns]
+    return ahead
+
+
+def queue_position(db: Session, project: Project) -> Optional[Dict]:
+    """
+    Posição e espera estimada de um projeto aguardando separação.
+
+    Args:
+        db: Sessão do banco de dados
+        project: Projeto
+
+    Returns:
+        {"plan", "position", "jobs_ahead", "estimated_wait_seconds"} ou
+        None se o projeto não está na fila
+    """
+    if project.status != ProjectStatus.PENDING:
+        return None
+
+    by_plan = _pending_by_plan(db)
+    plan = project.plan if project.plan in by_plan else "free"
+    same_plan = [p.id for p in by_plan[plan]]
+    same_plan_ahead = same_plan.index(project.id) if project.id in same_plan else len(same_plan)
+
+    ahead = _jobs_ahead(by_plan, plan, same_plan_ahead)
+    return {
+        "plan": plan,
+        "position": len(ahead) + 1,
+        "jobs_ahead": len(ahead),
+        "estimated_wait_seconds": _estimate_wait(db, ahead),
+    }
+
+
+def plan_wait_estimates(db: Session) -> Dict[str, Dict]:
+    """
+    Espera estimada de um novo upload de cada plano.
+
+    Returns:
+        {plano: {"pending", "jobs_ahead", "estimated_wait_seconds"}}
+    """
+    by_plan = _pending_by_plan(db)
+
+    estimates = {}
+    for plan in PLANS:
+        ahead = _jobs_ahead(by_plan, plan, len(by_plan[plan]))
+        estimates[plan] = {
+            "pending": len(by_plan[plan]),
+            "jobs_ahead": len(ahead),
+            "estimated_wait_seconds": _estimate_wait(db, ahead),
+        }
+    return estimates
@@ -0,0 +1,136 @@
+"""
+Lazy Analysis Service - Domain Layer
+
+Enfileiramento deduplicado das análises sob demanda.
+
+Acordes, letra e partitura só são calculados quando o usuário abre a
+tela que os usa. O primeiro pedido cria o job e enfileira a tarefa;
+pedidos concorrentes ou seguintes encontram o job existente e apenas
+acompanham o status. Jobs que falharam são tentados de novo depois de
+um intervalo, e jobs perdidos (worker morto) depois de um prazo maior.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from domain.models.analysis_job import AnalysisJob, AnalysisJobStatus
+
+logger = logging.getLogger(__name__)
+
+# Intervalo antes de tentar de novo uma análise que falhou
+RETRY_AFTER = timedelta(seconds=int(os.getenv("LAZY_ANALYSIS_RETRY_SECONDS", "600")))
+
+# Job enfileirado/rodando sem atualização por mais que isso é considerado perdido
+STALE_AFTER = timedelta(seconds=int(os.getenv("LAZY_ANALYSIS_STALE_SECONDS", "1800")))
+
+
+def get_job(db: Session, project_id: str, stage: str) -> Optional[AnalysisJob]:
+    """Job da análise de um projeto, se já foi pedida."""
+    return db.query(AnalysisJob).filter(
+        AnalysisJob.project_id == project_id,
+        AnalysisJob.stage == stage,
+    ).first()
+
+
+def _should_requeue(job: AnalysisJob, now: datetime) -> bool:
+    """Indica se o job precisa ser enfileirado de novo."""
+    age = now - job.updated_at
+    if job.status == AnalysisJobStatus.DONE:
+        # Concluído mas sem resultado (arquivos removidos): refazer
+        return True
+    if job.status == AnalysisJobStatus.FAILED:
+        return age >= RETRY_AFTER
+    return age >= STALE_AFTER
+
+
+def _enqueue(db: Session, job: AnalysisJob, enqueue: Callable[[], str]) -> AnalysisJob:
+    """Enfileira a tarefa do job já reivindicado e guarda o ID."""
+    try:
+        job.task_id = enqueue()
+    except Exception as e:
+        job.status = AnalysisJobStatus.FAILED
+        job.error_message = f"Falha ao enfileirar: {e}"
+        db.commit()
+        raise
+    db.commit()
+    logger.info(f"Análise {job.stage} do projeto {job.project_id} enfileirada ({job.task_id})")
+    return job
+
+
+def request_analysis(db: Session, project_id: str, stage: str, enqueue: Callable[[], str]) -> AnalysisJob:
+    """
+    Pede uma análise sob demanda, enfileirando no máximo um job.
+
+    Deve ser chamado apenas quando o resultado ainda não existe.
+
+    Args:
+        db: Sessão do banco de dados
+        project_id: ID do projeto
+        stage: Etapa (chords, lyrics, transcription)
+        enqueue: Enfileira a tarefa e retorna o ID dela; só é chamado
+            pelo pedido que criou (ou reivindicou) o job
+
+    Returns:
+        Job da análise (novo ou compartilhado)
+    """
+    job = get_job(db, project_id, stage)
+
+    if job is None:
+        job = AnalysisJob(project_id=project_id, stage=stage, status=AnalysisJobStatus.QUEUED)
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Outro pedido criou o job ao mesmo tempo
+            db.rollback()
+            return get_job(db, project_id, stage)
+        return _enqueue(db, job, enqueue)
+
+    now = datetime.utcnow()
+    if not _should_requeue(job, now):
+        return job
+
+    # Reivindicar o job de forma atômica: só o pedido que trocar o status
+    # (a partir do estado que leu) enfileira a nova tentativa
+    claimed = db.query(AnalysisJob).filter(
+        AnalysisJob.id == job.id,
+        AnalysisJob.status == job.status,
+        AnalysisJob.updated_at == job.updated_at,
+    ).update({
+        AnalysisJob.status: AnalysisJobStatus.QUEUED,
+        AnalysisJob.error_message: None,
+        AnalysisJob.updated_at: now,
+    }, synchronize_session=False)
+    db.commit()
+    db.refresh(job)
+
+    if not claimed:
+        return job
+    return _enqueue(db, job, enqueue)
+
+
+def update_job(db: Session, project_id: str, stage: str, status: AnalysisJobStatus, error: Optional[str] = None):
+    """
+    Atualiza o status do job de uma análise (sem efeito se não houver job).
+
+    Args:
+        db: Sessão do banco de dados
+        project_id: ID do projeto
+        stage: Etapa
+        status: Novo status
+        error: Mensagem de erro (status FAILED)
+    """
+    updated = db.query(AnalysisJob).filter(
+        AnalysisJob.project_id == project_id,
+        AnalysisJob.stage == stage,
+    ).update({
+        AnalysisJob.status: status,
+        AnalysisJob.error_message: error,
+        AnalysisJob.updated_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    if updated:
+        db.commit()
@@ -0,0 +1,254 @@
+"""
+Processing Metrics Service - Domain Layer
+
+Medição de tempo e recursos por etapa do processamento.
+
+Cada tarefa mede suas etapas (tempo de parede, tempo de CPU, pico de
+memória residente e duração do áudio) e grava as medições na tabela
+processing_metrics. A API agrega as medições em percentis por etapa e
+por segundo de áudio, para planejamento de capacidade.
+
+Etapas que falham ou que foram retomadas de um checkpoint (processaram
+só parte do áudio) são gravadas com o seu status e ficam fora das taxas
+por segundo de áudio.
+"""
+import logging
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from domain.models.processing_metric import ProcessingMetric
+
+logger = logging.getLogger(__name__)
+
+# Etapas do pipeline, na ordem em que rodam
+STAGES = ("decode", "separate", "bpm", "click", "chords", "midi", "musicxml", "lyrics", "db_write")
+
+PERCENTILES = (50, 90, 99)
+
+# Status de uma medição
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_RESUMED = "resumed"
+
+# Intervalo de amostragem da memória residente durante uma etapa
+RSS_SAMPLE_INTERVAL = 0.1
+
+
+def current_rss_mb() -> Optional[float]:
+    """Memória residente atual do processo em MB (Linux), ou None."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * resource.getpagesize() / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def cpu_seconds() -> float:
+    """
+    Tempo de CPU (usuário + sistema) do processo e dos filhos já encerrados.
+
+    Inclui os processos de janelas paralelas da separação, que terminam
+    junto com a etapa.
+    """
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+class _RssSampler:
+    """Amostra a memória residente em segundo plano e guarda o pico."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class MetricsRecorder:
+    """
+    Mede as etapas de uma tarefa e grava as medições no banco.
+
+    Usage:
+        metrics = MetricsRecorder(project_id, task_id, audio_seconds=180.0)
+        with metrics.stage("separate") as record:
+            if resumed:
+                record["status"] = STATUS_RESUMED
+            separator.separate(...)
+        metrics.flush(db)
+    """
+
+    def __init__(self, project_id: str, task_id: Optional[str] = None, audio_seconds: Optional[float] = None):
+        """
+        Args:
+            project_id: ID do projeto
+            task_id: ID da tarefa Celery que executou as etapas
+            audio_seconds: Duração do áudio (pode ser definida depois)
+        """
+        self.project_id = project_id
+        self.task_id = task_id
+        self.audio_seconds = audio_seconds
+        self.records: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Mede a etapa executada no bloco (também quando ela falha).
+
+        Produz o registro da medição: o bloco pode marcá-lo como
+        STATUS_RESUMED; uma exceção o marca como STATUS_FAILED.
+        """
+        record = {"stage": name, "status": STATUS_OK}
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        with _RssSampler() as sampler:
+            try:
+                yield record
+            except BaseException:
+                record["status"] = STATUS_FAILED
+                raise
+            finally:
+                record.update(
+                    wall_seconds=time.perf_counter() - wall_start,
+                    cpu_seconds=cpu_seconds() - cpu_start,
+                    peak_rss_mb=sampler.peak,
+                )
+                self.records.append(record)
+
+    def flush(self, db: Session):
+        """
+        Grava as medições pendentes.
+
+        Falhas são apenas registradas em log: métricas nunca derrubam
+        o processamento.
+        """
+        if not self.records:
+            return
+        try:
+            db.add_all([
+                ProcessingMetric(
+                    project_id=self.project_id,
+                    task_id=self.task_id,
+                    audio_seconds=self.audio_seconds,
+                    **record,
+                )
+                for record in self.records
+            ])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Falha ao gravar métricas do projeto {self.project_id}: {e}")
+        self.records = []
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Percentil com interpolação linear de uma lista ordenada."""
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _summary(values: List[float]) -> Optional[Dict[str, float]]:
+    """Percentis de uma série (None se vazia)."""
+    if not values:
+        return None
+    values = sorted(values)
+    return {f"p{q}": round(_percentile(values, q), 4) for q in PERCENTILES}
+
+
+def seconds_per_audio_second(db: Session, stage: str, q: float = 50, limit: int = 1000) -> Optional[float]:
+    """
+    Percentil do tempo de parede por segundo de áudio de uma etapa.
+
+    Só medições concluídas: etapas que falharam ou foram retomadas pararam
+    antes de processar todo o áudio e puxariam a taxa para baixo.
+
+    Args:
+        db: Sessão do banco de dados
+        stage: Nome da etapa
+        q: Percentil (0-100)
+        limit: Quantidade máxima de medições consideradas (mais recentes)
+
+    Returns:
+        Segundos de processamento por segundo de áudio, ou None sem medições
+    """
+    rows = db.query(ProcessingMetric.wall_seconds, ProcessingMetric.audio_seconds).filter(
+        ProcessingMetric.stage == stage,
+        ProcessingMetric.status == STATUS_OK,
+        ProcessingMetric.audio_seconds > 0,
+    ).order_by(desc(ProcessingMetric.created_at)).limit(limit).all()
+    if not rows:
+        return None
+    return _percentile(sorted(wall / audio for wall, audio in rows), q)
+
+
+def stage_percentiles(db: Session, limit: int = 10000) -> Dict:
+    """
+    Agrega as medições mais recentes em percentis por etapa.
+
+    Args:
+        db: Sessão do banco de dados
+        limit: Quantidade máxima de medições consideradas (mais recentes)
+
+    Returns:
+        {"samples", "projects", "stages": {etapa: {count, incomplete,
+        wall_seconds, cpu_seconds, peak_rss_mb, wall_per_audio_second,
+        cpu_per_audio_second}}}; os percentis usam só as medições concluídas
+        (count) e incomplete conta as que falharam ou foram retomadas
+    """
+    rows = db.query(ProcessingMetric).order_by(desc(ProcessingMetric.created_at)).limit(limit).all()
+
+    by_stage: Dict[str, List[ProcessingMetric]] = {}
+    for row in rows:
+        by_stage.setdefault(row.stage, []).append(row)
+
+    ordered = [stage for stage in STAGES if stage in by_stage]
+    ordered += sorted(stage for stage in by_stage if stage not in STAGES)
+
+    stages = {}
+    for stage in ordered:
+        metrics = [m for m in by_stage[stage] if m.status == STATUS_OK]
+        with_audio = [m for m in metrics if m.audio_seconds]
+        stages[stage] = {
+            "count": len(metrics),
+            "incomplete": len(by_stage[stage]) - len(metrics),
+            "wall_seconds": _summary([m.wall_seconds for m in metrics]),
+            "cpu_seconds": _summary([m.cpu_seconds for m in metrics]),
+            "peak_rss_mb": _summary([m.peak_rss_mb for m in metrics if m.peak_rss_mb is not None]),
+            "wall_per_audio_second": _summary([m.wall_seconds / m.audio_seconds for m in with_audio]),
+            "cpu_per_audio_second": _summary([m.cpu_seconds / m.audio_seconds for m in with_audio]),
+        }
+
+    return {
+        "samples": len(rows),
+        "projects": len({row.project_id for row in rows}),
+        "stages": stages,
+    }
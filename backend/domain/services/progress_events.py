@@ -0,0 +1,81 @@
+"""
+Progress Events Service - Domain Layer
+
+Publicação de eventos de progresso dos projetos via Redis pub/sub.
+
+Os workers Celery rodam em outros processos e não alcançam as conexões
+WebSocket da API. Cada mudança de progresso é publicada em um canal
+Redis; cada processo da API assina o canal (application/websocket/bridge)
+e repassa os eventos para os seus sockets locais.
+
+A publicação nunca interrompe o processamento: sem Redis, o evento é
+descartado (o status continua disponível em /api/status).
+"""
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Canal de eventos de progresso
+PROGRESS_CHANNEL = os.getenv("PROGRESS_CHANNEL", "isomix:progress")
+
+_client = None
+
+
+def get_redis():
+    """Cliente Redis síncrono do processo (criado na primeira publicação)."""
+    global _client
+    if _client is None:
+        import redis
+
+        _client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    return _client
+
+
+def progress_event(
+    project_id: str,
+    status: str,
+    progress: int = 0,
+    message: str = "",
+    error: Optional[str] = None,
+) -> Dict:
+    """Evento de progresso no formato enviado aos WebSockets."""
+    return {
+        "type": "project_status",
+        "project_id": project_id,
+        "status": status,
+        "progress": progress,
+        "message": message,
+        "error": error,
+    }
+
+
+def publish_progress(
+    project_id: str,
+    status: str,
+    progress: int = 0,
+    message: str = "",
+    error: Optional[str] = None,
+) -> bool:
+    """
+    Publica um evento de progresso no canal Redis.
+
+    Args:
+        project_id: ID do projeto
+        status: Status atual (pending, processing, ready, failed)
+        progress: Porcentagem de progresso (0-100)
+        message: Mensagem descritiva
+        error: Mensagem de erro (se aplicável)
+
+    Returns:
+        True se o evento foi publicado
+    """
+    event = progress_event(project_id, status, progress, message, error)
+    try:
+        get_redis().publish(PROGRESS_CHANNEL, json.dumps(event))
+        return True
+    except Exception as e:
+        logger.warning(f"Falha ao publicar progresso do projeto {project_id}: {e}")
+        return False
@@ -0,0 +1,79 @@
+"""
+Project Lease Service - Domain Layer
+
+Lease do processamento de um projeto.
+
+Retries do cliente e redeliveries do broker podem entregar a mesma
+tarefa de processamento mais de uma vez. Antes de separar, a tarefa
+adquire o lease do projeto com um UPDATE condicional; entregas que não
+conseguem o lease (outra execução em andamento) terminam sem fazer nada.
+O lease expira sozinho, para que um worker morto não bloqueie o projeto.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from domain.models.project import Project, ProjectStatus
+
+logger = logging.getLogger(__name__)
+
+
+def acquire_lease(
+    db: Session,
+    project_id: str,
+    owner: str,
+    seconds: int,
+    status: Optional[ProjectStatus] = None,
+) -> bool:
+    """
+    Adquire o lease do projeto se estiver livre ou expirado.
+
+    Args:
+        db: Sessão do banco de dados
+        project_id: ID do projeto
+        owner: Identificador único da execução
+        seconds: Duração do lease
+        status: Novo status do projeto, gravado no mesmo UPDATE
+
+    Returns:
+        True se o lease foi adquirido
+    """
+    now = datetime.utcnow()
+    values = {
+        Project.lease_owner: owner,
+        Project.lease_expires_at: now + timedelta(seconds=seconds),
+    }
+    if status is not None:
+        values[Project.status] = status
+
+    claimed = db.query(Project).filter(
+        Project.id == project_id,
+        or_(Project.lease_owner.is_(None), Project.lease_expires_at < now),
+    ).update(values, synchronize_session=False)
+    db.commit()
+
+    if not claimed:
+        logger.info(f"Projeto {project_id} já está sendo processado por outra execução")
+    return bool(claimed)
+
+
+def release_lease(db: Session, project_id: str, owner: str):
+    """
+    Libera o lease do projeto (apenas se ainda pertencer a `owner`).
+
+    Args:
+        db: Sessão do banco de dados
+        project_id: ID do projeto
+        owner: Identificador da execução que adquiriu o lease
+    """
+    db.query(Project).filter(
+        Project.id == project_id,
+        Project.lease_owner == owner,
+    ).update({
+        Project.lease_owner: None,
+        Project.lease_expires_at: None,
+    }, synchronize_session=False)
+    db.commit()
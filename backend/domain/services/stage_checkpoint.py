@@ -0,0 +1,103 @@
+"""
+Stage Checkpoint Service - Domain Layer
+
+Checkpoints por etapa do pipeline de processamento.
+
+Cada etapa concluída (separação, BPM, acordes, partitura, letras) grava
+sua versão, seu resultado e os arquivos que produziu. Um retry ou
+reprocessamento reaproveita a etapa se a versão for a atual e os
+arquivos ainda existirem, e refaz apenas o que falhou.
+"""
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from domain.models.project_stage import ProjectStage
+
+logger = logging.getLogger(__name__)
+
+
+def load_stage(db: Session, project_id: str, stage: str, version: str) -> Optional[Dict]:
+    """
+    Retorna o resultado gravado de uma etapa, se ainda for válido.
+
+    Args:
+        db: Sessão do banco de dados
+        project_id: ID do projeto
+        stage: Nome da etapa
+        version: Versão atual da etapa
+
+    Returns:
+        Resultado da etapa, ou None se não houver checkpoint válido
+    """
+    checkpoint = db.query(ProjectStage).filter(
+        ProjectStage.project_id == project_id,
+        ProjectStage.stage == stage,
+    ).first()
+    if checkpoint is None:
+        return None
+
+    if checkpoint.version != version:
+        logger.info(f"Checkpoint de {stage} desatualizado ({checkpoint.version} != {version})")
+        return None
+
+    missing = [path for path in json.loads(checkpoint.files) if not Path(path).exists()]
+    if missing:
+        logger.info(f"Checkpoint de {stage} sem arquivos de saída: {missing}")
+        return None
+
+    return json.loads(checkpoint.result)
+
+
+def save_stage(
+    db: Session,
+    project_id: str,
+    stage: str,
+    version: str,
+    result: Dict,
+    files: List[str],
+):
+    """
+    Grava (ou substitui) o checkpoint de uma etapa concluída.
+
+    Args:
+        db: Sessão do banco de dados
+        project_id: ID do projeto
+        stage: Nome da etapa
+        version: Versão da etapa que produziu o resultado
+        result: Resultado da etapa (serializável em JSON)
+        files: Arquivos de saída que precisam existir para reaproveitar
+    """
+    checkpoint = db.query(ProjectStage).filter(
+        ProjectStage.project_id == project_id,
+        ProjectStage.stage == stage,
+    ).first()
+    if checkpoint is None:
+        checkpoint = ProjectStage(project_id=project_id, stage=stage)
+        db.add(checkpoint)
+
+    checkpoint.version = version
+    checkpoint.result = json.dumps(result)
+    checkpoint.files = json.dumps([str(path) for path in files])
+    checkpoint.completed_at = datetime.utcnow()
+    db.commit()
+
+
+def clear_stages(db: Session, project_id: str, stages: Optional[Iterable[str]] = None):
+    """
+    Remove checkpoints de um projeto (todos, ou só as etapas indicadas).
+
+    Args:
+        db: Sessão do banco de dados
+        project_id: ID do projeto
+        stages: Etapas a invalidar (None = todas)
+    """
+    query = db.query(ProjectStage).filter(ProjectStage.project_id == project_id)
+    if stages is not None:
+        query = query.filter(ProjectStage.stage.in_(list(stages)))
+    query.delete(synchronize_session=False)
+    db.commit()
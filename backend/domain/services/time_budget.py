@@ -0,0 +1,101 @@
+"""
+Time Budget Service - Domain Layer
+
+Orçamento de tempo por job e controle de admissão de uploads.
+
+O tempo limite da separação deixa de ser fixo: cada job recebe um limite
+proporcional à duração do áudio, calculado com o throughput medido da
+separação (p90 de segundos de processamento por segundo de áudio, em
+processing_metrics) e uma margem de segurança. Só separações concluídas
+entram na taxa: as que estouraram o tempo ou foram retomadas de um
+checkpoint processaram parte do áudio e encolheriam o orçamento
+(mais timeouts, orçamentos ainda menores).
+
+No upload, jobs que não cabem no limite máximo são recusados, e jobs que
+não terminariam a tempo com a fila atual são adiados (o cliente tenta de
+novo depois), antes de gastar CPU com eles.
+"""
+import os
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from domain.services.job_queue import DEFAULT_SECONDS_PER_AUDIO_SECOND, plan_wait_estimates
+from domain.services.processing_metrics import seconds_per_audio_second
+
+# Carga do modelo, decodificação e gravação dos stems (independe da duração)
+OVERHEAD_SECONDS = int(os.getenv("SEPARATION_BUDGET_OVERHEAD_SECONDS", "60"))
+
+# Margem sobre o p90 medido
+SAFETY_FACTOR = float(os.getenv("SEPARATION_BUDGET_SAFETY_FACTOR", "2.0"))
+
+# Limites do orçamento de um job
+MIN_TIME_LIMIT = int(os.getenv("SEPARATION_MIN_TIME_LIMIT", "120"))
+MAX_TIME_LIMIT = int(os.getenv("SEPARATION_MAX_TIME_LIMIT", "3600"))
+
+# Tempo máximo entre o upload e o fim da separação (espera + processamento)
+MAX_TURNAROUND_SECONDS = {
+    "free": int(os.getenv("FREE_MAX_TURNAROUND_SECONDS", "3600")),
+    "pro": int(os.getenv("PRO_MAX_TURNAROUND_SECONDS", "1800")),
+}
+
+# Soft limit: margem para a tarefa gravar o estado antes do hard limit
+SOFT_LIMIT_MARGIN = 60
+
+
+def required_seconds(db: Session, duration_seconds: float) -> float:
+    """Tempo de separação (com margem) necessário para um áudio."""
+    rate = seconds_per_audio_second(db, "separate", q=90) or DEFAULT_SECONDS_PER_AUDIO_SECOND
+    return OVERHEAD_SECONDS + duration_seconds * rate * SAFETY_FACTOR
+
+
+def separation_time_limits(db: Session, duration_seconds: Optional[float]) -> Dict[str, int]:
+    """
+    Limites de tempo (hard e soft) da separação de um áudio.
+
+    Args:
+        db: Sessão do banco de dados
+        duration_seconds: Duração do áudio (None: usa o limite máximo)
+
+    Returns:
+        {"time_limit", "soft_time_limit"} (mesmo formato das filas)
+    """
+    if duration_seconds:
+        time_limit = int(min(max(required_seconds(db, duration_seconds), MIN_TIME_LIMIT), MAX_TIME_LIMIT))
+    else:
+        time_limit = MAX_TIME_LIMIT
+    return {"time_limit": time_limit, "soft_time_limit": max(time_limit - SOFT_LIMIT_MARGIN, 1)}
+
+
+def check_admission(db: Session, duration_seconds: float, plan: str) -> Dict:
+    """
+    Decide se um upload pode ser processado agora.
+
+    Args:
+        db: Sessão do banco de dados
+        duration_seconds: Duração do áudio
+        plan: Plano do usuário
+
+    Returns:
+        {"decision": "accept" | "reject" | "defer", "message",
+        "retry_after" (segundos, só em defer)}
+    """
+    if required_seconds(db, duration_seconds) > MAX_TIME_LIMIT:
+        return {
+            "decision": "reject",
+            "message": "Áudio muito longo para ser processado dentro do tempo limite",
+        }
+
+    rate = seconds_per_audio_second(db, "separate") or DEFAULT_SECONDS_PER_AUDIO_SECOND
+    wait = plan_wait_estimates(db).get(plan, {}).get("estimated_wait_seconds", 0)
+    turnaround = wait + OVERHEAD_SECONDS + duration_seconds * rate
+    max_turnaround = MAX_TURNAROUND_SECONDS.get(plan, MAX_TURNAROUND_SECONDS["free"])
+
+    if turnaround > max_turnaround:
+        return {
+            "decision": "defer",
+            "message": "Fila de processamento cheia. Tente novamente em alguns minutos",
+            "retry_after": int(turnaround - max_turnaround) + 1,
+        }
+
+    return {"decision": "accept", "message": None}
@@ -6,10 +6,12 @@ Versão calibrada para melhor sincronização.
 """
 import logging
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Union
 import numpy as np
 import soundfile as sf
 
+from .decoded_audio import DecodedAudio, load_mono
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,13 +30,13 @@ class BPMDetector:
         self.click_frequency = click_frequency
         self.click_duration = click_duration
     
-    def detect_bpm(self, audio_path: Path) -> Tuple[float, np.ndarray]:
+    def detect_bpm(self, audio: Union[DecodedAudio, Path]) -> Tuple[float, np.ndarray]:
         """
         Detecta o BPM e os tempos dos beats no áudio.
         Usa algoritmo de beat tracking com parâmetros calibrados.
         
         Args:
-            audio_path: Caminho para o arquivo de áudio
+            audio: Áudio decodificado do projeto (ou caminho do arquivo)
             
         Returns:
             Tuple[bpm, beat_times]: BPM estimado e array com tempos dos beats
@@ -42,11 +44,12 @@ class BPMDetector:
         try:
             import librosa
             
-            logger.info(f"Detectando BPM de {audio_path}")
-            print(f"🎵 Detectando BPM de {audio_path.name}...")
+            logger.info(f"Detectando BPM de {audio}")
+            print(f"🎵 Detectando BPM de {audio.name}...")
             
-            # Carregar áudio
-            y, sr = librosa.load(str(audio_path), sr=22050, mono=True)
+            # Carregar áudio (decodificado uma única vez por projeto)
+            sr = 22050
+            y = load_mono(audio, sr)
             
             # Detecção de onset para melhor precisão
             onset_env = librosa.onset.onset_strength(
@@ -121,7 +124,7 @@ class BPMDetector:
     
     def generate_click_track(
         self, 
-        audio_path: Path, 
+        audio: Union[DecodedAudio, Path], 
         output_path: Path,
         bpm: Optional[float] = None,
         beat_times: Optional[np.ndarray] = None
@@ -131,7 +134,7 @@ class BPMDetector:
         Usa beats detectados e refinados para máxima precisão.
         
         Args:
-            audio_path: Caminho do áudio original (para obter duração)
+            audio: Áudio original decodificado (ou caminho do arquivo)
             output_path: Caminho para salvar o click track
             bpm: BPM (se já detectado)
             beat_times: Tempos dos beats (se já detectados)
@@ -143,12 +146,13 @@ class BPMDetector:
             import librosa
             
             # Carregar áudio original
-            y_original, sr_original = librosa.load(str(audio_path), sr=22050, mono=True)
+            sr_original = 22050
+            y_original = load_mono(audio, sr_original)
             duration = len(y_original) / sr_original
             
             # Detectar BPM se não fornecido
             if bpm is None or beat_times is None or len(beat_times) == 0:
-                bpm, beat_times = self.detect_bpm(audio_path)
+                bpm, beat_times = self.detect_bpm(audio)
             
             # Refinar tempos dos beats
             if len(beat_times) > 0:
@@ -6,10 +6,12 @@ Versão calibrada para maior precisão.
 """
 import logging
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Union
 import numpy as np
 import json
 
+from .decoded_audio import DecodedAudio, load_mono
+
 logger = logging.getLogger(__name__)
 
 
@@ -96,12 +98,12 @@ class ChordDetector:
         
         return best_match, float(best_score)
     
-    def detect_chords(self, audio_path: Path) -> List[Dict]:
+    def detect_chords(self, audio: Union[DecodedAudio, Path]) -> List[Dict]:
         """
         Detecta acordes do arquivo de áudio.
         
         Args:
-            audio_path: Caminho para o arquivo de áudio
+            audio: Áudio decodificado do projeto (ou caminho do arquivo)
             
         Returns:
             Lista de dicionários com {time, chord, confidence}
@@ -109,11 +111,12 @@ class ChordDetector:
         try:
             import librosa
             
-            logger.info(f"Detectando acordes de {audio_path}")
-            print(f"🎸 Detectando acordes de {audio_path.name}...")
+            logger.info(f"Detectando acordes de {audio}")
+            print(f"🎸 Detectando acordes de {audio.name}...")
             
-            # Carregar áudio
-            y, sr = librosa.load(str(audio_path), sr=22050, mono=True)
+            # Carregar áudio (decodificado uma única vez por projeto)
+            sr = 22050
+            y = load_mono(audio, sr)
             duration = len(y) / sr
             
             # Calcular chromagram usando CQT (mais preciso para música)
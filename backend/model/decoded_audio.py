@@ -0,0 +1,163 @@
+"""
+Decoded Audio - Model Layer
+
+Áudio decodificado uma única vez e compartilhado entre as análises.
+
+BPM, acordes, transcrição e letras precisam do mesmo áudio em mono, cada
+um em uma taxa de amostragem. Em vez de cada análise decodificar (e
+reamostrar) o arquivo de novo, o DecodedAudio decodifica o arquivo uma
+vez, reamostra uma vez por taxa pedida e guarda cada versão como `.npy`
+no diretório do projeto. As leituras seguintes são memory-mapped.
+"""
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mesmo resampler padrão do librosa.load
+RESAMPLE_TYPE = "soxr_hq"
+
+
+class DecodedAudio:
+    """
+    Versões mono de um arquivo de áudio, decodificadas sob demanda.
+
+    O arquivo é decodificado uma única vez na taxa nativa; cada taxa
+    pedida é reamostrada a partir dela uma única vez. O resultado é igual
+    ao de `librosa.load(path, sr=sr, mono=True)`.
+    """
+
+    def __init__(self, path: Path, cache_dir: Path):
+        """
+        Args:
+            path: Arquivo de áudio (original ou stem)
+            cache_dir: Diretório onde guardar as versões decodificadas
+        """
+        self.path = Path(path)
+        self.cache_dir = Path(cache_dir)
+        # Prefixo único por arquivo (stems diferentes podem ter o mesmo nome)
+        digest = hashlib.sha1(str(self.path.resolve()).encode()).hexdigest()[:8]
+        self._prefix = f"{self.path.stem}-{digest}"
+        self._arrays: Dict[int, np.ndarray] = {}
+
+    @property
+    def name(self) -> str:
+        """Nome do arquivo original (para logs)."""
+        return self.path.name
+
+    def __str__(self) -> str:
+        return str(self.path)
+
+    def _save(self, target: Path, data: np.ndarray):
+        """Grava um .npy de forma atômica."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(data, dtype=np.float32))
+        os.replace(tmp_path, target)
+
+    def _native(self):
+        """Retorna (amostras mono, taxa) na taxa nativa, decodificando uma vez."""
+        existing = sorted(self.cache_dir.glob(f"{self._prefix}.native-*.npy"))
+        if existing:
+            samplerate = int(existing[0].stem.rsplit("-", 1)[1])
+            return np.load(existing[0], mmap_mode="r"), samplerate
+
+        import soundfile as sf
+
+        logger.info(f"Decodificando {self.path.name}")
+        try:
+            data, samplerate = sf.read(str(self.path), dtype="float32", always_2d=True)
+            mono = data.mean(axis=1)
+        except RuntimeError:
+            # Formatos não suportados pelo soundfile (m4a, aac): via librosa/ffmpeg
+            import librosa
+
+            mono, samplerate = librosa.load(str(self.path), sr=None, mono=True)
+
+        target = self.cache_dir / f"{self._prefix}.native-{samplerate}.npy"
+        self._save(target, mono)
+        return np.load(target, mmap_mode="r"), samplerate
+
+    def load(self, samplerate: int) -> np.ndarray:
+        """
+        Retorna o áudio mono na taxa pedida (somente leitura, memory-mapped).
+
+        Args:
+            samplerate: Taxa de amostragem desejada
+
+        Returns:
+            Array float32 (amostras,)
+        """
+        if samplerate in self._arrays:
+            return self._arrays[samplerate]
+
+        target = self.cache_dir / f"{self._prefix}.{samplerate}.npy"
+        if not target.exists():
+            native, native_rate = self._native()
+            if native_rate == samplerate:
+                data = native
+            else:
+                import librosa
+
+                logger.info(f"Reamostrando {self.path.name}: {native_rate} -> {samplerate} Hz")
+                data = librosa.resample(
+                    np.asarray(native), orig_sr=native_rate, target_sr=samplerate, res_type=RESAMPLE_TYPE
+                )
+            self._save(target, data)
+
+        self._arrays[samplerate] = np.load(target, mmap_mode="r")
+        return self._arrays[samplerate]
+
+    def wav_path(self, samplerate: int) -> Path:
+        """
+        Materializa a versão mono na taxa pedida como WAV.
+
+        Para bibliotecas que só aceitam caminhos: ao ler o WAV já na taxa
+        de trabalho delas, não há nova reamostragem.
+        """
+        import soundfile as sf
+
+        target = self.cache_dir / f"{self._prefix}.{samplerate}.wav"
+        if not target.exists():
+            tmp_path = self.cache_dir / f"{self._prefix}.{samplerate}.tmp.wav"
+            sf.write(str(tmp_path), self.load(samplerate), samplerate, subtype="FLOAT")
+            os.replace(tmp_path, target)
+        return target
+
+    def duration(self) -> float:
+        """Duração em segundos (sem decodificar, se possível)."""
+        for samplerate, data in self._arrays.items():
+            return len(data) / samplerate
+
+        import soundfile as sf
+
+        try:
+            return sf.info(str(self.path)).duration
+        except RuntimeError:
+            return len(self.load(22050)) / 22050
+
+
+def load_mono(audio: Union[DecodedAudio, Path, str], samplerate: int) -> np.ndarray:
+    """
+    Carrega áudio mono na taxa pedida a partir de um DecodedAudio ou caminho.
+
+    Args:
+        audio: Áudio compartilhado do projeto ou caminho do arquivo
+        samplerate: Taxa de amostragem desejada
+
+    Returns:
+        Array float32 (amostras,)
+    """
+    if isinstance(audio, DecodedAudio):
+        return audio.load(samplerate)
+
+    import librosa
+
+    y, _ = librosa.load(str(audio), sr=samplerate, mono=True)
+    return y
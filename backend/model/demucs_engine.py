@@ -5,11 +5,18 @@ Implementação do separador de áudio usando o modelo Demucs (Meta Research).
 """
 import logging
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Any, Optional
 import subprocess
+import threading
 import os
 
-from .separator import AudioSeparator, StemType, AudioProcessingError
+from celery.exceptions import SoftTimeLimitExceeded
+
+from .separator import AudioSeparator, StemType, AudioProcessingError, ProgressCallback
+from .segmentation import (
+    OverlapAddWriter, plan_windows, read_window, mix_statistics, pcm_source,
+    output_stem_names, collapse_two_stems,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +29,7 @@ class DemucsEngine(AudioSeparator):
     que oferece alta qualidade na separação de fontes.
     """
     
-    def __init__(self, model_name: str = "htdemucs"):
+    def __init__(self, model_name: str = "htdemucs", two_stems: Optional[str] = None, timeout: Optional[int] = None):
         """
         Inicializa o motor Demucs.
         
@@ -31,11 +38,22 @@ class DemucsEngine(AudioSeparator):
                 - htdemucs: Hybrid Transformer Demucs (recomendado)
                 - htdemucs_ft: Fine-tuned version
                 - mdx_extra: Modelo extra de alta qualidade
+            two_stems: Gerar apenas este stem e o acompanhamento
+                (ex.: "vocals" -> vocals + no_vocals, para karaokê)
+            timeout: Tempo máximo da CLI em segundos (orçamento do job;
+                padrão: DEMUCS_TIMEOUT)
         """
         self.model_name = model_name
+        self.two_stems = two_stems
+        self.timeout = timeout or int(os.getenv("DEMUCS_TIMEOUT", "600"))
         logger.info(f"DemucsEngine inicializado com modelo: {model_name}")
     
-    def separate(self, input_path: Path, output_dir: Path) -> Dict[StemType, Path]:
+    def separate(
+        self,
+        input_path: Path,
+        output_dir: Path,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> Dict[StemType, Path]:
         """
         Separa o áudio usando Demucs.
         
@@ -59,6 +77,8 @@ class DemucsEngine(AudioSeparator):
                 "-o", str(output_dir),
                 str(input_path)
             ]
+            if self.two_stems:
+                cmd[1:1] = ["--two-stems", self.two_stems]
             
             logger.info(f"Executando comando: {' '.join(cmd)}")
             print(f"🎵 Executando Demucs: {' '.join(cmd)}")
@@ -67,7 +87,7 @@ class DemucsEngine(AudioSeparator):
                 cmd,
                 capture_output=True,
                 text=True,
-                timeout=600  # 10 minutos de timeout
+                timeout=self.timeout
             )
             
             print(f"🎵 Demucs stdout: {result.stdout}")
@@ -87,17 +107,26 @@ class DemucsEngine(AudioSeparator):
                 StemType.BASS: stem_dir / "bass.wav",
                 StemType.OTHER: stem_dir / "other.wav",
             }
+            if self.two_stems:
+                stems = {
+                    StemType(name): stem_dir / f"{name}.wav"
+                    for name in (self.two_stems, f"no_{self.two_stems}")
+                }
             
             # Verificar se todos os stems foram gerados
             for stem_type, stem_path in stems.items():
                 if not stem_path.exists():
                     raise AudioProcessingError(f"Stem {stem_type} não foi gerado")
             
+            # A CLI não expõe progresso intermediário
+            if progress_callback:
+                progress_callback(1, 1)
+            
             logger.info(f"Separação concluída com sucesso: {len(stems)} stems gerados")
             return stems
             
         except subprocess.TimeoutExpired:
-            raise AudioProcessingError("Processamento excedeu o tempo limite (10 minutos)")
+            raise AudioProcessingError(f"Processamento excedeu o tempo limite ({self.timeout}s)")
         except Exception as e:
             logger.exception("Erro inesperado na separação")
             raise AudioProcessingError(f"Erro ao processar áudio: {str(e)}")
@@ -128,19 +157,473 @@ class DemucsEngine(AudioSeparator):
         return True, ""
 
 
+# Tipos de separador que mantêm o modelo residente no worker
+RESIDENT_MODEL_TYPES = {"demucs_resident", "demucs_segmented", "demucs_fast"}
+
+# Tipos de separador que usam o modelo quantizado (int8)
+QUANTIZED_MODEL_TYPES = {"demucs_fast"}
+
+# Modelos Demucs residentes neste processo (um por nome de modelo)
+_resident_models: Dict[str, Any] = {}
+_resident_lock = threading.Lock()
+
+
+def resident_model_key(model_name: str, quantized: bool = False) -> str:
+    """Chave do modelo residente (o modelo quantizado é uma instância à parte)."""
+    return f"{model_name}:int8" if quantized else model_name
+
+
+def quantize_model(model):
+    """
+    Aplica quantização dinâmica int8 nas camadas lineares do modelo.
+    
+    Cobre as projeções e o feed-forward do transformer do HTDemucs; as
+    convoluções continuam em float. Os pesos são convertidos uma única vez
+    e as ativações são quantizadas em tempo de execução, sem calibração.
+    
+    Args:
+        model: Modelo Demucs (modificado in-place)
+        
+    Returns:
+        Modelo quantizado em modo de avaliação
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+    
+    model = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    model.eval()
+    return model
+
+
+def get_resident_model(model_name: str = "htdemucs", quantized: bool = False):
+    """
+    Retorna o modelo Demucs residente no processo atual.
+    
+    Na primeira chamada o modelo é carregado via API Python do Demucs
+    (torch + pesos); as chamadas seguintes reutilizam a mesma instância,
+    que permanece em memória entre as tarefas do worker.
+    
+    Args:
+        model_name: Nome do modelo Demucs pré-treinado
+        quantized: Se deve usar a variante com quantização dinâmica int8
+        
+    Returns:
+        Modelo Demucs em modo de avaliação
+    """
+    key = resident_model_key(model_name, quantized)
+    with _resident_lock:
+        model = _resident_models.get(key)
+        if model is None:
+            from demucs.pretrained import get_model
+            
+            logger.info(f"Carregando modelo Demucs residente: {key}")
+            model = get_model(model_name)
+            model.eval()
+            if quantized:
+                model = quantize_model(model)
+            _resident_models[key] = model
+        return model
+
+
+def _separate_window(model, window, mean: float, std: float, shifts: int, overlap: float, seed: int):
+    """
+    Separa uma janela (amostras, canais) e retorna (fontes, amostras, canais).
+    
+    A semente fixa por janela torna os deslocamentos aleatórios do Demucs
+    reprodutíveis: uma janela refeita após retomada gera a mesma saída.
+    """
+    import random
+    import torch
+    from demucs.apply import apply_model
+    
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        mix = torch.from_numpy(window.T.copy())
+        mix = (mix - mean) / std
+        with torch.no_grad():
+            out = apply_model(model, mix[None], shifts=shifts, split=True, overlap=overlap)[0]
+        out = out * std + mean
+        return out.numpy().transpose(0, 2, 1)
+    finally:
+        random.setstate(state)
+
+
+# Modelo usado pelos processos do pool de janelas (um por processo)
+_pool_model = None
+
+
+def _init_window_worker(model_name: str, threads: int, quantized: bool = False):
+    """
+    Inicializa um processo do pool de janelas.
+    
+    Limita as threads do torch à fatia do orçamento de CPU deste processo.
+    Com fork, o modelo residente do processo pai é herdado (pesos
+    compartilhados copy-on-write); caso contrário é carregado aqui.
+    """
+    global _pool_model
+    import torch
+    
+    torch.set_num_threads(threads)
+    _pool_model = get_resident_model(model_name, quantized)
+
+
+def _separate_pool_window(pcm_path: str, start: int, end: int, channels: int,
+                          mean: float, std: float, shifts: int, overlap: float, seed: int):
+    """Lê e separa uma janela dentro de um processo do pool."""
+    import soundfile as sf
+    
+    with sf.SoundFile(pcm_path) as source:
+        window = read_window(source, start, end, channels)
+    return _separate_window(_pool_model, window, mean, std, shifts, overlap, seed)
+
+
+class ResidentDemucsEngine(DemucsEngine):
+    """
+    Motor de separação Demucs in-process.
+    
+    Em vez de executar a CLI `demucs` a cada projeto (novo interpretador,
+    import do torch e recarga dos pesos), mantém o modelo residente no
+    processo do worker e chama `apply_model` diretamente sobre tensores.
+    Os stems são gravados no mesmo layout da CLI.
+    
+    Com `segment_seconds` definido, a faixa é processada em janelas
+    sobrepostas gravadas direto nos stems (memória constante) e com
+    checkpoint por janela, permitindo retomar após uma interrupção.
+    Com `workers` > 1, as janelas são distribuídas em um pool de processos
+    dentro do orçamento de `cpu_cores`; a costura é a mesma do modo serial.
+    Com `quantized`, usa o modelo com camadas lineares em int8 (mais rápido
+    em CPU, com alguma perda de qualidade).
+    """
+    
+    def __init__(
+        self,
+        model_name: str = "htdemucs",
+        shifts: int = 1,
+        overlap: float = 0.25,
+        segment_seconds: Optional[float] = None,
+        segment_overlap: float = 2.0,
+        workers: int = 1,
+        cpu_cores: Optional[int] = None,
+        quantized: bool = False,
+        two_stems: Optional[str] = None,
+    ):
+        """
+        Args:
+            model_name: Nome do modelo Demucs a usar
+            shifts: Número de deslocamentos aleatórios (mesmo padrão da CLI)
+            overlap: Sobreposição entre os trechos processados pelo modelo
+            segment_seconds: Tamanho da janela do modo segmentado (None = faixa inteira)
+            segment_overlap: Sobreposição entre janelas em segundos (crossfade)
+            workers: Processos separando janelas em paralelo (modo segmentado)
+            cpu_cores: Orçamento de núcleos da separação (padrão: todos)
+            quantized: Usar quantização dinâmica int8 (modo "fast")
+            two_stems: Gravar apenas este stem e o acompanhamento
+        """
+        super().__init__(model_name, two_stems)
+        self.shifts = shifts
+        self.overlap = overlap
+        self.segment_seconds = segment_seconds
+        self.segment_overlap = segment_overlap
+        self.workers = max(1, workers)
+        self.cpu_cores = cpu_cores or os.cpu_count() or 1
+        self.quantized = quantized
+        self.resumable = segment_seconds is not None
+    
+    def _load_audio(self, input_path: Path, model):
+        """
+        Decodifica o arquivo para um tensor (canais, amostras) na taxa do modelo.
+        
+        Usa soundfile para formatos suportados (WAV, FLAC, OGG) e cai para
+        o ffmpeg (via Demucs) nos demais, como m4a.
+        """
+        import torch
+        import soundfile as sf
+        from demucs.audio import AudioFile, convert_audio
+        
+        try:
+            data, sr = sf.read(str(input_path), dtype="float32", always_2d=True)
+            wav = torch.from_numpy(data.T.copy())
+            return convert_audio(wav, sr, model.samplerate, model.audio_channels)
+        except RuntimeError:
+            return AudioFile(input_path).read(
+                streams=0,
+                samplerate=model.samplerate,
+                channels=model.audio_channels,
+            )
+    
+    def _pcm_source(self, input_path: Path, work_dir: Path, model) -> Path:
+        """Arquivo legível em janelas na taxa e canais do modelo."""
+        return pcm_source(input_path, work_dir, model.samplerate, model.audio_channels)
+    
+    def _separate_whole(self, input_path: Path, stem_dir: Path, model) -> Dict[StemType, Path]:
+        """Separa a faixa inteira em uma única passada."""
+        import torch
+        from demucs.apply import apply_model
+        from demucs.audio import save_audio
+        
+        wav = self._load_audio(input_path, model)
+        
+        # Normalização igual à da CLI do Demucs
+        ref = wav.mean(0)
+        mean, std = ref.mean(), ref.std() + 1e-8
+        wav = (wav - mean) / std
+        
+        with torch.no_grad():
+            sources = apply_model(
+                model,
+                wav[None],
+                shifts=self.shifts,
+                split=True,
+                overlap=self.overlap,
+            )[0]
+        sources = sources * std + mean
+        
+        if self.two_stems:
+            sources = torch.from_numpy(collapse_two_stems(sources.numpy(), model.sources, self.two_stems))
+        
+        stems = {}
+        for name, source in zip(output_stem_names(model.sources, self.two_stems), sources):
+            stem_path = stem_dir / f"{name}.wav"
+            save_audio(source, stem_path, samplerate=model.samplerate)
+            stems[StemType(name)] = stem_path
+        return stems
+    
+    def _separate_segmented(
+        self, input_path: Path, stem_dir: Path, model, progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[StemType, Path]:
+        """
+        Separa a faixa em janelas sobrepostas com memória constante.
+        
+        Cada janela é lida, separada e somada (overlap-add) direto nos WAVs
+        dos stems. Se existir um checkpoint compatível, continua da próxima
+        janela pendente.
+        """
+        import soundfile as sf
+        
+        window_frames = int(self.segment_seconds * model.samplerate)
+        overlap_frames = int(self.segment_overlap * model.samplerate)
+        stem_paths = {
+            name: stem_dir / f"{name}.wav"
+            for name in output_stem_names(model.sources, self.two_stems)
+        }
+        stems = {StemType(name): path for name, path in stem_paths.items()}
+        
+        input_stat = input_path.stat()
+        writer = OverlapAddWriter(
+            stem_paths=stem_paths,
+            samplerate=model.samplerate,
+            channels=model.audio_channels,
+            overlap_frames=overlap_frames,
+            checkpoint_dir=stem_dir,
+            fingerprint={
+                "input": str(input_path),
+                "size": input_stat.st_size,
+                "mtime_ns": input_stat.st_mtime_ns,
+                "model": resident_model_key(self.model_name, self.quantized),
+                "shifts": self.shifts,
+                "overlap": self.overlap,
+                "window_frames": window_frames,
+                "overlap_frames": overlap_frames,
+                "two_stems": self.two_stems,
+            },
+        )
+        if writer.complete:
+            logger.info("Separação já concluída anteriormente (checkpoint)")
+            return stems
+        
+        pcm_path = self._pcm_source(input_path, stem_dir, model)
+        
+        with sf.SoundFile(str(pcm_path)) as source:
+            if source.frames == 0:
+                raise AudioProcessingError("Áudio sem amostras")
+            
+            windows = plan_windows(source.frames, window_frames, overlap_frames)
+            writer.open(source.frames)
+            try:
+                if "mean" not in writer.meta:
+                    mean, std = mix_statistics(source)
+                    writer.set_meta(mean=mean, std=std + 1e-8)
+                
+                if self.workers > 1:
+                    self._run_windows_parallel(pcm_path, windows, writer, model, progress_callback)
+                else:
+                    self._run_windows_serial(source, windows, writer, model, progress_callback)
+            finally:
+                writer.close()
+        
+        if pcm_path != input_path:
+            pcm_path.unlink(missing_ok=True)
+        
+        return stems
+    
+    def _run_windows_serial(self, source, windows, writer: OverlapAddWriter, model,
+                            progress_callback: Optional[ProgressCallback] = None):
+        """Separa as janelas pendentes uma a uma neste processo."""
+        if progress_callback:
+            progress_callback(writer.next_index, len(windows))
+        
+        for index in range(writer.next_index, len(windows)):
+            start, end = windows[index]
+            window = read_window(source, start, end, model.audio_channels)
+            sources = _separate_window(
+                model, window, writer.meta["mean"], writer.meta["std"],
+                self.shifts, self.overlap, seed=index,
+            )
+            writer.write(index, self._outputs(sources, model), is_last=index == len(windows) - 1)
+            print(f"🎵 Janela {index + 1}/{len(windows)} separada")
+            if progress_callback:
+                progress_callback(index + 1, len(windows))
+    
+    def _outputs(self, sources, model):
+        """Fontes de uma janela na ordem dos stems gravados."""
+        if self.two_stems:
+            return collapse_two_stems(sources, model.sources, self.two_stems)
+        return sources
+    
+    def _run_windows_parallel(self, pcm_path: Path, windows, writer: OverlapAddWriter, model,
+                              progress_callback: Optional[ProgressCallback] = None):
+        """
+        Separa as janelas pendentes em um pool de processos.
+        
+        No máximo 2 janelas por processo ficam em andamento (memória
+        limitada) e os resultados são gravados em ordem, então a saída e
+        os checkpoints são idênticos aos do modo serial.
+        """
+        import billiard
+        from collections import deque
+        
+        threads = max(1, self.cpu_cores // self.workers)
+        logger.info(f"Separando janelas com {self.workers} processos x {threads} threads")
+        
+        # Pool do billiard: o worker prefork do Celery é daemônico e o
+        # multiprocessing da stdlib não permite que ele crie processos filhos
+        pool = billiard.get_context("fork").Pool(
+            processes=self.workers,
+            initializer=_init_window_worker,
+            initargs=(self.model_name, threads, self.quantized),
+        )
+        if progress_callback:
+            progress_callback(writer.next_index, len(windows))
+        pending = deque()
+        next_submit = writer.next_index
+        
+        try:
+            for index in range(writer.next_index, len(windows)):
+                while next_submit < len(windows) and len(pending) < 2 * self.workers:
+                    start, end = windows[next_submit]
+                    pending.append(pool.apply_async(_separate_pool_window, (
+                        str(pcm_path), start, end, model.audio_channels,
+                        writer.meta["mean"], writer.meta["std"], self.shifts, self.overlap,
+                        next_submit,
+                    )))
+                    next_submit += 1
+                
+                sources = pending.popleft().get()
+                writer.write(index, self._outputs(sources, model), is_last=index == len(windows) - 1)
+                print(f"🎵 Janela {index + 1}/{len(windows)} separada")
+                if progress_callback:
+                    progress_callback(index + 1, len(windows))
+        finally:
+            # Não esperar janelas em andamento (ex.: soft time limit)
+            pool.terminate()
+    
+    def separate(
+        self,
+        input_path: Path,
+        output_dir: Path,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> Dict[StemType, Path]:
+        """
+        Separa o áudio com o modelo residente.
+        
+        Gera os mesmos 4 stems da CLI: vocals, drums, bass, other.
+        No modo segmentado, progress_callback é chamado a cada janela.
+        """
+        try:
+            logger.info(f"Iniciando separação in-process de {input_path}")
+            
+            # Validar arquivo
+            is_valid, error_msg = self.validate_audio(input_path)
+            if not is_valid:
+                raise AudioProcessingError(error_msg)
+            
+            model = get_resident_model(self.model_name, self.quantized)
+            
+            # Mesmo layout da CLI: output_dir/<modelo>/<nome_arquivo>/<stem>.wav
+            stem_dir = output_dir / self.model_name / input_path.stem
+            stem_dir.mkdir(parents=True, exist_ok=True)
+            
+            print(f"🎵 Separando com Demucs residente ({self.get_model_name()}): {input_path.name}")
+            if self.segment_seconds:
+                stems = self._separate_segmented(input_path, stem_dir, model, progress_callback)
+            else:
+                stems = self._separate_whole(input_path, stem_dir, model)
+                if progress_callback:
+                    progress_callback(1, 1)
+            
+            logger.info(f"Separação concluída com sucesso: {len(stems)} stems gerados")
+            return stems
+            
+        except (AudioProcessingError, SoftTimeLimitExceeded):
+            # Soft time limit: o checkpoint permite retomar em um retry
+            raise
+        except Exception as e:
+            logger.exception("Erro inesperado na separação")
+            raise AudioProcessingError(f"Erro ao processar áudio: {str(e)}")
+    
+    def get_model_name(self) -> str:
+        """Retorna o nome do modelo"""
+        if self.quantized:
+            return f"demucs-{self.model_name}-int8-resident"
+        return f"demucs-{self.model_name}-resident"
+
+
 # Factory para criar o separador correto
-def create_separator(model_type: str = "demucs") -> AudioSeparator:
+def create_separator(
+    model_type: str = "demucs", two_stems: Optional[str] = None, timeout: Optional[int] = None
+) -> AudioSeparator:
     """
     Factory para criar o separador de áudio apropriado.
     
     Args:
-        model_type: Tipo de modelo ("demucs" ou "spleeter")
+        model_type: Tipo de modelo ("demucs", "demucs_resident",
+            "demucs_segmented", "demucs_fast", "onnx" ou "spleeter")
+        two_stems: Gerar apenas este stem e o acompanhamento (ex.: "vocals")
+        timeout: Tempo máximo da CLI do Demucs em segundos (os motores
+            in-process são limitados pelo time limit da tarefa)
         
     Returns:
         Instância do separador
     """
+    model_name = os.getenv("AI_MODEL_QUALITY", "htdemucs")
+    
     if model_type == "demucs":
-        return DemucsEngine()
+        return DemucsEngine(model_name, two_stems=two_stems, timeout=timeout)
+    elif model_type == "demucs_resident":
+        return ResidentDemucsEngine(model_name, two_stems=two_stems)
+    elif model_type in ("demucs_segmented", "demucs_fast"):
+        # demucs_fast: mesmo modo segmentado, com o modelo quantizado em int8
+        return ResidentDemucsEngine(
+            model_name,
+            segment_seconds=float(os.getenv("DEMUCS_SEGMENT_SECONDS", "30")),
+            segment_overlap=float(os.getenv("DEMUCS_SEGMENT_OVERLAP", "2")),
+            workers=int(os.getenv("DEMUCS_WORKERS", "1")),
+            cpu_cores=int(os.getenv("DEMUCS_CPU_CORES", "0")) or None,
+            quantized=model_type in QUANTIZED_MODEL_TYPES,
+            two_stems=two_stems,
+        )
+    elif model_type == "onnx":
+        # Import local: o motor ONNX não depende de torch
+        from .onnx_engine import OnnxEngine
+        
+        return OnnxEngine(
+            os.getenv("ONNX_MODEL_PATH", "./models/htdemucs.onnx"),
+            threads=int(os.getenv("ONNX_THREADS", "0")) or None,
+            segment_seconds=float(os.getenv("ONNX_SEGMENT_SECONDS", "10")),
+            segment_overlap=float(os.getenv("ONNX_SEGMENT_OVERLAP", "1")),
+            two_stems=two_stems,
+        )
     elif model_type == "spleeter":
         # TODO: Implementar SpleeterEngine
         raise NotImplementedError("Spleeter ainda não implementado")
@@ -6,12 +6,18 @@ import logging
 import os
 import json
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
 
+import numpy as np
 import whisper
 
+from .decoded_audio import DecodedAudio
+
 logger = logging.getLogger(__name__)
 
+# Taxa de trabalho do Whisper (whisper.audio.SAMPLE_RATE)
+WHISPER_SAMPLE_RATE = 16000
+
 class LyricTranscriber:
     def __init__(self, model_name: str = "base"):
         """
@@ -28,12 +34,20 @@ class LyricTranscriber:
             self._model = whisper.load_model(self.model_name)
         return self._model
 
-    def transcribe(self, audio_path: Path, output_dir: Path) -> Optional[str]:
+    def transcribe(self, audio: Union[DecodedAudio, Path], output_dir: Path) -> Optional[str]:
         """
         Transcreve o áudio de forma generalista (auto-idioma) e com filtros anti-alucinação.
+        
+        Com DecodedAudio, o Whisper recebe o array mono a 16 kHz já
+        decodificado em vez de decodificar o arquivo com ffmpeg.
         """
         try:
-            audio_path_str = str(audio_path)
+            audio_path_str = str(audio)
+            if isinstance(audio, DecodedAudio):
+                # Cópia gravável: o array compartilhado é memory-mapped somente leitura
+                whisper_input = np.array(audio.load(WHISPER_SAMPLE_RATE), dtype=np.float32)
+            else:
+                whisper_input = audio_path_str
             output_path = output_dir / "lyrics.json"
             logger.info(f"Iniciando transcrição generalista para {audio_path_str}")
             
@@ -42,7 +56,7 @@ class LyricTranscriber:
             # - No initial_prompt para evitar distrações/vieses
             # - temperature variada para sair de loops de repetição
             result = self.model.transcribe(
-                audio_path_str, 
+                whisper_input, 
                 verbose=False, 
                 fp16=False,
                 language=None, # Detecção automática de idioma (PT, EN, ES, etc.)
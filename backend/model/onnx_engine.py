@@ -0,0 +1,296 @@
+"""
+ONNX Engine - Model Layer
+
+Implementação do separador de áudio usando ONNX Runtime (CPU).
+
+Executa um grafo de separação exportado para ONNX, sem importar o torch
+no worker. O grafo recebe uma janela de tamanho fixo (1, canais, amostras)
+e retorna (1, fontes, canais, amostras); a faixa é processada em janelas
+sobrepostas gravadas direto nos stems, como no modo segmentado do Demucs.
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from celery.exceptions import SoftTimeLimitExceeded
+
+from .separator import AudioSeparator, StemType, AudioProcessingError, ProgressCallback
+from .segmentation import (
+    OverlapAddWriter, plan_windows, read_window, mix_statistics, pcm_source,
+    output_stem_names, collapse_two_stems,
+)
+
+logger = logging.getLogger(__name__)
+
+# Metadados padrão quando o grafo não os declara (custom_metadata_map)
+DEFAULT_SOURCES = ("drums", "bass", "other", "vocals")
+DEFAULT_SAMPLERATE = 44100
+DEFAULT_CHANNELS = 2
+
+# Sessões ONNX Runtime residentes neste processo (uma por grafo/threads)
+_sessions: Dict[Tuple[str, int], object] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_onnx_session(model_path: str, threads: int):
+    """
+    Retorna a sessão ONNX Runtime residente para um grafo.
+    
+    A sessão é criada uma vez por processo com otimizações de grafo
+    completas, execução sequencial e um pool intra-op de `threads`
+    threads (sem pool inter-op, que só compete pelos mesmos núcleos).
+    
+    Args:
+        model_path: Caminho do arquivo .onnx
+        threads: Threads intra-op
+    
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    key = (model_path, threads)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            import onnxruntime as ort
+            
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+            options.enable_cpu_mem_arena = True
+            
+            logger.info(f"Carregando grafo ONNX: {model_path} ({threads} threads)")
+            session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            _sessions[key] = session
+        return session
+
+
+class OnnxEngine(AudioSeparator):
+    """
+    Motor de separação usando ONNX Runtime em CPU.
+    
+    Fontes, taxa de amostragem e canais são lidos dos metadados do grafo
+    ("sources", "samplerate", "audio_channels"). Os buffers de entrada e
+    saída são alocados uma vez por separação e ligados à sessão via
+    I/O binding, então cada janela é escrita e lida no mesmo lugar, sem
+    cópias nem alocações por janela.
+    """
+    
+    # Cada janela concluída é registrada em checkpoint
+    resumable = True
+    
+    def __init__(
+        self,
+        model_path: str,
+        threads: Optional[int] = None,
+        segment_seconds: Optional[float] = None,
+        segment_overlap: float = 1.0,
+        two_stems: Optional[str] = None,
+    ):
+        """
+        Inicializa o motor ONNX.
+        
+        Args:
+            model_path: Caminho do grafo .onnx exportado
+            threads: Threads intra-op do ONNX Runtime (padrão: todos os núcleos)
+            segment_seconds: Tamanho da janela quando o grafo tem eixo de
+                tempo dinâmico (grafos com tamanho fixo usam o do grafo)
+            segment_overlap: Sobreposição entre janelas em segundos (crossfade)
+            two_stems: Gravar apenas este stem e o acompanhamento (ex.: "vocals")
+        """
+        self.model_path = Path(model_path)
+        self.threads = threads or os.cpu_count() or 1
+        self.segment_seconds = segment_seconds
+        self.segment_overlap = segment_overlap
+        self.two_stems = two_stems
+        logger.info(f"OnnxEngine inicializado com grafo: {self.model_path}")
+    
+    def _graph_info(self, session) -> dict:
+        """Lê fontes, taxa, canais e tamanho da janela da sessão."""
+        metadata = session.get_modelmeta().custom_metadata_map
+        sources = metadata.get("sources")
+        samplerate = int(metadata.get("samplerate", DEFAULT_SAMPLERATE))
+        
+        input_meta = session.get_inputs()[0]
+        channels = input_meta.shape[1] if isinstance(input_meta.shape[1], int) else \
+            int(metadata.get("audio_channels", DEFAULT_CHANNELS))
+        
+        window_frames = input_meta.shape[2]
+        if not isinstance(window_frames, int):
+            if not self.segment_seconds:
+                raise AudioProcessingError("Grafo com eixo de tempo dinâmico requer segment_seconds")
+            window_frames = int(self.segment_seconds * samplerate)
+        
+        return {
+            "sources": sources.split(",") if sources else list(DEFAULT_SOURCES),
+            "samplerate": samplerate,
+            "channels": channels,
+            "window_frames": window_frames,
+            "input_name": input_meta.name,
+            "output_name": session.get_outputs()[0].name,
+        }
+    
+    def _run_windows(self, session, info: dict, source, windows, writer: OverlapAddWriter,
+                     progress_callback: Optional[ProgressCallback] = None):
+        """Separa as janelas pendentes com buffers pré-alocados."""
+        import onnxruntime as ort
+        
+        window_frames = info["window_frames"]
+        mix = np.zeros((1, info["channels"], window_frames), dtype=np.float32)
+        out = np.zeros((1, len(info["sources"]), info["channels"], window_frames), dtype=np.float32)
+        
+        binding = session.io_binding()
+        binding.bind_ortvalue_input(info["input_name"], ort.OrtValue.ortvalue_from_numpy(mix))
+        binding.bind_ortvalue_output(info["output_name"], ort.OrtValue.ortvalue_from_numpy(out))
+        
+        if progress_callback:
+            progress_callback(writer.next_index, len(windows))
+        
+        mean, std = writer.meta["mean"], writer.meta["std"]
+        for index in range(writer.next_index, len(windows)):
+            start, end = windows[index]
+            frames = end - start
+            
+            # Janela normalizada no buffer de entrada (resto zerado na última)
+            window = read_window(source, start, end, info["channels"])
+            mix[0, :, :frames] = (window.T - mean) / std
+            mix[0, :, frames:] = 0
+            
+            session.run_with_iobinding(binding)
+            
+            sources = (out[0, :, :, :frames] * std + mean).transpose(0, 2, 1)
+            if self.two_stems:
+                sources = collapse_two_stems(sources, info["sources"], self.two_stems)
+            writer.write(index, sources, is_last=index == len(windows) - 1)
+            print(f"🎵 Janela {index + 1}/{len(windows)} separada")
+            if progress_callback:
+                progress_callback(index + 1, len(windows))
+    
+    def _separate_segmented(
+        self, session, input_path: Path, stem_dir: Path, progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[StemType, Path]:
+        """Separa a faixa em janelas com checkpoint, como o modo segmentado do Demucs."""
+        import soundfile as sf
+        
+        info = self._graph_info(session)
+        overlap_frames = int(self.segment_overlap * info["samplerate"])
+        stem_paths = {
+            name: stem_dir / f"{name}.wav"
+            for name in output_stem_names(info["sources"], self.two_stems)
+        }
+        stems = {StemType(name): path for name, path in stem_paths.items()}
+        
+        input_stat = input_path.stat()
+        model_stat = self.model_path.stat()
+        writer = OverlapAddWriter(
+            stem_paths=stem_paths,
+            samplerate=info["samplerate"],
+            channels=info["channels"],
+            overlap_frames=overlap_frames,
+            checkpoint_dir=stem_dir,
+            fingerprint={
+                "input": str(input_path),
+                "size": input_stat.st_size,
+                "mtime_ns": input_stat.st_mtime_ns,
+                "model": str(self.model_path),
+                "model_mtime_ns": model_stat.st_mtime_ns,
+                "window_frames": info["window_frames"],
+                "overlap_frames": overlap_frames,
+                "two_stems": self.two_stems,
+            },
+        )
+        if writer.complete:
+            logger.info("Separação já concluída anteriormente (checkpoint)")
+            return stems
+        
+        pcm_path = pcm_source(input_path, stem_dir, info["samplerate"], info["channels"])
+        
+        with sf.SoundFile(str(pcm_path)) as source:
+            if source.frames == 0:
+                raise AudioProcessingError("Áudio sem amostras")
+            
+            windows = plan_windows(source.frames, info["window_frames"], overlap_frames)
+            writer.open(source.frames)
+            try:
+                if "mean" not in writer.meta:
+                    mean, std = mix_statistics(source)
+                    writer.set_meta(mean=mean, std=std + 1e-8)
+                
+                self._run_windows(session, info, source, windows, writer, progress_callback)
+            finally:
+                writer.close()
+        
+        if pcm_path != input_path:
+            pcm_path.unlink(missing_ok=True)
+        
+        return stems
+    
+    def separate(
+        self,
+        input_path: Path,
+        output_dir: Path,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> Dict[StemType, Path]:
+        """
+        Separa o áudio com o grafo ONNX.
+        
+        Os stems são gravados no mesmo layout da CLI do Demucs:
+        output_dir/<grafo>/<nome_arquivo>/<stem>.wav
+        """
+        try:
+            logger.info(f"Iniciando separação ONNX de {input_path}")
+            
+            # Validar arquivo
+            is_valid, error_msg = self.validate_audio(input_path)
+            if not is_valid:
+                raise AudioProcessingError(error_msg)
+            
+            if not self.model_path.exists():
+                raise AudioProcessingError(f"Grafo ONNX não encontrado: {self.model_path}")
+            
+            session = get_onnx_session(str(self.model_path), self.threads)
+            
+            stem_dir = output_dir / self.model_path.stem / input_path.stem
+            stem_dir.mkdir(parents=True, exist_ok=True)
+            
+            print(f"🎵 Separando com ONNX Runtime ({self.model_path.name}): {input_path.name}")
+            stems = self._separate_segmented(session, input_path, stem_dir, progress_callback)
+            
+            logger.info(f"Separação concluída com sucesso: {len(stems)} stems gerados")
+            return stems
+        
+        except (AudioProcessingError, SoftTimeLimitExceeded):
+            raise
+        except Exception as e:
+            logger.exception("Erro inesperado na separação")
+            raise AudioProcessingError(f"Erro ao processar áudio: {str(e)}")
+    
+    def get_model_name(self) -> str:
+        """Retorna o nome do modelo"""
+        return f"onnx-{self.model_path.stem}"
+    
+    def validate_audio(self, input_path: Path) -> tuple[bool, str]:
+        """
+        Valida se o arquivo pode ser processado.
+        
+        Verifica:
+        - Arquivo existe
+        - Extensão suportada
+        - Tamanho não é zero
+        """
+        if not input_path.exists():
+            return False, "Arquivo não encontrado"
+        
+        if input_path.stat().st_size == 0:
+            return False, "Arquivo vazio"
+        
+        supported_extensions = {".mp3", ".wav", ".flac", ".ogg", ".m4a"}
+        if input_path.suffix.lower() not in supported_extensions:
+            return False, f"Formato não suportado. Use: {', '.join(supported_extensions)}"
+        
+        return True, ""
@@ -0,0 +1,381 @@
+"""
+Segmented Separation - Model Layer
+
+Separação em janelas sobrepostas com memória limitada.
+
+A entrada é lida em janelas sobrepostas; as saídas de cada janela são
+combinadas por overlap-add (crossfade linear) e gravadas diretamente nos
+WAVs dos stems. Cada janela concluída é registrada em um checkpoint,
+permitindo retomar a separação após uma interrupção (ex.: soft time limit).
+"""
+import json
+import logging
+import os
+import struct
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .separator import AudioProcessingError
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILENAME = ".segments.json"
+
+
+def plan_windows(total_frames: int, window_frames: int, overlap_frames: int) -> List[Tuple[int, int]]:
+    """
+    Divide a faixa em janelas sobrepostas.
+
+    Args:
+        total_frames: Número total de amostras (por canal)
+        window_frames: Tamanho de cada janela
+        overlap_frames: Sobreposição entre janelas consecutivas
+
+    Returns:
+        Lista de (início, fim) de cada janela
+    """
+    if overlap_frames < 0:
+        raise ValueError("A sobreposição não pode ser negativa")
+    if window_frames <= 2 * overlap_frames:
+        raise ValueError("A janela deve ser maior que o dobro da sobreposição")
+
+    hop = window_frames - overlap_frames
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window_frames, total_frames)
+        windows.append((start, end))
+        if end >= total_frames:
+            break
+        start += hop
+    return windows
+
+
+def read_window(sound_file, start: int, end: int, channels: int) -> np.ndarray:
+    """
+    Lê uma janela (amostras, canais) de um soundfile.SoundFile aberto.
+
+    Ajusta o número de canais como o Demucs: mono é duplicado e canais
+    extras são descartados.
+    """
+    sound_file.seek(start)
+    data = sound_file.read(end - start, dtype="float32", always_2d=True)
+
+    if data.shape[1] == channels:
+        return data
+    if channels == 1:
+        return data.mean(axis=1, keepdims=True)
+    if data.shape[1] == 1:
+        return np.repeat(data, channels, axis=1)
+    return data[:, :channels]
+
+
+def mix_statistics(sound_file, block_frames: int = 1 << 20) -> Tuple[float, float]:
+    """
+    Calcula média e desvio padrão da mistura mono em uma passada em blocos.
+
+    Equivale à normalização da CLI do Demucs (ref = wav.mean(0)) sem
+    carregar a faixa inteira em memória.
+    """
+    total = 0
+    acc = 0.0
+    acc_sq = 0.0
+    sound_file.seek(0)
+    for block in sound_file.blocks(blocksize=block_frames, dtype="float64", always_2d=True):
+        mono = block.mean(axis=1)
+        total += len(mono)
+        acc += mono.sum()
+        acc_sq += np.square(mono).sum()
+
+    if total < 2:
+        return 0.0, 1.0
+
+    mean = acc / total
+    var = max(acc_sq - total * mean * mean, 0.0) / (total - 1)
+    return float(mean), float(np.sqrt(var))
+
+
+def pcm_source(input_path: Path, work_dir: Path, samplerate: int, channels: int) -> Path:
+    """
+    Retorna um arquivo legível em janelas (soundfile) na taxa do modelo.
+
+    Arquivos já na taxa do modelo são lidos diretamente; os demais são
+    convertidos uma única vez pelo ffmpeg, em streaming, para um WAV
+    temporário mantido até o fim da separação (para retomada).
+
+    Args:
+        input_path: Arquivo de áudio original
+        work_dir: Diretório onde gravar o WAV convertido
+        samplerate: Taxa de amostragem do modelo
+        channels: Número de canais do modelo
+
+    Returns:
+        Caminho do arquivo a ser lido em janelas
+    """
+    import soundfile as sf
+
+    try:
+        if sf.info(str(input_path)).samplerate == samplerate:
+            return input_path
+    except RuntimeError:
+        pass
+
+    pcm_path = work_dir / ".input.wav"
+    if pcm_path.exists():
+        return pcm_path
+
+    tmp_path = work_dir / ".input.tmp.wav"
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-i", str(input_path),
+        "-ac", str(channels),
+        "-ar", str(samplerate),
+        "-c:a", "pcm_f32le",
+        str(tmp_path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise AudioProcessingError(f"Falha ao decodificar áudio: {result.stderr}")
+
+    os.replace(tmp_path, pcm_path)
+    return pcm_path
+
+
+def output_stem_names(source_names: List[str], two_stems: Optional[str] = None) -> List[str]:
+    """
+    Nomes dos stems gravados, na ordem de saída.
+
+    Com `two_stems` (como o --two-stems da CLI do Demucs), apenas o stem
+    pedido e o restante ("no_<stem>") são gravados.
+    """
+    if two_stems is None:
+        return list(source_names)
+    if two_stems not in source_names:
+        raise AudioProcessingError(f"Stem {two_stems} não existe no modelo ({', '.join(source_names)})")
+    return [two_stems, f"no_{two_stems}"]
+
+
+def collapse_two_stems(sources: np.ndarray, source_names: List[str], two_stems: str) -> np.ndarray:
+    """
+    Reduz (fontes, ...) para (stem, restante).
+
+    O restante é a soma das demais fontes, igual ao no_<stem> da CLI.
+    """
+    index = source_names.index(two_stems)
+    rest = np.delete(sources, index, axis=0).sum(axis=0)
+    return np.stack([sources[index], rest])
+
+
+def _wav_header(total_frames: int, samplerate: int, channels: int) -> bytes:
+    """Header WAV PCM 16-bit para um arquivo com tamanho final conhecido."""
+    block_align = channels * 2
+    data_size = total_frames * block_align
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF',
+        36 + data_size,
+        b'WAVE',
+        b'fmt ',
+        16,
+        1,  # PCM
+        channels,
+        samplerate,
+        samplerate * block_align,
+        block_align,
+        16,
+        b'data',
+        data_size,
+    )
+
+
+def _to_pcm16(data: np.ndarray) -> bytes:
+    """Converte float (-1..1) para PCM 16-bit little-endian."""
+    pcm = np.clip(np.round(data * 32767.0), -32768, 32767).astype('<i2')
+    return pcm.tobytes()
+
+
+class OverlapAddWriter:
+    """
+    Grava os stems de uma separação em janelas, com checkpoint por janela.
+
+    Os WAVs são criados já com o header do tamanho final, então cada janela
+    é escrita na sua posição e o arquivo é válido mesmo se o processo for
+    interrompido. Apenas a cauda da última janela (região de sobreposição)
+    fica em memória entre as janelas.
+    """
+
+    def __init__(
+        self,
+        stem_paths: Dict[str, Path],
+        samplerate: int,
+        channels: int,
+        overlap_frames: int,
+        checkpoint_dir: Path,
+        fingerprint: dict,
+    ):
+        """
+        Args:
+            stem_paths: Nome do stem -> caminho do WAV, na ordem das fontes do modelo
+            samplerate: Taxa de amostragem dos stems
+            channels: Número de canais dos stems
+            overlap_frames: Sobreposição entre janelas
+            checkpoint_dir: Diretório do checkpoint
+            fingerprint: Identifica a separação (entrada, modelo, parâmetros);
+                um checkpoint com fingerprint diferente é descartado
+        """
+        self.stem_paths = stem_paths
+        self.total_frames = 0
+        self.samplerate = samplerate
+        self.channels = channels
+        self.overlap_frames = overlap_frames
+        self.checkpoint_path = checkpoint_dir / CHECKPOINT_FILENAME
+        self.fingerprint = fingerprint
+
+        self.next_index = 0
+        self.frames_written = 0
+        self.complete = False
+        self.meta: dict = {}
+        self._tail: Optional[np.ndarray] = None
+        self._tail_file: Optional[str] = None
+        self._files: Dict[str, object] = {}
+
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        """Restaura o estado de um checkpoint compatível, se existir."""
+        if not self.checkpoint_path.exists():
+            return
+
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+
+            if state.get("fingerprint") != self.fingerprint:
+                logger.info("Checkpoint de outra separação encontrado, recomeçando")
+                return
+            if not all(p.exists() for p in self.stem_paths.values()):
+                return
+
+            tail = None
+            if state.get("tail_file"):
+                tail = np.load(self.checkpoint_path.parent / state["tail_file"])
+
+            self.total_frames = state["total_frames"]
+            self.next_index = state["next_index"]
+            self.frames_written = state["frames_written"]
+            self.complete = state.get("complete", False)
+            self.meta = state.get("meta", {})
+            self._tail = tail
+            self._tail_file = state.get("tail_file")
+            logger.info(f"Retomando separação a partir da janela {self.next_index}")
+        except Exception as e:
+            logger.warning(f"Checkpoint inválido, recomeçando: {e}")
+
+    def _save_checkpoint(self):
+        """Grava o checkpoint de forma atômica (arquivo temporário + rename)."""
+        old_tail_file = self._tail_file
+        self._tail_file = None
+
+        if self._tail is not None:
+            self._tail_file = f".tail_{self.next_index}.npy"
+            np.save(self.checkpoint_path.parent / self._tail_file, self._tail)
+
+        state = {
+            "fingerprint": self.fingerprint,
+            "total_frames": self.total_frames,
+            "next_index": self.next_index,
+            "frames_written": self.frames_written,
+            "complete": self.complete,
+            "tail_file": self._tail_file,
+            "meta": self.meta,
+        }
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+        # A cauda anterior só pode ser removida depois do novo checkpoint
+        if old_tail_file and old_tail_file != self._tail_file:
+            (self.checkpoint_path.parent / old_tail_file).unlink(missing_ok=True)
+
+    def open(self, total_frames: int):
+        """
+        Abre (ou cria) os WAVs dos stems para escrita.
+
+        Args:
+            total_frames: Tamanho final de cada stem (amostras por canal)
+        """
+        resume = self.next_index > 0 and self.total_frames == total_frames
+        if not resume:
+            self.next_index = 0
+            self.frames_written = 0
+            self.meta = {}
+            self._tail = None
+
+        self.total_frames = total_frames
+        header = _wav_header(total_frames, self.samplerate, self.channels)
+
+        for name, path in self.stem_paths.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if resume:
+                f = open(path, 'r+b')
+            else:
+                f = open(path, 'w+b')
+                f.write(header)
+                f.truncate(len(header) + self.total_frames * self.channels * 2)
+            self._files[name] = f
+
+        if not resume:
+            self._save_checkpoint()
+
+    def set_meta(self, **values):
+        """Guarda valores no checkpoint (ex.: estatísticas de normalização)."""
+        self.meta.update(values)
+        self._save_checkpoint()
+
+    def write(self, index: int, sources: np.ndarray, is_last: bool):
+        """
+        Combina a saída de uma janela com a anterior e grava nos stems.
+
+        Args:
+            index: Índice da janela (deve ser o próximo esperado)
+            sources: Array (fontes, amostras, canais) na ordem de stem_paths
+            is_last: Se é a última janela da faixa
+        """
+        if index != self.next_index:
+            raise ValueError(f"Janela {index} fora de ordem (esperada {self.next_index})")
+
+        data = np.array(sources, dtype=np.float32, copy=True)
+
+        # Crossfade linear com a cauda da janela anterior
+        if self._tail is not None:
+            overlap = self._tail.shape[1]
+            fade_in = ((np.arange(overlap, dtype=np.float32) + 0.5) / overlap)[None, :, None]
+            data[:, :overlap] = self._tail * (1 - fade_in) + data[:, :overlap] * fade_in
+
+        if is_last or self.overlap_frames == 0:
+            # Sem sobreposição as janelas são apenas concatenadas
+            out, self._tail = data, None
+        else:
+            out = data[:, :-self.overlap_frames]
+            self._tail = data[:, -self.overlap_frames:].copy()
+
+        offset = 44 + self.frames_written * self.channels * 2
+        for source, f in zip(out, self._files.values()):
+            f.seek(offset)
+            f.write(_to_pcm16(source))
+            f.flush()
+
+        self.frames_written += out.shape[1]
+        self.next_index += 1
+        self.complete = is_last
+        self._save_checkpoint()
+
+    def close(self):
+        """Fecha os arquivos dos stems."""
+        for f in self._files.values():
+            f.close()
+        self._files = {}
@@ -6,9 +6,12 @@ Permite trocar entre Demucs, Spleeter ou outros modelos facilmente.
 """
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 from enum import Enum
 
+# Chamado a cada trecho separado com (concluídos, total)
+ProgressCallback = Callable[[int, int], None]
+
 
 class StemType(str, Enum):
     """Tipos de stems gerados"""
@@ -16,19 +19,31 @@ class StemType(str, Enum):
     DRUMS = "drums"
     BASS = "bass"
     OTHER = "other"
+    NO_VOCALS = "no_vocals"  # Acompanhamento (modo de dois stems)
 
 
 class AudioSeparator(ABC):
     """Interface para motores de separação de áudio"""
     
+    # Se True, chamar separate() de novo após uma interrupção retoma o
+    # trabalho já concluído (checkpoints) em vez de recomeçar do zero
+    resumable: bool = False
+    
     @abstractmethod
-    def separate(self, input_path: Path, output_dir: Path) -> Dict[StemType, Path]:
+    def separate(
+        self,
+        input_path: Path,
+        output_dir: Path,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> Dict[StemType, Path]:
         """
         Separa o áudio em stems.
         
         Args:
             input_path: Caminho do arquivo de áudio original
             output_dir: Diretório onde salvar os stems
+            progress_callback: Chamado com (concluídos, total) a cada
+                trecho processado (motores sem trechos chamam só no fim)
             
         Returns:
             Dicionário mapeando tipo de stem para caminho do arquivo
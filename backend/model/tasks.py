@@ -10,21 +10,520 @@ import os
 sys.path.insert(0, '/app')
 
 import logging
+import time
+import uuid
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional
 
-from .worker import celery_app
+from celery import chord
+from celery.exceptions import Ignore, SoftTimeLimitExceeded
+
+from .worker import celery_app, task_session_factory, queue_for_plan, QUEUE_TIME_LIMITS, SEPARATION_QUEUE, ANALYSIS_QUEUE
 from .demucs_engine import create_separator
-from .separator import StemType
+from .decoded_audio import DecodedAudio
 
 logger = logging.getLogger(__name__)
 
+# Retries após soft time limit (apenas para separadores que retomam do checkpoint)
+MAX_RESUME_RETRIES = int(os.getenv("SEPARATION_MAX_RETRIES", "5"))
+
+# Versão de cada etapa: alterar invalida o cache de resultados e os
+# checkpoints da etapa
+STAGE_VERSIONS = {
+    "separation": "separation-1",
+    "bpm": "bpm-1",
+    "chords": "chords-1",
+    "transcription": "transcription-1",
+    "lyrics": "lyrics-1",
+}
+ANALYSIS_VERSION = tuple(STAGE_VERSIONS.values())
+
+# Etapas que leem os stems: refeitas quando a separação é refeita
+STEM_STAGES = ("transcription", "lyrics")
+
+# Análises calculadas sob demanda, no primeiro acesso às rotas que as usam
+LAZY_STAGES = ("chords", "transcription", "lyrics")
+
+# Manifest do projeto pronto (stems e análises disponíveis)
+ANALYSIS_MANIFEST = "analysis.json"
+
+
+# Intervalo mínimo (s) entre atualizações de progresso no result backend
+PROGRESS_UPDATE_INTERVAL = float(os.getenv("PROGRESS_UPDATE_INTERVAL", "2"))
+
+
+def report_progress(task, project_id: Optional[str], progress: int, message: str):
+    """
+    Atualiza o estado da tarefa Celery e publica o progresso do projeto
+    para os WebSockets (canal Redis de progresso).
+    
+    Args:
+        task: Tarefa Celery (bind=True)
+        project_id: ID do projeto (None: só atualiza a tarefa)
+        progress: Porcentagem de progresso (0-100)
+        message: Mensagem descritiva
+    """
+    from domain.services.progress_events import publish_progress
+    
+    task.update_state(state="PROCESSING", meta={"progress": progress, "status": message})
+    if project_id:
+        publish_progress(project_id, "processing", progress, message)
+
+
+def report_finished(project_id: str, error: Optional[str] = None):
+    """Publica o fim do processamento (ready ou failed) para os WebSockets."""
+    from domain.services.progress_events import publish_progress
+    
+    if error is None:
+        publish_progress(project_id, "ready", 100, "Concluído!")
+    else:
+        publish_progress(project_id, "failed", message="Erro no processamento", error=error)
+
+
+class SeparationProgress:
+    """
+    Repassa o progresso do separador para o estado da tarefa Celery.
+    
+    O progresso por trecho é mapeado para a faixa [start, end] da tarefa.
+    As atualizações são limitadas a uma a cada `interval` segundos (e só
+    quando o percentual muda), para não sobrecarregar o result backend em
+    faixas longas com muitas janelas; a conclusão é sempre publicada.
+    """
+    
+    def __init__(
+        self,
+        task,
+        start: int = 10,
+        end: int = 80,
+        interval: float = PROGRESS_UPDATE_INTERVAL,
+        project_id: Optional[str] = None,
+    ):
+        """
+        Args:
+            task: Tarefa Celery (bind=True)
+            start: Progresso (%) no início da separação
+            end: Progresso (%) ao fim da separação
+            interval: Intervalo mínimo entre atualizações em segundos
+            project_id: ID do projeto (publica o progresso para os WebSockets)
+        """
+        self.task = task
+        self.project_id = project_id
+        self.start = start
+        self.end = end
+        self.interval = interval
+        self._last_progress = None
+        self._last_update = 0.0
+    
+    def __call__(self, done: int, total: int):
+        progress = self.start + (self.end - self.start) * done // max(total, 1)
+        now = time.monotonic()
+        
+        if progress == self._last_progress:
+            return
+        if done < total and now - self._last_update < self.interval:
+            return
+        
+        self._last_progress = progress
+        self._last_update = now
+        report_progress(self.task, self.project_id, progress, f"Separando áudio... ({done}/{total})")
+
+
+# Stem isolado no modo de dois stems (o outro é o acompanhamento)
+TWO_STEMS_TARGET = "vocals"
+
+
+def separation_model_name(separation_mode: str = "full") -> str:
+    """Modelo e modo de separação configurados (fazem parte da chave do cache)."""
+    from .demucs_engine import QUANTIZED_MODEL_TYPES
+    
+    if os.getenv("AI_MODEL", "demucs") == "onnx":
+        model_name = f"onnx-{Path(os.getenv('ONNX_MODEL_PATH', './models/htdemucs.onnx')).stem}"
+    else:
+        model_name = os.getenv("AI_MODEL_QUALITY", "htdemucs")
+        if os.getenv("AI_MODEL", "demucs") in QUANTIZED_MODEL_TYPES:
+            # Resultados do modelo int8 não são intercambiáveis com os do float
+            model_name = f"{model_name}-int8"
+    
+    if separation_mode == "two_stems":
+        model_name = f"{model_name}-two-stems"
+    return model_name
+
+
+def collect_stem_rows(project_id: str, stems_dict: Dict[str, str]) -> List[Dict]:
+    """
+    Monta as linhas de Stem de um projeto (um stat por arquivo).
+    
+    Feito antes de abrir a transação, para que a escrita no banco não
+    espere pelo sistema de arquivos.
+    
+    Args:
+        project_id: ID do projeto
+        stems_dict: Tipo do stem -> caminho do arquivo
+    
+    Returns:
+        Lista de dicionários com as colunas de Stem
+    """
+    rows = []
+    for stem_type, stem_path in stems_dict.items():
+        try:
+            stem_size = os.stat(stem_path).st_size / (1024 * 1024)
+        except OSError:
+            stem_size = 0
+        
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "project_id": project_id,
+            "stem_type": stem_type,
+            "file_path": stem_path,
+            "file_size_mb": stem_size,
+        })
+    return rows
+
+
+def register_stem_rows(db, rows: List[Dict]):
+    """
+    Grava linhas de Stem na sessão (sem commit).
+    
+    Upsert em lote por (projeto, tipo): reexecuções e entregas duplicadas
+    atualizam os registros existentes em vez de duplicá-los.
+    
+    Args:
+        db: Sessão do banco de dados
+        rows: Linhas montadas por collect_stem_rows
+    """
+    from domain.models.stem import Stem
+    
+    if not rows:
+        return
+    
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        
+        statement = insert(Stem).values(rows)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[Stem.project_id, Stem.stem_type],
+            set_={
+                "file_path": statement.excluded.file_path,
+                "file_size_mb": statement.excluded.file_size_mb,
+            },
+        ))
+        return
+    
+    # Outros bancos: atualizar os existentes e inserir o resto
+    project_ids = {row["project_id"] for row in rows}
+    existing = {
+        (stem.project_id, stem.stem_type): stem
+        for stem in db.query(Stem).filter(Stem.project_id.in_(project_ids)).all()
+    }
+    for row in rows:
+        stem = existing.get((row["project_id"], row["stem_type"]))
+        if stem:
+            stem.file_path = row["file_path"]
+            stem.file_size_mb = row["file_size_mb"]
+        else:
+            db.add(Stem(**row))
+
+
+def register_stems(db, project_id: str, stems_dict: Dict[str, str]):
+    """
+    Registra os stems/artefatos de um projeto na sessão (sem commit).
+    
+    Args:
+        db: Sessão do banco de dados
+        project_id: ID do projeto
+        stems_dict: Tipo do stem -> caminho do arquivo
+    """
+    register_stem_rows(db, collect_stem_rows(project_id, stems_dict))
+
+
+def complete_project(db, project_id: str, stems_dict: Dict[str, str], lease_owner: Optional[str] = None) -> bool:
+    """
+    Registra os stems e marca o projeto como READY em uma única transação.
+    
+    Os metadados dos arquivos são coletados antes; a transação tem só o
+    upsert em lote dos stems e um UPDATE do projeto, então o projeto nunca
+    aparece READY com parte dos stems.
+    
+    Args:
+        db: Sessão do banco de dados
+        project_id: ID do projeto
+        stems_dict: Tipo do stem -> caminho do arquivo
+        lease_owner: Dono do lease, liberado no mesmo UPDATE (se ainda dono)
+    
+    Returns:
+        True se o projeto existe e foi atualizado
+    """
+    from sqlalchemy import case
+    from domain.models.project import Project, ProjectStatus
+    
+    rows = collect_stem_rows(project_id, stems_dict)
+    
+    values = {Project.status: ProjectStatus.READY, Project.error_message: None}
+    if lease_owner:
+        values[Project.lease_owner] = case((Project.lease_owner == lease_owner, None), else_=Project.lease_owner)
+        values[Project.lease_expires_at] = case(
+            (Project.lease_owner == lease_owner, None), else_=Project.lease_expires_at
+        )
+    
+    try:
+        register_stem_rows(db, rows)
+        updated = db.query(Project).filter(Project.id == project_id).update(values, synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    for row in rows:
+        print(f"💾 Stem salvo: {row['stem_type']} ({row['file_size_mb']:.2f} MB)")
+    return bool(updated)
+
+
+def write_analysis_manifest(
+    output_dir: Path,
+    stems_dict: Dict[str, str],
+    separation_mode: str,
+    model_used: str,
+    bpm: Optional[float],
+) -> Path:
+    """
+    Grava o manifest do projeto pronto.
+    
+    Lista os stems (caminhos relativos ao diretório do projeto), o BPM e
+    as análises que podem ser pedidas sob demanda. Como não contém o ID
+    do projeto, também vale para projetos restaurados do cache.
+    
+    Args:
+        output_dir: Diretório do projeto
+        stems_dict: Tipo do stem -> caminho do arquivo
+        separation_mode: "full" ou "two_stems"
+        model_used: Nome do modelo de separação
+        bpm: BPM detectado (None se não detectado)
+    
+    Returns:
+        Caminho do manifest
+    """
+    import json
+    
+    stems = {}
+    for stem_type, stem_path in stems_dict.items():
+        try:
+            stems[stem_type] = Path(stem_path).resolve().relative_to(output_dir.resolve()).as_posix()
+        except ValueError:
+            stems[stem_type] = Path(stem_path).name
+    
+    # Partitura precisa do instrumental sem bateria e baixo, que o modo
+    # de dois stems não gera
+    on_demand = [
+        stage for stage in LAZY_STAGES
+        if not (stage == "transcription" and separation_mode == "two_stems")
+    ]
+    
+    manifest_path = output_dir / ANALYSIS_MANIFEST
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "separation_mode": separation_mode,
+            "model_used": model_used,
+            "bpm": bpm,
+            "stems": stems,
+            "on_demand": on_demand,
+        }, f, ensure_ascii=False, indent=2)
+    return manifest_path
+
+
+def processing_task_id(project_id: str, attempt: int = 0) -> str:
+    """
+    ID idempotente da tarefa de processamento de um projeto.
+    
+    Derivado do projeto e da tentativa: reenvios da mesma tentativa
+    publicam a mesma tarefa (mesmo estado no result backend).
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"isomix:process_audio:{project_id}:{attempt}"))
+
+
+def enqueue_processing(
+    project_id: str,
+    input_file_path: str,
+    plan: str = "free",
+    time_limits: Optional[Dict[str, int]] = None,
+    attempt: int = 0,
+):
+    """
+    Enfileira o processamento de um projeto na fila de separação do plano.
+    
+    Args:
+        project_id: ID do projeto
+        input_file_path: Caminho do arquivo de áudio original
+        plan: Plano do usuário ("free" ou "pro")
+        time_limits: {"time_limit", "soft_time_limit"} do job
+            (separation_time_limits); None usa os limites da fila
+        attempt: Tentativa de processamento (Project.processing_attempts)
+    
+    Returns:
+        AsyncResult da tarefa process_audio
+    """
+    return process_audio.apply_async(
+        (project_id, input_file_path),
+        task_id=processing_task_id(project_id, attempt),
+        queue=queue_for_plan(plan),
+        **(time_limits or {}),
+    )
+
+
+def open_task_session():
+    """Abre uma sessão do banco no pool de conexões do processo do worker."""
+    return task_session_factory()()
+
+
+def release_project_lease(db, project_id: str, owner: str):
+    """Libera o lease do projeto sem propagar erros do banco."""
+    from domain.services.project_lease import release_lease
+    
+    try:
+        release_lease(db, project_id, owner)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Falha ao liberar lease do projeto {project_id}: {e}")
+
+
+def project_output_dir(project_id: str) -> Path:
+    """Diretório de stems e análises de um projeto."""
+    storage_path = Path(os.getenv("STORAGE_PATH", "./storage"))
+    return storage_path / "stems" / project_id
+
+
+def run_stage(project_id: str, stage: str, run) -> Dict:
+    """
+    Executa uma etapa de análise com checkpoint.
+    
+    Se a etapa já foi concluída na versão atual e seus arquivos existem,
+    devolve o resultado gravado sem executar nada.
+    
+    Args:
+        project_id: ID do projeto
+        stage: Nome da etapa (chave de STAGE_VERSIONS)
+        run: Função que recebe o MetricsRecorder da tarefa, executa a
+            etapa e retorna (resultado, arquivos); arquivos None indica
+            falha (nada é gravado)
+    
+    Returns:
+        Resultado da etapa
+    """
+    from celery import current_task
+    from domain.models.analysis_job import AnalysisJobStatus
+    from domain.services.stage_checkpoint import load_stage, save_stage
+    from domain.services.processing_metrics import MetricsRecorder
+    
+    version = STAGE_VERSIONS[stage]
+    metrics = MetricsRecorder(project_id, current_task.request.id if current_task else None)
+    db = open_task_session()
+    
+    def set_job_status(status, error=None):
+        # Status do job sob demanda (acompanhado pelas rotas de análise)
+        if stage not in LAZY_STAGES:
+            return
+        from domain.services.lazy_analysis import update_job
+        try:
+            update_job(db, project_id, stage, status, error)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Falha ao atualizar job de {stage}: {e}")
+    
+    try:
+        try:
+            checkpoint = load_stage(db, project_id, stage, version)
+            if checkpoint is not None:
+                print(f"⏭️ Etapa {stage} já concluída, reaproveitando resultado")
+                set_job_status(AnalysisJobStatus.DONE)
+                return checkpoint
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Checkpoint de {stage} indisponível: {e}")
+        
+        set_job_status(AnalysisJobStatus.RUNNING)
+        try:
+            result, files = run(metrics)
+        except Exception as e:
+            set_job_status(AnalysisJobStatus.FAILED, str(e))
+            raise
+        metrics.flush(db)
+        
+        if files is not None:
+            try:
+                save_stage(db, project_id, stage, version, result, files)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Falha ao gravar checkpoint de {stage}: {e}")
+            set_job_status(AnalysisJobStatus.DONE)
+        else:
+            set_job_status(AnalysisJobStatus.FAILED, f"Etapa {stage} não produziu resultado")
+        return result
+    finally:
+        db.close()
+
+
+# Taxa do áudio mono usado por BPM e acordes
+ANALYSIS_SAMPLE_RATE = 22050
+
+
+def analysis_workflow(
+    project_id: str,
+    input_file_path: str,
+    stems_dict: Dict[str, str],
+    separation_mode: str,
+    model_used: str,
+    cache_key: Optional[str] = None,
+    lease_owner: Optional[str] = None,
+    cache_model_name: Optional[str] = None,
+):
+    """
+    Monta o chord das análises pós-separação.
+    
+    Só o BPM/click track (barato e usado pelo mixer como stem) roda antes
+    do projeto ficar pronto; acordes, partitura e letras são calculados
+    sob demanda (LAZY_STAGES), no primeiro acesso às rotas que os usam.
+    finalize_project registra os resultados e grava o manifest.
+    
+    Args:
+        project_id: ID do projeto
+        input_file_path: Arquivo de áudio original
+        stems_dict: Stems gerados pela separação (tipo -> caminho)
+        separation_mode: "full" ou "two_stems"
+        model_used: Nome do modelo de separação
+        cache_key: Chave do cache de análise (None se desabilitado)
+        lease_owner: Execução dona do lease do projeto (liberado ao final)
+        cache_model_name: Modelo da chave do cache, calculado no worker de
+            separação (o worker de análise não tem a mesma configuração)
+    
+    Returns:
+        Assinatura do chord (análises imediatas + finalize_project)
+    """
+    stages = [analyze_bpm.s(project_id, input_file_path)]
+    
+    finalize = finalize_project.s(
+        project_id, input_file_path, stems_dict, separation_mode, model_used, cache_key, lease_owner,
+        cache_model_name,
+    )
+    finalize.on_error(analysis_failed.s(project_id, lease_owner))
+    return chord(stages, finalize)
+
 
 @celery_app.task(bind=True, name="model.tasks.process_audio")
 def process_audio(self, project_id: str, input_file_path: str) -> Dict[str, str]:
     """
     Tarefa Celery para processar áudio e gerar stems.
     
+    Executa a separação e é substituída pelo chord de análises
+    (analysis_workflow); o finalize_project herda o ID desta tarefa e
+    produz o resultado final.
+    
+    Só uma execução por projeto roda de cada vez (lease do projeto):
+    entregas duplicadas e projetos já prontos terminam sem processar.
+    
     Args:
         project_id: ID único do projeto
         input_file_path: Caminho do arquivo de áudio original
@@ -35,172 +534,504 @@ def process_audio(self, project_id: str, input_file_path: str) -> Dict[str, str]
     Raises:
         Exception: Se houver erro no processamento
     """
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-    from domain.models.project import Project, ProjectStatus
-    from domain.models.stem import Stem
+    from domain.models.project import Project, ProjectStatus, SeparationMode
+    from domain.services.analysis_cache import AnalysisCache, CACHE_ENABLED, decoded_audio_sha256
+    from domain.services.stage_checkpoint import load_stage, save_stage, clear_stages
+    from domain.services.processing_metrics import MetricsRecorder, STATUS_RESUMED
+    from domain.services.project_lease import acquire_lease
     
     # Criar sessão do banco
-    database_url = os.getenv("DATABASE_URL", "postgresql://isomix_user:isomix_pass@db:5432/isomix")
-    engine = create_engine(database_url)
-    SessionLocal = sessionmaker(bind=engine)
-    db = SessionLocal()
+    db = open_task_session()
+    project = None
+    separator = None
+    metrics = MetricsRecorder(project_id, self.request.id)
+    
+    # Dono do lease: único por execução (redeliveries têm o mesmo task ID)
+    lease_owner = f"{self.request.id}:{uuid.uuid4().hex[:8]}"
+    lease_handed_off = False
+    hard_limit, soft_limit = self.request.timelimit or (None, None)
+    lease_seconds = (hard_limit or QUEUE_TIME_LIMITS[SEPARATION_QUEUE]) + QUEUE_TIME_LIMITS[ANALYSIS_QUEUE]
     
     try:
         logger.info(f"[Task {self.request.id}] Iniciando processamento do projeto {project_id}")
         print(f"🎵 Iniciando processamento do projeto {project_id}")
         
-        # Atualizar status para PROCESSING no banco
         project = db.query(Project).filter(Project.id == project_id).first()
+        
+        # Entregas duplicadas viram no-op
+        if project and project.status == ProjectStatus.READY:
+            print(f"⏭️ Projeto {project_id} já processado, ignorando entrega duplicada")
+            return {"project_id": project_id, "skipped": True}
+        # Lease e status PROCESSING no mesmo UPDATE
+        if project and not acquire_lease(
+            db, project_id, lease_owner, lease_seconds, status=ProjectStatus.PROCESSING
+        ):
+            print(f"⏭️ Projeto {project_id} já em processamento, ignorando entrega duplicada")
+            return {"project_id": project_id, "skipped": True}
         if project:
-            project.status = ProjectStatus.PROCESSING
-            db.commit()
             print(f"📊 Status atualizado para PROCESSING")
         
-        # Atualizar estado Celery
-        self.update_state(state="PROCESSING", meta={"progress": 0, "status": "Iniciando..."})
+        # Modo de dois stems (karaokê): apenas vocals + acompanhamento
+        separation_mode = project.separation_mode if project else SeparationMode.FULL
+        two_stems = TWO_STEMS_TARGET if separation_mode == SeparationMode.TWO_STEMS else None
         
-        # Criar separador
-        model_type = os.getenv("AI_MODEL", "demucs")
-        separator = create_separator(model_type)
+        # Atualizar estado Celery
+        report_progress(self, project_id, 0, "Iniciando...")
         
         # Definir diretório de saída
-        storage_path = Path(os.getenv("STORAGE_PATH", "./storage"))
-        output_dir = storage_path / "stems" / project_id
+        output_dir = project_output_dir(project_id)
+        input_path = Path(input_file_path)
         
-        # Atualizar progresso
-        self.update_state(state="PROCESSING", meta={"progress": 10, "status": "Separando áudio..."})
+        # Modelo de separação deste worker (AI_MODEL/ONNX_MODEL_PATH): calculado
+        # uma vez e repassado ao finalize_project, que roda em outro pool
+        model_name = separation_model_name(separation_mode.value)
         
-        # Executar separação
-        input_path = Path(input_file_path)
-        print(f"🎵 Iniciando separação: {input_path} -> {output_dir}")
-        stems = separator.separate(input_path, output_dir)
+        # Reaproveitar resultados de um áudio idêntico já processado
+        cache = AnalysisCache()
+        cache_key = None
+        if CACHE_ENABLED:
+            try:
+                cache_key = AnalysisCache.make_key(
+                    decoded_audio_sha256(input_path), model_name, ANALYSIS_VERSION
+                )
+                entry = cache.lookup(db, cache_key)
+                if entry:
+                    cached = cache.restore(db, entry, output_dir)
+                    stems_dict = cached["artifacts"]
+                    print(f"♻️ Resultado reaproveitado do cache ({len(stems_dict)} artefatos)")
+                    
+                    if not (output_dir / ANALYSIS_MANIFEST).exists():
+                        # Entrada guardada antes do manifest existir
+                        write_analysis_manifest(
+                            output_dir, stems_dict, separation_mode.value,
+                            entry.model_name, cached["extra"].get("bpm"),
+                        )
+                    
+                    if project:
+                        complete_project(db, project_id, stems_dict)
+                        print(f"✅ Status atualizado para READY")
+                    
+                    self.update_state(state="PROCESSING", meta={"progress": 100, "status": "Concluído!"})
+                    report_finished(project_id)
+                    return {
+                        "project_id": project_id,
+                        "stems": stems_dict,
+                        "model_used": entry.model_name,
+                        "bpm": cached["extra"].get("bpm"),
+                        "cached": True,
+                    }
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Cache de análise indisponível: {e}")
         
-        # Converter Path para string
-        stems_dict = {stem_type.value: str(stem_path) for stem_type, stem_path in stems.items()}
+        # Decodificar a mistura uma vez antes da separação: as análises em
+        # paralelo (BPM, acordes) leem o mesmo .npy
+        with metrics.stage("decode"):
+            mix_audio = DecodedAudio(input_path, output_dir / ".audio")
+            try:
+                mix_audio.load(ANALYSIS_SAMPLE_RATE)
+                metrics.audio_seconds = mix_audio.duration()
+            except Exception as e:
+                logger.warning(f"Falha ao decodificar áudio para as análises: {e}")
         
-        logger.info(f"[Task {self.request.id}] Processamento concluído: {len(stems_dict)} stems gerados")
-        print(f"✅ {len(stems_dict)} stems gerados")
+        # Separação já concluída em uma tentativa anterior (checkpoint)
+        separation_version = f"{STAGE_VERSIONS['separation']}:{model_name}"
+        checkpoint = None
+        if project:
+            try:
+                checkpoint = load_stage(db, project_id, "separation", separation_version)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Checkpoint de separação indisponível: {e}")
         
-        # Detectar BPM e gerar click track
-        self.update_state(state="PROCESSING", meta={"progress": 80, "status": "Detectando BPM..."})
+        if checkpoint:
+            stems_dict = checkpoint["stems"]
+            model_used = checkpoint["model_used"]
+            print(f"⏭️ Separação já concluída, reaproveitando {len(stems_dict)} stems")
+        else:
+            # Criar separador (a CLI do Demucs respeita o orçamento do job)
+            model_type = os.getenv("AI_MODEL", "demucs")
+            separator = create_separator(model_type, two_stems=two_stems, timeout=soft_limit or hard_limit)
+            
+            # Atualizar progresso
+            report_progress(self, project_id, 10, "Separando áudio...")
+            
+            # Executar separação
+            print(f"🎵 Iniciando separação: {input_path} -> {output_dir}")
+            with metrics.stage("separate") as record:
+                # Retry após soft time limit: só as janelas restantes são separadas
+                if separator.resumable and self.request.retries > 0:
+                    record["status"] = STATUS_RESUMED
+                stems = separator.separate(input_path, output_dir, progress_callback=SeparationProgress(self, project_id=project_id))
+            
+            # Converter Path para string
+            stems_dict = {stem_type.value: str(stem_path) for stem_type, stem_path in stems.items()}
+            model_used = separator.get_model_name()
+            
+            logger.info(f"[Task {self.request.id}] Separação concluída: {len(stems_dict)} stems gerados")
+            print(f"✅ {len(stems_dict)} stems gerados")
+            
+            if project:
+                try:
+                    # Stems novos: etapas que os leem precisam ser refeitas
+                    clear_stages(db, project_id, STEM_STAGES)
+                    save_stage(
+                        db, project_id, "separation", separation_version,
+                        {"stems": stems_dict, "model_used": model_used},
+                        list(stems_dict.values()),
+                    )
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Falha ao gravar checkpoint de separação: {e}")
         
+        report_progress(self, project_id, 80, "Analisando áudio...")
+        
+        # Análises em paralelo; finalize_project herda o ID desta tarefa
+        workflow = analysis_workflow(
+            project_id,
+            input_file_path,
+            stems_dict,
+            separation_mode.value,
+            model_used,
+            cache_key,
+            lease_owner if project else None,
+            model_name,
+        )
+        metrics.flush(db)
+        return self.replace(workflow)
+    
+    except Ignore:
+        # Tarefa substituída pelo chord de análises (que libera o lease)
+        lease_handed_off = True
+        raise
+    
+    except SoftTimeLimitExceeded as e:
+        # Separadores com checkpoint retomam de onde pararam em um novo retry
+        if separator is not None and separator.resumable and self.request.retries < MAX_RESUME_RETRIES:
+            logger.warning(f"[Task {self.request.id}] Soft time limit atingido, reagendando para retomar")
+            print(f"⏱️ Tempo limite atingido, retomando em nova tentativa")
+            raise self.retry(exc=e, countdown=0, max_retries=MAX_RESUME_RETRIES)
+        
+        logger.exception(f"[Task {self.request.id}] Tempo limite excedido")
+        if project:
+            project.status = ProjectStatus.FAILED
+            project.error_message = "Processamento excedeu o tempo limite"
+            db.commit()
+        
+        self.update_state(state="FAILURE", meta={"error": str(e)})
+        report_finished(project_id, error="Processamento excedeu o tempo limite")
+        raise
+        
+    except Exception as e:
+        logger.exception(f"[Task {self.request.id}] Erro no processamento")
+        print(f"❌ Erro: {str(e)}")
+        
+        # Atualizar status para FAILED
+        if project:
+            project.status = ProjectStatus.FAILED
+            project.error_message = str(e)
+            db.commit()
+        
+        self.update_state(state="FAILURE", meta={"error": str(e)})
+        report_finished(project_id, error=str(e))
+        raise
+    finally:
+        # Medições também de tentativas que falharam
+        metrics.flush(db)
+        if project and not lease_handed_off:
+            # Falha, retry ou cache: a próxima entrega pode processar
+            release_project_lease(db, project_id, lease_owner)
+        db.close()
+
+
+@celery_app.task(name="model.tasks.analyze_bpm")
+def analyze_bpm(project_id: str, input_file_path: str) -> Dict:
+    """
+    Detecta o BPM e gera o click track.
+    
+    Returns:
+        {"artifacts": {"click": caminho}, "bpm": bpm} (vazio se falhar)
+    """
+    output_dir = project_output_dir(project_id)
+    
+    def run(metrics):
         try:
             from .bpm_detector import bpm_detector
             
-            click_track_path = output_dir / "click.wav"
-            click_path, detected_bpm = bpm_detector.generate_click_track(
-                audio_path=input_path,
-                output_path=click_track_path
-            )
-            
-            # Adicionar click track aos stems
-            stems_dict["click"] = click_path
+            audio = DecodedAudio(Path(input_file_path), output_dir / ".audio")
+            metrics.audio_seconds = audio.duration()
+            with metrics.stage("bpm"):
+                bpm, beat_times = bpm_detector.detect_bpm(audio)
+            with metrics.stage("click"):
+                click_path, detected_bpm = bpm_detector.generate_click_track(
+                    audio=audio,
+                    output_path=output_dir / "click.wav",
+                    bpm=bpm,
+                    beat_times=beat_times,
+                )
             print(f"🥁 Click track gerado com BPM: {detected_bpm}")
+            return {"artifacts": {"click": click_path}, "bpm": detected_bpm}, [click_path]
             
         except Exception as e:
             logger.warning(f"Falha ao gerar click track: {e}")
             print(f"⚠️ Click track não gerado: {e}")
-            detected_bpm = None
-        
-        # Detectar acordes
-        self.update_state(state="PROCESSING", meta={"progress": 90, "status": "Detectando acordes..."})
-        
-        detected_chords = []
+            return {"artifacts": {}, "bpm": None}, None
+    
+    return run_stage(project_id, "bpm", run)
+
+
+@celery_app.task(name="model.tasks.analyze_chords")
+def analyze_chords(project_id: str, input_file_path: str) -> Dict:
+    """
+    Detecta os acordes e salva chords.json.
+    
+    Returns:
+        {"artifacts": {}} (chords.json é lido direto do diretório do projeto)
+    """
+    output_dir = project_output_dir(project_id)
+    
+    def run(metrics):
         try:
             from .chord_detector import chord_detector
             
             chords_path = output_dir / "chords.json"
-            detected_chords = chord_detector.detect_chords(input_path)
-            chord_detector.save_chords(detected_chords, chords_path)
+            audio = DecodedAudio(Path(input_file_path), output_dir / ".audio")
+            metrics.audio_seconds = audio.duration()
+            with metrics.stage("chords"):
+                detected_chords = chord_detector.detect_chords(audio)
+                chord_detector.save_chords(detected_chords, chords_path)
             print(f"🎸 {len(detected_chords)} acordes detectados")
+            return {"artifacts": {}}, [str(chords_path)]
             
         except Exception as e:
             logger.warning(f"Falha ao detectar acordes: {e}")
             print(f"⚠️ Acordes não detectados: {e}")
+            return {"artifacts": {}}, None
+    
+    return run_stage(project_id, "chords", run)
+
 
-        # Transcrever partitura
-        self.update_state(state="PROCESSING", meta={"progress": 95, "status": "Transcrevendo partitura..."})
+@celery_app.task(name="model.tasks.transcribe_score")
+def transcribe_score(project_id: str, audio_file_path: str) -> Dict:
+    """
+    Transcreve a partitura (MIDI e MusicXML) do stem instrumental.
+    
+    Returns:
+        {"artifacts": {"midi": caminho, "score": caminho}} (vazio se falhar)
+    """
+    output_dir = project_output_dir(project_id)
+    
+    def run(metrics):
+        artifacts = {}
         try:
             from .transcriber import music_transcriber
             
-            # Preferir usar o stem 'other' (instrumental) para transcrição, se disponível
-            transcription_input = Path(stems_dict.get("other", input_path))
-            
-            midi_path, xml_path = music_transcriber.transcribe(transcription_input, output_dir)
+            audio = DecodedAudio(Path(audio_file_path), output_dir / ".audio")
+            metrics.audio_seconds = audio.duration()
+            with metrics.stage("midi"):
+                midi_path = music_transcriber.transcribe_midi(audio, output_dir)
             
+            xml_path = None
             if midi_path:
-                stems_dict["midi"] = midi_path
+                artifacts["midi"] = midi_path
                 print(f"🎹 MIDI gerado: {midi_path}")
+                with metrics.stage("musicxml"):
+                    xml_path = music_transcriber.midi_to_musicxml(midi_path)
             if xml_path:
-                stems_dict["score"] = xml_path
+                artifacts["score"] = xml_path
                 print(f"🎼 Partitura (XML) gerada: {xml_path}")
-                
+            
+            # Sem MIDI a transcrição falhou internamente: tentar de novo no retry
+            files = list(artifacts.values()) if midi_path else None
+            return {"artifacts": artifacts}, files
+            
         except Exception as e:
             logger.warning(f"Falha na transcrição musical: {e}")
             print(f"⚠️ Transcrição não realizada: {e}")
-        
-        # Transcrever letras (Lyrics)
-        self.update_state(state="PROCESSING", meta={"progress": 98, "status": "Transcrevendo letra da música..."})
+            return {"artifacts": artifacts}, None
+    
+    result = run_stage(project_id, "transcription", run)
+    
+    # Sob demanda o projeto já está pronto: registrar MIDI/partitura para download
+    if result.get("artifacts"):
+        db = open_task_session()
+        try:
+            register_stems(db, project_id, result["artifacts"])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Falha ao registrar partitura do projeto {project_id}: {e}")
+        finally:
+            db.close()
+    return result
+
+
+@celery_app.task(name="model.tasks.transcribe_lyrics")
+def transcribe_lyrics(project_id: str, audio_file_path: str) -> Dict:
+    """
+    Transcreve a letra do stem de vocais e salva lyrics.json.
+    
+    Returns:
+        {"artifacts": {}} (lyrics.json é lido direto do diretório do projeto)
+    """
+    output_dir = project_output_dir(project_id)
+    
+    def run(metrics):
         try:
             from .lyric_transcriber import lyric_transcriber
             
-            # Usar o stem 'vocals' para transcrição de letras
-            vocals_input = Path(stems_dict.get("vocals", input_path))
+            audio = DecodedAudio(Path(audio_file_path), output_dir / ".audio")
+            metrics.audio_seconds = audio.duration()
+            with metrics.stage("lyrics"):
+                lyrics_path = lyric_transcriber.transcribe(audio, output_dir)
+            if not lyrics_path:
+                return {"artifacts": {}}, None
+            
+            print(f"🎤 Letras transcritas: {lyrics_path}")
+            return {"artifacts": {}}, [str(lyrics_path)]
             
-            lyrics_path = lyric_transcriber.transcribe(vocals_input, output_dir)
-            if lyrics_path:
-                print(f"🎤 Letras transcritas: {lyrics_path}")
-                
         except Exception as e:
             logger.warning(f"Falha na transcrição de letras: {e}")
             print(f"⚠️ Letras não transcritas: {e}")
+            return {"artifacts": {}}, None
+    
+    return run_stage(project_id, "lyrics", run)
+
+
+@celery_app.task(bind=True, name="model.tasks.finalize_project")
+def finalize_project(
+    self,
+    results: List[Dict],
+    project_id: str,
+    input_file_path: str,
+    stems_dict: Dict[str, str],
+    separation_mode: str,
+    model_used: str,
+    cache_key: Optional[str] = None,
+    lease_owner: Optional[str] = None,
+    cache_model_name: Optional[str] = None,
+) -> Dict:
+    """
+    Registra stems e análises e marca o projeto como READY.
+    
+    Corpo do chord de análises: recebe os resultados das etapas imediatas
+    e herda o ID da tarefa process_audio original. Grava o manifest do
+    projeto (analysis.json) antes de guardar o resultado no cache.
+    
+    Args:
+        results: Resultados das etapas de análise ({"artifacts", "bpm"})
+        project_id: ID do projeto
+        input_file_path: Arquivo de áudio original
+        stems_dict: Stems gerados pela separação
+        separation_mode: "full" ou "two_stems"
+        model_used: Nome do modelo de separação
+        cache_key: Chave do cache de análise (None se desabilitado)
+        lease_owner: Dono do lease do projeto, liberado ao final
+        cache_model_name: Modelo usado na chave do cache (gravado na entrada)
+    
+    Returns:
+        Dicionário com caminhos dos stems gerados
+    """
+    from domain.models.project import Project, ProjectStatus
+    from domain.services.analysis_cache import AnalysisCache, file_sha256
+    from domain.services.processing_metrics import MetricsRecorder
+    
+    db = open_task_session()
+    project = None
+    metrics = MetricsRecorder(project_id, self.request.id)
+    
+    try:
+        # Juntar artefatos das análises (na ordem das etapas)
+        stems_dict = dict(stems_dict)
+        detected_bpm = None
+        for result in results:
+            stems_dict.update(result.get("artifacts", {}))
+            if result.get("bpm") is not None:
+                detected_bpm = result["bpm"]
+        
+        output_dir = project_output_dir(project_id)
+        write_analysis_manifest(output_dir, stems_dict, separation_mode, model_used, detected_bpm)
         
         # Salvar stems no banco de dados
+        project = db.query(Project).filter(Project.id == project_id).first()
         if project:
-            import uuid
-            for stem_type, stem_path in stems_dict.items():
-                stem_file = Path(stem_path)
-                stem_size = stem_file.stat().st_size / (1024 * 1024) if stem_file.exists() else 0
-                
-                stem = Stem(
-                    id=str(uuid.uuid4()),
-                    project_id=project_id,
-                    stem_type=stem_type,
-                    file_path=stem_path,
-                    file_size_mb=stem_size,
-                )
-                db.add(stem)
-                print(f"💾 Stem salvo: {stem_type} ({stem_size:.2f} MB)")
-            
-            # Atualizar status do projeto para READY
-            project.status = ProjectStatus.READY
-            db.commit()
+            metrics.audio_seconds = project.duration_seconds
+            with metrics.stage("db_write"):
+                # Stems, READY e lease liberado em uma transação
+                complete_project(db, project_id, stems_dict, lease_owner)
+            lease_owner = None
             print(f"✅ Status atualizado para READY")
         
+        # Guardar no cache para próximos uploads do mesmo áudio
+        if cache_key and cache_model_name:
+            try:
+                AnalysisCache().store(
+                    db,
+                    cache_key,
+                    output_dir,
+                    stems_dict,
+                    model_name=cache_model_name,
+                    analysis_version=ANALYSIS_VERSION,
+                    source_sha256=file_sha256(Path(input_file_path)),
+                    extra={"bpm": detected_bpm},
+                )
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Falha ao guardar resultado no cache: {e}")
+        
         # Atualizar progresso final
         self.update_state(state="PROCESSING", meta={"progress": 100, "status": "Concluído!"})
+        report_finished(project_id)
         
         return {
             "project_id": project_id,
             "stems": stems_dict,
-            "model_used": separator.get_model_name(),
+            "model_used": model_used,
             "bpm": detected_bpm,
         }
         
     except Exception as e:
-        logger.exception(f"[Task {self.request.id}] Erro no processamento")
+        logger.exception(f"[Task {self.request.id}] Erro ao finalizar projeto")
         print(f"❌ Erro: {str(e)}")
         
-        # Atualizar status para FAILED
+        db.rollback()
         if project:
             project.status = ProjectStatus.FAILED
             project.error_message = str(e)
             db.commit()
         
         self.update_state(state="FAILURE", meta={"error": str(e)})
+        report_finished(project_id, error=str(e))
         raise
     finally:
+        metrics.flush(db)
+        if lease_owner:
+            release_project_lease(db, project_id, lease_owner)
+        db.close()
+
+
+@celery_app.task(name="model.tasks.analysis_failed")
+def analysis_failed(request, exc, traceback, project_id: str, lease_owner: Optional[str] = None):
+    """
+    Errback do chord de análises: marca o projeto como FAILED.
+    
+    Cobre falhas que as etapas não conseguem tratar sozinhas (ex.: worker
+    morto pelo hard time limit), que impediriam o finalize_project de rodar.
+    """
+    from domain.models.project import Project, ProjectStatus
+    
+    logger.error(f"Análises do projeto {project_id} falharam: {exc}")
+    db = open_task_session()
+    try:
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if project and project.status != ProjectStatus.READY:
+            project.status = ProjectStatus.FAILED
+            project.error_message = str(exc)
+            db.commit()
+            report_finished(project_id, error=str(exc))
+    finally:
+        if lease_owner:
+            release_project_lease(db, project_id, lease_owner)
         db.close()
 
 
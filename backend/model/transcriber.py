@@ -5,15 +5,19 @@ Converte áudio em MIDI e MusicXML usando Spotify's Basic Pitch e Music21.
 import logging
 import os
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Union
 
-import numpy as np
 from basic_pitch.inference import predict
 from basic_pitch import ICASSP_2022_MODEL_PATH
 import music21
 
+from .decoded_audio import DecodedAudio
+
 logger = logging.getLogger(__name__)
 
+# Taxa de trabalho do Basic Pitch (AUDIO_SAMPLE_RATE)
+BASIC_PITCH_SAMPLE_RATE = 22050
+
 class MusicTranscriber:
     def __init__(self):
         self.model_path = ICASSP_2022_MODEL_PATH
@@ -37,53 +41,80 @@ class MusicTranscriber:
         except Exception as e:
             logger.warning(f"Aviso ao configurar ambiente music21: {e}")
 
-    def transcribe(self, audio_path: Path, output_dir: Path) -> Tuple[Optional[str], Optional[str]]:
+    def transcribe(self, audio: Union[DecodedAudio, Path], output_dir: Path) -> Tuple[Optional[str], Optional[str]]:
         """
         Transcreve áudio para MIDI e MusicXML.
         
         Args:
-            audio_path: Caminho do arquivo de áudio (preferencialmente o stem 'piano' ou melodia)
+            audio: Áudio decodificado (ou caminho) do stem, preferencialmente 'piano' ou melodia
             output_dir: Diretório onde os resultados serão salvos
             
         Returns:
             Tuple com (caminho_midi, caminho_xml)
         """
+        midi_path = self.transcribe_midi(audio, output_dir)
+        if not midi_path:
+            return None, None
+        return midi_path, self.midi_to_musicxml(midi_path)
+
+    def transcribe_midi(self, audio: Union[DecodedAudio, Path], output_dir: Path) -> Optional[str]:
+        """
+        Transcreve áudio para MIDI com o Basic Pitch.
+        
+        Args:
+            audio: Áudio decodificado (ou caminho) do stem
+            output_dir: Diretório onde o MIDI será salvo
+            
+        Returns:
+            Caminho do MIDI, ou None se falhar
+        """
         try:
+            audio_path = audio.path if isinstance(audio, DecodedAudio) else Path(audio)
             audio_path_str = str(audio_path)
-            midi_filename = audio_path.stem + "_transcription.mid"
-            xml_filename = audio_path.stem + "_score.musicxml"
-            
-            midi_output_path = output_dir / midi_filename
-            xml_output_path = output_dir / xml_filename
+            midi_output_path = output_dir / (audio_path.stem + "_transcription.mid")
 
             logger.info(f"Iniciando transcrição de {audio_path_str}")
 
-            # 1. Inferência com Basic Pitch (Gera MIDI)
             # model_output, midi_data, note_events
+            # O Basic Pitch só aceita caminhos: com DecodedAudio ele lê um WAV
+            # mono já na sua taxa, sem decodificar nem reamostrar de novo
+            if isinstance(audio, DecodedAudio):
+                audio_path_str = str(audio.wav_path(BASIC_PITCH_SAMPLE_RATE))
             _, midi_data, _ = predict(audio_path_str, self.model_path)
             
             # Salvar MIDI
             midi_data.write(str(midi_output_path))
             logger.info(f"MIDI gerado em: {midi_output_path}")
-
-            # 2. Converter MIDI para MusicXML usando music21
-            try:
-                score = music21.converter.parse(str(midi_output_path))
-                # Tentar quantizar para deixar a partitura mais legível
-                score.quantize()
-                
-                # Salvar em MusicXML
-                score.write('musicxml', fp=str(xml_output_path))
-                logger.info(f"MusicXML gerado em: {xml_output_path}")
-            except Exception as e:
-                logger.error(f"Erro ao converter para MusicXML: {e}")
-                xml_output_path = None
-
-            return str(midi_output_path), str(xml_output_path) if xml_output_path else None
+            return str(midi_output_path)
 
         except Exception as e:
             logger.error(f"Erro crítico na transcrição: {e}")
-            return None, None
+            return None
+
+    def midi_to_musicxml(self, midi_path: str) -> Optional[str]:
+        """
+        Converte o MIDI transcrito em partitura MusicXML com o music21.
+        
+        Args:
+            midi_path: Caminho do MIDI ("<stem>_transcription.mid")
+            
+        Returns:
+            Caminho do MusicXML, ou None se falhar
+        """
+        midi_path = Path(midi_path)
+        xml_output_path = midi_path.with_name(midi_path.name.replace("_transcription.mid", "_score.musicxml"))
+        try:
+            score = music21.converter.parse(str(midi_path))
+            # Tentar quantizar para deixar a partitura mais legível
+            score.quantize()
+            
+            # Salvar em MusicXML
+            score.write('musicxml', fp=str(xml_output_path))
+            logger.info(f"MusicXML gerado em: {xml_output_path}")
+            return str(xml_output_path)
+        except Exception as e:
+            logger.error(f"Erro ao converter para MusicXML: {e}")
+            return None
 
 # Instância singleton
 music_transcriber = MusicTranscriber()
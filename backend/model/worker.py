@@ -4,11 +4,17 @@ Celery Worker - Model Layer
 Configuração do Celery para processamento assíncrono de áudio.
 """
 import os
+import logging
+import threading
 from celery import Celery
+from celery.signals import worker_process_init, celeryd_after_setup
 from dotenv import load_dotenv
+from kombu import Queue
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configurar Celery
 celery_app = Celery(
     "isomix",
@@ -16,6 +22,59 @@ celery_app = Celery(
     backend=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
 )
 
+# Filas por tipo de carga: cada pool de workers consome um subconjunto
+# (celery -A model.worker worker -Q separation --concurrency=1), para que
+# análises de segundos não esperem atrás de uma separação de minutos.
+SEPARATION_QUEUE = "separation"
+SEPARATION_PRIORITY_QUEUE = "separation_priority"
+ANALYSIS_QUEUE = "analysis"
+TRANSCRIPTION_QUEUE = "transcription"
+MAINTENANCE_QUEUE = "maintenance"
+
+# Tempo limite (hard) de cada fila em segundos; o soft limit é 60s antes
+QUEUE_TIME_LIMITS = {
+    SEPARATION_QUEUE: int(os.getenv("SEPARATION_TIME_LIMIT", "600")),
+    SEPARATION_PRIORITY_QUEUE: int(os.getenv("SEPARATION_TIME_LIMIT", "600")),
+    ANALYSIS_QUEUE: int(os.getenv("ANALYSIS_TIME_LIMIT", "300")),
+    TRANSCRIPTION_QUEUE: int(os.getenv("TRANSCRIPTION_TIME_LIMIT", "900")),
+    MAINTENANCE_QUEUE: int(os.getenv("MAINTENANCE_TIME_LIMIT", "3600")),
+}
+
+# Tarefa -> fila
+TASK_QUEUES = {
+    "model.tasks.process_audio": SEPARATION_QUEUE,
+    "model.tasks.analyze_bpm": ANALYSIS_QUEUE,
+    "model.tasks.analyze_chords": ANALYSIS_QUEUE,
+    "model.tasks.finalize_project": ANALYSIS_QUEUE,
+    "model.tasks.analysis_failed": ANALYSIS_QUEUE,
+    "model.tasks.transcribe_score": TRANSCRIPTION_QUEUE,
+    "model.tasks.transcribe_lyrics": TRANSCRIPTION_QUEUE,
+    "model.tasks.cleanup_old_files": MAINTENANCE_QUEUE,
+}
+
+
+# Plano -> fila da separação. Os workers de separação consomem as duas
+# filas (-Q separation_priority,separation); o transporte Redis alterna
+# entre elas a cada mensagem, então jobs PRO não esperam atrás de uma
+# rajada de uploads FREE e jobs FREE nunca ficam parados indefinidamente.
+PLAN_QUEUES = {
+    "pro": SEPARATION_PRIORITY_QUEUE,
+    "free": SEPARATION_QUEUE,
+}
+SEPARATION_QUEUES = tuple(PLAN_QUEUES.values())
+
+
+def queue_for_plan(plan: str) -> str:
+    """Fila de separação do plano (FREE para planos desconhecidos)."""
+    return PLAN_QUEUES.get(plan, SEPARATION_QUEUE)
+
+
+def queue_time_limits(queue: str) -> dict:
+    """Limites de tempo (hard e soft) das tarefas de uma fila."""
+    time_limit = QUEUE_TIME_LIMITS[queue]
+    return {"time_limit": time_limit, "soft_time_limit": max(time_limit - 60, 1)}
+
+
 # Configurações
 celery_app.conf.update(
     task_serializer="json",
@@ -26,9 +85,153 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=600,  # 10 minutos
     task_soft_time_limit=540,  # 9 minutos
+    task_queues=[Queue(name) for name in QUEUE_TIME_LIMITS],
+    broker_transport_options={"queue_order_strategy": "round_robin"},  # Alternar entre as filas (sem starvation)
+    task_default_queue=ANALYSIS_QUEUE,  # Tarefas sem rota (ex.: internas do Celery)
+    task_routes={name: {"queue": queue} for name, queue in TASK_QUEUES.items()},
+    task_annotations={name: queue_time_limits(queue) for name, queue in TASK_QUEUES.items()},
     worker_prefetch_multiplier=1,  # Processar 1 tarefa por vez
     worker_max_tasks_per_child=10,  # Reiniciar worker a cada 10 tarefas
 )
 
 # Auto-descobrir tarefas
 celery_app.autodiscover_tasks(["model"])
+
+
+# Engine do banco do processo do worker, reaproveitado entre as tarefas
+# (criado após o fork: conexões não podem ser compartilhadas entre processos)
+_task_engine = None
+_task_session_factory = None
+_task_engine_lock = threading.Lock()
+
+# Pool de execução do worker (preenchido em celeryd_after_setup)
+_worker_pool = {"concurrency": 1, "threaded": False}
+
+
+def task_db_pool_size() -> int:
+    """
+    Conexões do pool do processo.
+    
+    No prefork cada processo executa uma tarefa por vez: uma conexão basta.
+    Em pools de threads (threads, gevent, eventlet) as tarefas concorrentes
+    dividem o processo, então o pool acompanha a concorrência.
+    """
+    configured = int(os.getenv("TASK_DB_POOL_SIZE", "0"))
+    if configured:
+        return configured
+    return _worker_pool["concurrency"] if _worker_pool["threaded"] else 1
+
+
+def init_task_engine():
+    """
+    Cria o engine e a fábrica de sessões do processo.
+    
+    Um engine herdado do processo pai (antes do fork) é descartado sem
+    fechar as conexões, que continuam pertencendo ao pai.
+    """
+    global _task_engine, _task_session_factory
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    
+    with _task_engine_lock:
+        if _task_engine is not None:
+            _task_engine.dispose(close=False)
+        
+        database_url = os.getenv("DATABASE_URL", "postgresql://isomix_user:isomix_pass@db:5432/isomix")
+        if database_url.startswith("sqlite"):
+            engine = create_engine(database_url, connect_args={"check_same_thread": False})
+        else:
+            pool_size = task_db_pool_size()
+            engine = create_engine(
+                database_url,
+                pool_pre_ping=True,  # Conexões derrubadas pelo Postgres entre tarefas
+                pool_size=pool_size,
+                max_overflow=pool_size,  # Sessões aninhadas (ex.: checkpoint dentro da tarefa)
+                pool_recycle=1800,
+            )
+        
+        _task_engine = engine
+        _task_session_factory = sessionmaker(bind=engine)
+        logger.info(f"Engine do banco criado para o processo {os.getpid()}")
+
+
+def task_session_factory():
+    """Fábrica de sessões do processo (cria o engine na primeira chamada)."""
+    if _task_session_factory is None:
+        init_task_engine()
+    return _task_session_factory
+
+
+@celeryd_after_setup.connect
+def record_worker_pool(sender, instance, **kwargs):
+    """Guarda concorrência e tipo de pool do worker para dimensionar o engine."""
+    # pool_cls ainda pode ser o nome dado em -P (ex.: "threads")
+    pool_cls = instance.pool_cls
+    pool_name = pool_cls if isinstance(pool_cls, str) else pool_cls.__module__
+    _worker_pool["concurrency"] = instance.concurrency or os.cpu_count() or 1
+    _worker_pool["threaded"] = any(name in pool_name for name in ("thread", "gevent", "eventlet"))
+
+
+@worker_process_init.connect
+def init_worker_process_database(**kwargs):
+    """Cria o engine do banco em cada processo filho, após o fork."""
+    try:
+        init_task_engine()
+    except Exception as e:
+        # Será criado na primeira tarefa
+        logger.warning(f"Falha ao criar engine do banco: {e}")
+
+
+def consumes_queue(queue: str) -> bool:
+    """
+    Indica se este worker consome a fila (selecionada com -Q).
+    
+    Sem -Q o worker consome todas as filas declaradas.
+    """
+    selected = celery_app.amqp.queues.consume_from
+    return not selected or queue in selected
+
+
+@worker_process_init.connect
+def preload_resident_model(**kwargs):
+    """
+    Carrega o modelo Demucs residente em cada processo filho do worker.
+    
+    Executado após o fork, para que cada processo tenha sua própria cópia
+    e a primeira tarefa não pague o custo de carga do modelo.
+    """
+    from .demucs_engine import RESIDENT_MODEL_TYPES, QUANTIZED_MODEL_TYPES, get_resident_model
+    
+    # Pools que não separam (análise, transcrição) não precisam do modelo
+    if not any(consumes_queue(queue) for queue in SEPARATION_QUEUES):
+        return
+    
+    model_type = os.getenv("AI_MODEL", "demucs")
+    if model_type == "onnx":
+        preload_onnx_session()
+        return
+    if model_type not in RESIDENT_MODEL_TYPES:
+        return
+    
+    try:
+        get_resident_model(
+            os.getenv("AI_MODEL_QUALITY", "htdemucs"),
+            quantized=model_type in QUANTIZED_MODEL_TYPES,
+        )
+    except Exception as e:
+        # A carga será tentada novamente na primeira tarefa
+        logger.warning(f"Falha ao pré-carregar modelo Demucs: {e}")
+
+
+def preload_onnx_session():
+    """Cria a sessão ONNX Runtime do processo antes da primeira tarefa."""
+    from .onnx_engine import get_onnx_session
+    
+    try:
+        get_onnx_session(
+            os.getenv("ONNX_MODEL_PATH", "./models/htdemucs.onnx"),
+            int(os.getenv("ONNX_THREADS", "0")) or os.cpu_count() or 1,
+        )
+    except Exception as e:
+        # A carga será tentada novamente na primeira tarefa
+        logger.warning(f"Falha ao pré-carregar grafo ONNX: {e}")
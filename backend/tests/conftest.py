@@ -6,12 +6,14 @@ Configurações e fixtures compartilhadas para os testes.
 import pytest
 from pathlib import Path
 import tempfile
+import json
 import os
 import sys
 
 # Configurar variáveis de ambiente ANTES de qualquer import do app
 os.environ["DATABASE_URL"] = "sqlite:///:memory:"
 os.environ["STORAGE_PATH"] = tempfile.mkdtemp()
+os.environ["PROGRESS_BRIDGE_ENABLED"] = "false"
 
 
 # ===============================
@@ -149,3 +151,105 @@ def client(db_session):
             yield test_client
         
         app.dependency_overrides.clear()
+
+
+# ===============================
+# Redis Fixtures
+# ===============================
+
+class FakePubSub:
+    """Assinatura pub/sub em memória (interface de redis.asyncio)."""
+    
+    def __init__(self, redis):
+        import asyncio
+        
+        self.redis = redis
+        self.queue = asyncio.Queue()
+        self.channels = []
+    
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self.redis.subscribers.setdefault(channel, []).append(self.queue)
+            self.channels.append(channel)
+            await self.queue.put({"type": "subscribe", "channel": channel, "data": 1})
+    
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+    
+    async def close(self):
+        for channel in self.channels:
+            self.redis.subscribers[channel].remove(self.queue)
+        self.channels = []
+
+
+class FakeRedis:
+    """
+    Stand-in do Redis para testes: publish síncrono (como nos workers) e
+    pubsub assíncrono (como na API), no mesmo processo.
+    """
+    
+    def __init__(self):
+        self.subscribers = {}
+        self.published = []
+    
+    def publish(self, channel, data):
+        self.published.append((channel, data))
+        queues = self.subscribers.get(channel, [])
+        for queue in queues:
+            queue.put_nowait({"type": "message", "channel": channel, "data": data})
+        return len(queues)
+    
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Redis em memória usado pelos publicadores de progresso."""
+    from domain.services import progress_events
+    
+    redis = FakeRedis()
+    monkeypatch.setattr(progress_events, "get_redis", lambda: redis)
+    return redis
+
+
+# ===============================
+# WebSocket Fixtures
+# ===============================
+
+class FakeWebSocket:
+    """WebSocket que guarda as mensagens enviadas (opcionalmente lento)."""
+    
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+        self.sent_at = []
+        self.close_code = None
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text):
+        import asyncio
+        import time
+        
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("conexão fechada")
+        self.sent.append(json.loads(text))
+        self.sent_at.append(time.perf_counter())
+    
+    async def send_json(self, message):
+        self.sent.append(message)
+    
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+@pytest.fixture
+def fake_websocket():
+    """Fábrica de WebSockets falsos."""
+    return FakeWebSocket
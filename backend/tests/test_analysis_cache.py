@@ -0,0 +1,144 @@
+"""
+Testes - Domain Layer: Analysis Cache
+
+Testa o cache de stems/análises endereçado por conteúdo.
+"""
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+
+from domain.models.analysis_cache import AnalysisCacheEntry
+from domain.services.analysis_cache import AnalysisCache, decoded_audio_sha256, file_sha256
+
+VERSION = ("separation-1", "bpm-1")
+
+
+def _write_project(output_dir, size=1000):
+    """Cria artefatos de um projeto processado."""
+    stem_dir = output_dir / "htdemucs" / "song"
+    stem_dir.mkdir(parents=True)
+    (stem_dir / "vocals.wav").write_bytes(b"v" * size)
+    (stem_dir / "drums.wav").write_bytes(b"d" * size)
+    (stem_dir / ".segments.json").write_text("{}")
+    (output_dir / "chords.json").write_text("[]")
+    return {
+        "vocals": str(stem_dir / "vocals.wav"),
+        "drums": str(stem_dir / "drums.wav"),
+    }
+
+
+@pytest.fixture
+def cache(temp_dir):
+    return AnalysisCache(root=temp_dir / "cache", max_bytes=10_000)
+
+
+class TestContentHash:
+    """Testes para o hash do áudio decodificado."""
+
+    def test_same_samples_different_container(self, temp_dir):
+        """WAV e FLAC com as mesmas amostras devem ter o mesmo hash."""
+        data = (np.random.default_rng(0).standard_normal((8000, 2)) * 3000).astype(np.int16)
+        sf.write(temp_dir / "a.wav", data, 8000, subtype="PCM_16")
+        sf.write(temp_dir / "a.flac", data, 8000, subtype="PCM_16")
+
+        assert decoded_audio_sha256(temp_dir / "a.wav") == decoded_audio_sha256(temp_dir / "a.flac")
+        assert file_sha256(temp_dir / "a.wav") != file_sha256(temp_dir / "a.flac")
+
+    def test_different_samples_different_hash(self, temp_dir):
+        """Áudios diferentes devem ter hashes diferentes."""
+        sf.write(temp_dir / "a.wav", np.zeros(8000, dtype=np.int16), 8000)
+        sf.write(temp_dir / "b.wav", np.ones(8000, dtype=np.int16), 8000)
+
+        assert decoded_audio_sha256(temp_dir / "a.wav") != decoded_audio_sha256(temp_dir / "b.wav")
+
+    def test_key_depends_on_model_and_version(self):
+        """Modelo ou versão diferentes devem gerar chaves diferentes."""
+        key = AnalysisCache.make_key("abc", "htdemucs", VERSION)
+
+        assert key != AnalysisCache.make_key("abc", "htdemucs_ft", VERSION)
+        assert key != AnalysisCache.make_key("abc", "htdemucs", ("separation-2", "bpm-1"))
+
+
+class TestAnalysisCache:
+    """Testes para armazenamento, consulta e restauração."""
+
+    def test_store_and_restore(self, db_session, cache, temp_dir):
+        """Um acerto deve restaurar todos os artefatos no novo projeto."""
+        artifacts = _write_project(temp_dir / "p1")
+        cache.store(db_session, "k1", temp_dir / "p1", artifacts, "htdemucs", VERSION, extra={"bpm": 120})
+
+        entry = cache.lookup(db_session, "k1")
+        restored = cache.restore(db_session, entry, temp_dir / "p2")
+
+        assert restored["extra"] == {"bpm": 120}
+        assert set(restored["artifacts"]) == {"vocals", "drums"}
+        assert (temp_dir / "p2" / "htdemucs" / "song" / "vocals.wav").read_bytes() == b"v" * 1000
+        assert (temp_dir / "p2" / "chords.json").exists()
+        assert not (temp_dir / "p2" / "htdemucs" / "song" / ".segments.json").exists()
+        assert entry.hit_count == 1
+
+    def test_restored_files_are_independent_copies(self, db_session, cache, temp_dir):
+        """Regravar um arquivo de projeto não deve alterar o cache nem outros projetos."""
+        artifacts = _write_project(temp_dir / "p1")
+        cache.store(db_session, "k1", temp_dir / "p1", artifacts, "htdemucs", VERSION)
+        cache.restore(db_session, cache.lookup(db_session, "k1"), temp_dir / "p2")
+
+        # Regravação no lugar (ex.: stem retomado do checkpoint)
+        with open(artifacts["vocals"], "r+b") as f:
+            f.write(b"x" * 1000)
+        with open(temp_dir / "p2" / "htdemucs" / "song" / "vocals.wav", "r+b") as f:
+            f.write(b"y" * 1000)
+
+        restored = cache.restore(db_session, cache.lookup(db_session, "k1"), temp_dir / "p3")
+        assert open(restored["artifacts"]["vocals"], "rb").read() == b"v" * 1000
+
+    def test_lookup_by_source_hash(self, db_session, cache, temp_dir):
+        """Deve encontrar a entrada pelo hash do arquivo enviado."""
+        artifacts = _write_project(temp_dir / "p1")
+        cache.store(db_session, "k1", temp_dir / "p1", artifacts, "htdemucs", VERSION, source_sha256="src")
+
+        assert cache.lookup_source(db_session, "src", "htdemucs", VERSION) is not None
+        assert cache.lookup_source(db_session, "src", "htdemucs_ft", VERSION) is None
+
+    def test_hit_and_miss_counters(self, db_session, cache, temp_dir):
+        """Hits e misses devem ser contabilizados."""
+        artifacts = _write_project(temp_dir / "p1")
+        cache.store(db_session, "k1", temp_dir / "p1", artifacts, "htdemucs", VERSION)
+
+        assert cache.lookup(db_session, "missing") is None
+        cache.restore(db_session, cache.lookup(db_session, "k1"), temp_dir / "p2")
+
+        stats = cache.stats(db_session)
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["entries"] == 1
+
+    def test_missing_files_is_a_miss(self, db_session, cache, temp_dir):
+        """Entrada cujo diretório foi apagado deve ser descartada."""
+        import shutil
+
+        artifacts = _write_project(temp_dir / "p1")
+        entry = cache.store(db_session, "k1", temp_dir / "p1", artifacts, "htdemucs", VERSION)
+        shutil.rmtree(entry.path)
+
+        assert cache.lookup(db_session, "k1") is None
+        assert db_session.query(AnalysisCacheEntry).count() == 0
+
+    def test_lru_eviction(self, db_session, cache, temp_dir):
+        """Ao exceder o limite, a entrada menos usada deve ser removida."""
+        for i in range(3):
+            artifacts = _write_project(temp_dir / f"p{i}", size=2000)
+            cache.store(db_session, f"k{i}", temp_dir / f"p{i}", artifacts, "htdemucs", VERSION)
+            time.sleep(0.01)
+            if i == 1:
+                # Acessar k0 o torna mais recente que k1
+                cache.restore(db_session, cache.lookup(db_session, "k0"), temp_dir / "r0")
+
+        keys = {e.key for e in db_session.query(AnalysisCacheEntry).all()}
+        assert keys == {"k0", "k2"}
+        assert not (temp_dir / "cache" / "k1").exists()
+        assert cache.stats(db_session)["evictions"] == 1
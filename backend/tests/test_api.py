@@ -28,6 +28,12 @@ class TestHealthEndpoints:
         assert response.status_code == 200
         data = response.json()
         assert data["status"] == "healthy"
+    
+    def test_health_websocket_gauges(self, client: TestClient):
+        """/health deve expor os medidores das conexões WebSocket."""
+        gauges = client.get("/health").json()["websocket"]
+        
+        assert {"open", "idle", "evicted"} <= set(gauges)
 
 
 class TestUploadEndpoint:
@@ -49,7 +55,7 @@ class TestUploadEndpoint:
         # Arquivo vazio será rejeitado
         assert response.status_code in [400, 422]
     
-    @patch('model.tasks.process_audio.delay')
+    @patch('model.tasks.process_audio.apply_async')
     @patch('domain.validators.audio.AudioValidator.validate_format')
     @patch('domain.validators.audio.AudioValidator.get_audio_metadata')
     def test_upload_valid_file(
@@ -81,13 +87,172 @@ class TestUploadEndpoint:
         assert data["status"] == "pending"
         assert "message" in data
     
+    @patch('model.tasks.process_audio.apply_async')
+    @patch('domain.validators.audio.AudioValidator.validate_format')
+    @patch('domain.validators.audio.AudioValidator.get_audio_metadata')
+    def test_upload_two_stems_mode(
+        self,
+        mock_metadata,
+        mock_validate,
+        mock_celery,
+        client: TestClient,
+        db_session,
+        sample_audio_bytes
+    ):
+        """Modo de dois stems deve ser gravado no projeto."""
+        from domain.models.project import Project, SeparationMode
+        
+        mock_validate.return_value = (True, None)
+        mock_metadata.return_value = {"duration_seconds": 180}
+        mock_celery.return_value = MagicMock(id="mock-task-id")
+        
+        response = client.post(
+            "/api/upload",
+            files={"file": ("test.wav", sample_audio_bytes, "audio/wav")},
+            data={"separation_mode": "two_stems"}
+        )
+        
+        assert response.status_code == 200
+        project = db_session.query(Project).filter(Project.id == response.json()["project_id"]).first()
+        assert project.separation_mode == SeparationMode.TWO_STEMS
+    
+    @patch('model.tasks.process_audio.apply_async')
+    @patch('domain.validators.audio.AudioValidator.validate_format')
+    @patch('domain.validators.audio.AudioValidator.get_audio_metadata')
+    def test_upload_pro_uses_priority_queue(
+        self,
+        mock_metadata,
+        mock_validate,
+        mock_celery,
+        client: TestClient,
+        db_session,
+        sample_audio_bytes
+    ):
+        """Upload de usuário PRO deve ser enfileirado na fila prioritária."""
+        from domain.models.project import Project
+        from domain.models.user import User, UserPlan
+        from domain.services.auth_service import AuthService
+        
+        user = User(email="pro@example.com", hashed_password="x", plan=UserPlan.PRO.value)
+        db_session.add(user)
+        db_session.commit()
+        token = AuthService.create_access_token(user.id, user.email, user.plan)
+        
+        mock_validate.return_value = (True, None)
+        mock_metadata.return_value = {"duration_seconds": 180}
+        mock_celery.return_value = MagicMock(id="mock-task-id")
+        
+        response = client.post(
+            "/api/upload",
+            files={"file": ("test.wav", sample_audio_bytes, "audio/wav")},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        
+        assert response.status_code == 200
+        assert mock_celery.call_args.kwargs["queue"] == "separation_priority"
+        assert mock_celery.call_args.kwargs["time_limit"] >= 120
+        project = db_session.query(Project).filter(Project.id == response.json()["project_id"]).first()
+        assert project.plan == "pro"
+    
+    @patch('model.tasks.process_audio.apply_async')
+    @patch('domain.validators.audio.AudioValidator.validate_format')
+    @patch('domain.validators.audio.AudioValidator.get_audio_metadata')
+    def test_upload_deferred_when_queue_full(
+        self,
+        mock_metadata,
+        mock_validate,
+        mock_celery,
+        client: TestClient,
+        db_session,
+        sample_audio_bytes,
+        temp_dir,
+        monkeypatch
+    ):
+        """Upload que não terminaria no orçamento deve ser adiado sem enfileirar."""
+        from domain.models.project import Project
+        
+        monkeypatch.setenv("STORAGE_PATH", str(temp_dir))
+        mock_validate.return_value = (True, None)
+        mock_metadata.return_value = {"duration_seconds": 180}
+        admission = {"decision": "defer", "message": "Fila cheia", "retry_after": 120}
+        
+        with patch("application.routes.upload.check_admission", return_value=admission):
+            response = client.post(
+                "/api/upload",
+                files={"file": ("test.wav", sample_audio_bytes, "audio/wav")},
+            )
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "120"
+        assert db_session.query(Project).count() == 0
+        mock_celery.assert_not_called()
+        # Nem o arquivo nem o diretório do projeto ficam em uploads/
+        assert list((temp_dir / "uploads").iterdir()) == []
+    
+    @patch('model.tasks.process_audio.apply_async')
+    @patch('domain.validators.audio.AudioValidator.validate_format')
+    @patch('domain.validators.audio.AudioValidator.get_audio_metadata')
+    def test_upload_cache_hit(
+        self,
+        mock_metadata,
+        mock_validate,
+        mock_celery,
+        client: TestClient,
+        db_session,
+        sample_audio_bytes,
+        temp_dir,
+        monkeypatch
+    ):
+        """Áudio já processado deve ser restaurado fora do event loop e publicar o READY."""
+        import asyncio
+        from domain.models.project import Project, ProjectStatus
+        
+        monkeypatch.setenv("STORAGE_PATH", str(temp_dir))
+        monkeypatch.setattr("application.routes.upload.CACHE_ENABLED", True)
+        publish = MagicMock()
+        monkeypatch.setattr("domain.services.progress_events.publish_progress", publish)
+        mock_validate.return_value = (True, None)
+        mock_metadata.return_value = {"duration_seconds": 180}
+        
+        def restore(db, entry, output_dir):
+            with pytest.raises(RuntimeError):
+                asyncio.get_running_loop()
+            return {"artifacts": {}, "extra": {}}
+        
+        with patch("domain.services.analysis_cache.AnalysisCache.lookup_source", return_value=MagicMock()), \
+                patch("domain.services.analysis_cache.AnalysisCache.restore", side_effect=restore):
+            response = client.post(
+                "/api/upload",
+                files={"file": ("test.wav", sample_audio_bytes, "audio/wav")},
+            )
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        project_id = response.json()["project_id"]
+        assert db_session.get(Project, project_id).status == ProjectStatus.READY
+        publish.assert_called_with(project_id, "ready", 100, "Concluído!")
+        mock_celery.assert_not_called()
+    
+    def test_upload_invalid_separation_mode(self, client: TestClient, sample_audio_bytes):
+        """Modo de separação desconhecido deve retornar 422."""
+        response = client.post(
+            "/api/upload",
+            files={"file": ("test.wav", sample_audio_bytes, "audio/wav")},
+            data={"separation_mode": "six_stems"}
+        )
+        
+        assert response.status_code == 422
+    
     @patch('domain.validators.audio.AudioValidator.validate_format')
     def test_upload_invalid_format(
         self,
         mock_validate,
-        client: TestClient
+        client: TestClient,
+        temp_dir,
+        monkeypatch
     ):
         """Upload de formato inválido deve retornar erro 400."""
+        monkeypatch.setenv("STORAGE_PATH", str(temp_dir))
         mock_validate.return_value = (False, "Formato não suportado")
         
         response = client.post(
@@ -98,8 +263,9 @@ class TestUploadEndpoint:
         assert response.status_code == 400
         data = response.json()
         assert "detail" in data
+        assert list((temp_dir / "uploads").iterdir()) == []
     
-    @patch('model.tasks.process_audio.delay')
+    @patch('model.tasks.process_audio.apply_async')
     @patch('domain.validators.audio.AudioValidator.validate_format')
     @patch('domain.validators.audio.AudioValidator.get_audio_metadata')
     def test_upload_file_too_large(
@@ -132,6 +298,105 @@ class TestUploadEndpoint:
         assert "20MB" in data["detail"] or "grande" in data["detail"].lower()
 
 
+class TestSaveUpload:
+    """Testes para a gravação do upload em blocos."""
+    
+    @pytest.mark.asyncio
+    async def test_streams_file_and_hash(self, tmp_path):
+        """Arquivo gravado deve ser idêntico ao enviado, com o SHA-256 calculado no caminho."""
+        import hashlib
+        import io
+        from fastapi import UploadFile
+        from application.routes.upload import save_upload
+        
+        content = bytes(range(256)) * 1000
+        destination = tmp_path / "song.mp3"
+        
+        saved = await save_upload(
+            UploadFile(io.BytesIO(content), filename="song.mp3"), destination, len(content), chunk_size=4096
+        )
+        
+        assert saved == (len(content), hashlib.sha256(content).hexdigest())
+        assert destination.read_bytes() == content
+    
+    @pytest.mark.asyncio
+    async def test_aborts_when_over_limit(self, tmp_path):
+        """Upload acima do limite deve parar de ler cedo e remover o arquivo parcial."""
+        import io
+        from fastapi import UploadFile
+        from application.routes.upload import save_upload
+        
+        source = io.BytesIO(b"x" * 100_000)
+        destination = tmp_path / "large.mp3"
+        
+        saved = await save_upload(UploadFile(source, filename="large.mp3"), destination, 10_000, chunk_size=4096)
+        
+        assert saved is None
+        assert not destination.exists()
+        assert source.tell() <= 10_000 + 4096
+
+
+class TestReprocessEndpoint:
+    """Testes para o reprocessamento de projetos com falha."""
+    
+    @patch('model.tasks.process_audio.apply_async')
+    @patch('domain.validators.audio.AudioValidator.validate_format')
+    @patch('domain.validators.audio.AudioValidator.get_audio_metadata')
+    def test_upload_fail_reprocess(
+        self,
+        mock_metadata,
+        mock_validate,
+        mock_celery,
+        client: TestClient,
+        db_session,
+        sample_audio_bytes,
+        temp_dir,
+        monkeypatch
+    ):
+        """Projeto enviado pelo usuário, que falhou, deve poder ser reprocessado por ele."""
+        from domain.models.project import Project, ProjectStatus
+        from domain.models.user import User
+        from domain.services.auth_service import AuthService
+        from model.tasks import analysis_failed
+        
+        monkeypatch.setenv("STORAGE_PATH", str(temp_dir))
+        monkeypatch.setattr("domain.services.progress_events.publish_progress", MagicMock())
+        user = User(email="dono@example.com", hashed_password="x")
+        db_session.add(user)
+        db_session.commit()
+        headers = {"Authorization": f"Bearer {AuthService.create_access_token(user.id, user.email, user.plan)}"}
+        mock_validate.return_value = (True, None)
+        mock_metadata.return_value = {"duration_seconds": 180}
+        mock_celery.return_value = MagicMock(id="mock-task-id")
+        
+        upload = client.post(
+            "/api/upload",
+            files={"file": ("test.wav", sample_audio_bytes, "audio/wav")},
+            headers=headers,
+        )
+        project_id = upload.json()["project_id"]
+        assert db_session.get(Project, project_id).user_id == user.id
+        
+        monkeypatch.setattr("model.tasks.open_task_session", lambda: db_session)
+        analysis_failed(None, RuntimeError("worker perdido"), None, project_id)
+        
+        response = client.post(f"/api/projects/{project_id}/reprocess", headers=headers)
+        
+        assert response.status_code == 200
+        db_session.expire_all()
+        project = db_session.get(Project, project_id)
+        assert project.status == ProjectStatus.PENDING
+        assert project.processing_attempts == 1
+        assert mock_celery.call_count == 2
+        
+        # Outro usuário não enxerga o projeto
+        other = User(email="outro@example.com", hashed_password="x")
+        db_session.add(other)
+        db_session.commit()
+        other_headers = {"Authorization": f"Bearer {AuthService.create_access_token(other.id, other.email, other.plan)}"}
+        assert client.post(f"/api/projects/{project_id}/reprocess", headers=other_headers).status_code == 404
+
+
 class TestStatusEndpoint:
     """Testes para o endpoint /api/status/{project_id}."""
     
@@ -149,6 +414,234 @@ class TestStatusEndpoint:
         
         # Pode ser 404 ou 422 dependendo da validação
         assert response.status_code in [404, 422]
+    
+    @pytest.fixture
+    def auth_headers(self, db_session):
+        """Cabeçalho de autenticação de um usuário registrado."""
+        from domain.models.user import User
+        from domain.services.auth_service import AuthService
+        
+        user = User(email="ops@example.com", hashed_password="x")
+        db_session.add(user)
+        db_session.commit()
+        token = AuthService.create_access_token(user.id, user.email, user.plan)
+        return {"Authorization": f"Bearer {token}"}
+    
+    @pytest.mark.parametrize("path", ["/api/cache/stats", "/api/queue", "/api/metrics/stages"])
+    def test_operational_endpoints_require_auth(self, client: TestClient, path):
+        """Métricas operacionais não devem ser expostas sem autenticação."""
+        response = client.get(path)
+        
+        assert response.status_code == 401
+    
+    def _processing_project(self, db_session):
+        """Cria um projeto em processamento com tarefa associada."""
+        from domain.models.project import Project, ProjectStatus
+        
+        project = Project(
+            original_filename="song.wav",
+            original_file_path="/tmp/song.wav",
+            file_size_mb=1,
+            status=ProjectStatus.PROCESSING,
+            task_id="task-123",
+        )
+        db_session.add(project)
+        db_session.commit()
+        return project
+    
+    def test_status_reads_task_progress(self, client: TestClient, db_session):
+        """Progresso deve vir do estado publicado pela tarefa."""
+        project = self._processing_project(db_session)
+        meta = {"status": "PROCESSING", "result": {"progress": 42, "status": "Separando áudio... (3/7)"}}
+        
+        from model.worker import celery_app
+        
+        # O backend é por thread: substituir na classe
+        with patch.object(type(celery_app.backend), "get_task_meta", return_value=meta) as mock_meta:
+            response = client.get(f"/api/status/{project.id}")
+        
+        assert response.status_code == 200
+        assert response.json()["progress"] == 42
+        assert response.json()["message"] == "Separando áudio... (3/7)"
+        mock_meta.assert_called_once_with("task-123")
+    
+    def test_status_reads_progress_off_event_loop(self, client: TestClient, db_session):
+        """A leitura bloqueante do result backend não deve rodar no event loop."""
+        import asyncio
+        
+        project = self._processing_project(db_session)
+        
+        from model.worker import celery_app
+        
+        def get_task_meta(task_id):
+            with pytest.raises(RuntimeError):
+                asyncio.get_running_loop()
+            return {"status": "PROCESSING", "result": {"progress": 42}}
+        
+        with patch.object(type(celery_app.backend), "get_task_meta", side_effect=get_task_meta):
+            response = client.get(f"/api/status/{project.id}")
+        
+        assert response.json()["progress"] == 42
+    
+    def test_status_backend_unavailable(self, client: TestClient, db_session):
+        """Sem result backend e sem progresso reportado, o status não deve inventar um valor."""
+        project = self._processing_project(db_session)
+        
+        from model.worker import celery_app
+        
+        with patch.object(type(celery_app.backend), "get_task_meta", side_effect=ConnectionError):
+            response = client.get(f"/api/status/{project.id}")
+        
+        assert response.status_code == 200
+        assert response.json()["progress"] == 0
+    
+    def test_status_started_uses_last_reported(self, client: TestClient, db_session, monkeypatch):
+        """Tarefa sem meta de progresso (STARTED) deve usar o último progresso reportado."""
+        import importlib
+        from application.websocket.status_cache import ProjectStatusCache
+        from domain.services.progress_events import progress_event
+        from application.websocket.manager import serialize
+        from model.worker import celery_app
+        
+        project = self._processing_project(db_session)
+        cache = ProjectStatusCache()
+        cache.update(project.id, serialize(progress_event(project.id, "processing", 37, "Separando áudio...")))
+        # O pacote exporta a instância `status_cache` com o mesmo nome do módulo
+        monkeypatch.setattr(importlib.import_module("application.websocket.status_cache"), "status_cache", cache)
+        
+        with patch.object(type(celery_app.backend), "get_task_meta", return_value={"status": "STARTED", "result": None}):
+            response = client.get(f"/api/status/{project.id}")
+        
+        assert response.json()["progress"] == 37
+    
+    def test_status_pending_shows_queue(self, client: TestClient, db_session, auth_headers):
+        """Projeto aguardando deve informar posição na fila e espera estimada."""
+        from domain.models.project import Project, ProjectStatus
+        
+        project = Project(
+            original_filename="song.wav",
+            original_file_path="/tmp/song.wav",
+            file_size_mb=1,
+            duration_seconds=120,
+            status=ProjectStatus.PENDING,
+            plan="pro",
+        )
+        db_session.add(project)
+        db_session.commit()
+        
+        response = client.get(f"/api/status/{project.id}")
+        
+        assert response.status_code == 200
+        queue = response.json()["queue"]
+        assert queue["plan"] == "pro"
+        assert queue["position"] == 1
+        assert queue["estimated_wait_seconds"] >= 0
+        
+        estimates = client.get("/api/queue", headers=auth_headers).json()
+        assert estimates["pro"]["pending"] == 1
+        assert estimates["free"]["jobs_ahead"] == 1
+    
+    def test_stage_metrics(self, client: TestClient, db_session, auth_headers):
+        """Endpoint de métricas deve agregar as medições por etapa."""
+        from domain.models.processing_metric import ProcessingMetric
+        
+        db_session.add_all([
+            ProcessingMetric(project_id="p1", stage="separate", wall_seconds=wall, cpu_seconds=wall, audio_seconds=180.0)
+            for wall in (90.0, 120.0)
+        ])
+        db_session.commit()
+        
+        response = client.get("/api/metrics/stages", headers=auth_headers)
+        
+        assert response.status_code == 200
+        separate = response.json()["stages"]["separate"]
+        assert separate["count"] == 2
+        assert separate["wall_seconds"]["p50"] == 105.0
+
+
+class TestLazyAnalysisEndpoints:
+    """Testes para as análises calculadas sob demanda."""
+    
+    @pytest.fixture
+    def ready_project(self, db_session, temp_dir, monkeypatch):
+        """Projeto pronto com o storage no diretório temporário."""
+        from domain.models.project import Project, ProjectStatus
+        
+        monkeypatch.setenv("STORAGE_PATH", str(temp_dir))
+        project = Project(
+            original_filename="song.wav",
+            original_file_path="/tmp/song.wav",
+            file_size_mb=1,
+            status=ProjectStatus.READY,
+        )
+        db_session.add(project)
+        db_session.commit()
+        return project
+    
+    def test_first_request_enqueues_once(self, client: TestClient, ready_project):
+        """Pedidos antes do resultado devem responder 202 e enfileirar uma única vez."""
+        with patch("model.tasks.analyze_chords.delay", return_value=MagicMock(id="task-1")) as delay:
+            first = client.get(f"/api/chords/{ready_project.id}")
+            second = client.get(f"/api/chords/{ready_project.id}")
+        
+        assert first.status_code == second.status_code == 202
+        assert first.json()["chords"] == []
+        assert first.json()["status"] == "queued"
+        delay.assert_called_once_with(ready_project.id, "/tmp/song.wav")
+    
+    def test_enqueue_off_event_loop(self, client: TestClient, ready_project):
+        """O enfileiramento deve rodar fora do event loop."""
+        import asyncio
+        
+        def delay(*args):
+            with pytest.raises(RuntimeError):
+                asyncio.get_running_loop()
+            return MagicMock(id="task-1")
+        
+        with patch("model.tasks.transcribe_lyrics.delay", side_effect=delay) as mocked:
+            response = client.get(f"/api/lyrics/{ready_project.id}")
+        
+        assert response.status_code == 202
+        mocked.assert_called_once()
+    
+    def test_ready_result_served(self, client: TestClient, ready_project, temp_dir):
+        """Resultado já calculado deve ser servido sem enfileirar nada."""
+        import json
+        
+        project_dir = temp_dir / "stems" / ready_project.id
+        project_dir.mkdir(parents=True)
+        (project_dir / "lyrics.json").write_text(json.dumps([{"start": 0, "end": 1, "text": "la"}]))
+        
+        with patch("model.tasks.transcribe_lyrics.delay") as delay:
+            response = client.get(f"/api/lyrics/{ready_project.id}")
+        
+        assert response.status_code == 200
+        assert response.json()["count"] == 1
+        delay.assert_not_called()
+    
+    def test_score_uses_other_stem(self, client: TestClient, ready_project, db_session):
+        """Partitura deve ser transcrita a partir do stem instrumental."""
+        from domain.models.stem import Stem
+        
+        db_session.add(Stem(id="stem-1", project_id=ready_project.id, stem_type="other", file_path="/stems/other.wav", file_size_mb=1))
+        db_session.commit()
+        
+        with patch("model.tasks.transcribe_score.delay", return_value=MagicMock(id="task-1")) as delay:
+            response = client.get(f"/api/score/{ready_project.id}")
+        
+        assert response.status_code == 202
+        delay.assert_called_once_with(ready_project.id, "/stems/other.wav")
+    
+    def test_score_unavailable_in_two_stems(self, client: TestClient, ready_project, db_session):
+        """Modo de dois stems não tem partitura."""
+        from domain.models.project import SeparationMode
+        
+        ready_project.separation_mode = SeparationMode.TWO_STEMS
+        db_session.commit()
+        
+        response = client.get(f"/api/score/{ready_project.id}")
+        
+        assert response.status_code == 400
 
 
 class TestExportEndpoint:
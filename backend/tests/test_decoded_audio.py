@@ -0,0 +1,91 @@
+"""
+Testes - Model Layer: DecodedAudio
+
+Testa a decodificação única compartilhada entre as análises.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+librosa = pytest.importorskip("librosa")
+
+from model.decoded_audio import DecodedAudio, load_mono
+
+
+@pytest.fixture
+def stereo_wav(temp_dir):
+    """Cria um WAV estéreo de 2 segundos a 44.1 kHz."""
+    t = np.arange(2 * 44100) / 44100
+    left = 0.5 * np.sin(2 * np.pi * 440 * t)
+    right = 0.3 * np.sin(2 * np.pi * 660 * t)
+    path = temp_dir / "song.wav"
+    sf.write(str(path), np.stack([left, right], axis=1).astype(np.float32), 44100, subtype="FLOAT")
+    return path
+
+
+class TestDecodedAudio:
+    """Testes para o DecodedAudio."""
+
+    def test_matches_librosa_load(self, temp_dir, stereo_wav):
+        """Resultado deve ser igual ao librosa.load mono na mesma taxa."""
+        audio = DecodedAudio(stereo_wav, temp_dir / ".audio")
+        expected, _ = librosa.load(str(stereo_wav), sr=22050, mono=True)
+
+        y = audio.load(22050)
+
+        assert y.dtype == np.float32
+        assert y.shape == expected.shape
+        assert np.abs(y - expected).max() < 1e-5
+
+    def test_decodes_once(self, temp_dir, stereo_wav, monkeypatch):
+        """O arquivo deve ser decodificado uma única vez para várias taxas."""
+        calls = []
+        original_read = sf.read
+        monkeypatch.setattr(sf, "read", lambda *a, **k: calls.append(a) or original_read(*a, **k))
+        audio = DecodedAudio(stereo_wav, temp_dir / ".audio")
+
+        audio.load(22050)
+        audio.load(16000)
+        audio.load(22050)
+
+        assert len(calls) == 1
+
+    def test_reused_across_instances(self, temp_dir, stereo_wav, monkeypatch):
+        """Outra instância deve reutilizar o .npy em disco (memory-mapped)."""
+        DecodedAudio(stereo_wav, temp_dir / ".audio").load(22050)
+        monkeypatch.setattr(sf, "read", lambda *a, **k: pytest.fail("decodificou de novo"))
+
+        y = DecodedAudio(stereo_wav, temp_dir / ".audio").load(22050)
+
+        assert isinstance(y, np.memmap)
+        assert not y.flags.writeable
+
+    def test_same_name_different_files(self, temp_dir, stereo_wav):
+        """Arquivos com o mesmo nome em pastas diferentes não colidem."""
+        other_dir = temp_dir / "stems"
+        other_dir.mkdir()
+        other = other_dir / "song.wav"
+        sf.write(str(other), np.zeros((1000, 2), dtype=np.float32), 44100)
+
+        first = DecodedAudio(stereo_wav, temp_dir / ".audio").load(44100)
+        second = DecodedAudio(other, temp_dir / ".audio").load(44100)
+
+        assert len(first) == 2 * 44100
+        assert len(second) == 1000
+
+    def test_wav_path(self, temp_dir, stereo_wav):
+        """WAV materializado deve estar mono e já na taxa pedida."""
+        audio = DecodedAudio(stereo_wav, temp_dir / ".audio")
+
+        path = audio.wav_path(22050)
+        data, samplerate = sf.read(str(path), dtype="float32")
+
+        assert samplerate == 22050
+        assert data.ndim == 1
+        assert np.array_equal(data, audio.load(22050))
+
+    def test_load_mono_accepts_path(self, stereo_wav):
+        """load_mono deve continuar aceitando caminhos."""
+        y = load_mono(stereo_wav, 22050)
+
+        assert len(y) == 2 * 22050
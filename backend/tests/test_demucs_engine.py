@@ -0,0 +1,427 @@
+"""
+Testes - Model Layer: DemucsEngine
+
+Testa o motor Demucs in-process usando um modelo falso (sem pesos reais).
+"""
+import pytest
+import numpy as np
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("demucs")
+sf = pytest.importorskip("soundfile")
+
+from model import demucs_engine
+from model.demucs_engine import ResidentDemucsEngine, get_resident_model, create_separator
+from model.separator import StemType
+
+
+class FakeDemucsModel(torch.nn.Module):
+    """Modelo falso: cada fonte é uma fração fixa da mistura."""
+    
+    sources = ["drums", "bass", "other", "vocals"]
+    samplerate = 8000
+    audio_channels = 2
+    segment = 1.0
+    
+    def __init__(self):
+        super().__init__()
+        self.gains = torch.nn.Parameter(torch.tensor([0.1, 0.2, 0.3, 0.4]), requires_grad=False)
+    
+    def forward(self, mix):
+        return self.gains[None, :, None, None] * mix[:, None]
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Registra o modelo falso como residente."""
+    model = FakeDemucsModel()
+    monkeypatch.setitem(demucs_engine._resident_models, "fake", model)
+    return model
+
+
+@pytest.fixture
+def stereo_wav(temp_dir):
+    """Cria um WAV estéreo de 3 segundos na taxa do modelo falso."""
+    rng = np.random.default_rng(0)
+    data = (rng.standard_normal((3 * 8000, 2)) * 0.1).astype(np.float32)
+    path = temp_dir / "song.wav"
+    sf.write(str(path), data, 8000, subtype="FLOAT")
+    return path, data
+
+
+def _separate_parallel(input_path, output_dir):
+    """Separação com 2 processos de janelas (executada dentro de um worker do pool)."""
+    return ResidentDemucsEngine(
+        "fake", shifts=1, segment_seconds=1.0, segment_overlap=0.25, workers=2, cpu_cores=2
+    ).separate(input_path, output_dir)
+
+
+def _billiard_worker_main():
+    """
+    Separa serial e em paralelo dentro de um worker do billiard (processo novo).
+    
+    Uso: python -c "..." <arquivo de entrada> <diretório de saída>
+    """
+    import sys
+    from pathlib import Path
+    import billiard
+    
+    input_path, output_dir = Path(sys.argv[1]), Path(sys.argv[2])
+    demucs_engine._resident_models["fake"] = FakeDemucsModel()
+    ResidentDemucsEngine(
+        "fake", shifts=1, segment_seconds=1.0, segment_overlap=0.25
+    ).separate(input_path, output_dir / "serial")
+    
+    pool = billiard.get_context("fork").Pool(processes=1)
+    try:
+        pool.apply_async(_separate_parallel, (input_path, output_dir / "parallel")).get(timeout=120)
+    finally:
+        pool.terminate()
+
+
+class TestResidentModel:
+    """Testes para o cache de modelos residentes."""
+    
+    def test_model_loaded_once(self, monkeypatch):
+        """O modelo deve ser carregado apenas na primeira chamada."""
+        import demucs.pretrained
+        
+        calls = []
+        
+        def fake_get_model(name):
+            calls.append(name)
+            return FakeDemucsModel()
+        
+        monkeypatch.setattr(demucs.pretrained, "get_model", fake_get_model)
+        monkeypatch.setattr(demucs_engine, "_resident_models", {})
+        
+        first = get_resident_model("htdemucs")
+        second = get_resident_model("htdemucs")
+        
+        assert first is second
+        assert calls == ["htdemucs"]
+
+
+class TestResidentDemucsEngine:
+    """Testes para o ResidentDemucsEngine."""
+    
+    def test_factory(self):
+        """Factory deve criar o motor residente."""
+        separator = create_separator("demucs_resident")
+        assert isinstance(separator, ResidentDemucsEngine)
+        assert separator.get_model_name().endswith("resident")
+    
+    def test_separate_returns_all_stems(self, fake_model, stereo_wav, temp_dir):
+        """Separação deve gerar os 4 stems no layout da CLI."""
+        input_path, _ = stereo_wav
+        engine = ResidentDemucsEngine("fake", shifts=0)
+        
+        stems = engine.separate(input_path, temp_dir / "out")
+        
+        assert set(stems) == {StemType.VOCALS, StemType.DRUMS, StemType.BASS, StemType.OTHER}
+        for stem_path in stems.values():
+            assert stem_path.exists()
+            assert stem_path.parent == temp_dir / "out" / "fake" / "song"
+    
+    def test_stems_sum_to_mix(self, fake_model, stereo_wav, temp_dir):
+        """A soma dos stems deve reconstruir a mistura original."""
+        input_path, data = stereo_wav
+        engine = ResidentDemucsEngine("fake", shifts=0)
+        
+        stems = engine.separate(input_path, temp_dir / "out")
+        total = sum(sf.read(str(path), dtype="float32")[0] for path in stems.values())
+        
+        assert total.shape == data.shape
+        assert np.abs(total - data).max() < 1e-3
+    
+    def test_invalid_file(self, fake_model, invalid_file, temp_dir):
+        """Arquivo inválido deve gerar AudioProcessingError."""
+        from model.separator import AudioProcessingError
+        
+        engine = ResidentDemucsEngine("fake", shifts=0)
+        with pytest.raises(AudioProcessingError):
+            engine.separate(invalid_file, temp_dir / "out")
+
+
+class TestQuantizedModel:
+    """Testes para o modo rápido (quantização dinâmica int8)."""
+    
+    def test_factory(self):
+        """demucs_fast deve criar o motor residente quantizado."""
+        separator = create_separator("demucs_fast")
+        assert isinstance(separator, ResidentDemucsEngine)
+        assert separator.quantized
+        assert separator.resumable
+        assert "int8" in separator.get_model_name()
+    
+    def test_linear_layers_quantized(self):
+        """Camadas lineares devem ser trocadas por versões int8."""
+        model = torch.nn.Sequential(torch.nn.Linear(16, 16), torch.nn.ReLU(), torch.nn.Linear(16, 4))
+        x = torch.randn(8, 16)
+        expected = model(x)
+        
+        quantized = demucs_engine.quantize_model(model)
+        
+        assert not any(type(m) is torch.nn.Linear for m in quantized.modules())
+        assert torch.allclose(quantized(x), expected, atol=0.05)
+    
+    def test_quantized_model_is_separate_instance(self, monkeypatch):
+        """Float e int8 devem ser residentes independentes."""
+        import demucs.pretrained
+        
+        monkeypatch.setattr(demucs.pretrained, "get_model", lambda name: FakeDemucsModel())
+        monkeypatch.setattr(demucs_engine, "_resident_models", {})
+        
+        float_model = get_resident_model("htdemucs")
+        int8_model = get_resident_model("htdemucs", quantized=True)
+        
+        assert float_model is not int8_model
+        assert int8_model is get_resident_model("htdemucs", quantized=True)
+
+
+class TestProgressCallback:
+    """Testes para o progresso reportado pelo separador."""
+    
+    def test_segmented_reports_each_window(self, fake_model, stereo_wav, temp_dir):
+        """O modo segmentado deve reportar cada janela concluída."""
+        input_path, _ = stereo_wav
+        engine = ResidentDemucsEngine("fake", shifts=0, segment_seconds=1.0, segment_overlap=0.25)
+        calls = []
+        
+        engine.separate(input_path, temp_dir / "out", progress_callback=lambda done, total: calls.append((done, total)))
+        
+        total = calls[0][1]
+        assert calls == [(i, total) for i in range(total + 1)]
+    
+    def test_whole_reports_completion(self, fake_model, stereo_wav, temp_dir):
+        """O modo de faixa inteira deve reportar apenas a conclusão."""
+        input_path, _ = stereo_wav
+        calls = []
+        
+        ResidentDemucsEngine("fake", shifts=0).separate(
+            input_path, temp_dir / "out", progress_callback=lambda done, total: calls.append((done, total))
+        )
+        
+        assert calls == [(1, 1)]
+
+
+class TestTwoStems:
+    """Testes para o modo de dois stems (vocals + acompanhamento)."""
+    
+    def test_factory(self):
+        """Factory deve repassar o modo de dois stems."""
+        separator = create_separator("demucs_segmented", two_stems="vocals")
+        assert separator.two_stems == "vocals"
+    
+    @pytest.mark.parametrize("segment_seconds", [None, 1.0])
+    def test_vocals_and_accompaniment(self, fake_model, stereo_wav, temp_dir, segment_seconds):
+        """Devem ser gravados apenas vocals e no_vocals (soma das demais fontes)."""
+        input_path, data = stereo_wav
+        engine = ResidentDemucsEngine(
+            "fake", shifts=0, segment_seconds=segment_seconds, segment_overlap=0.25, two_stems="vocals"
+        )
+        
+        stems = engine.separate(input_path, temp_dir / "out")
+        
+        assert set(stems) == {StemType.VOCALS, StemType.NO_VOCALS}
+        assert sorted(p.name for p in stems[StemType.VOCALS].parent.glob("*.wav")) == ["no_vocals.wav", "vocals.wav"]
+        vocals, _ = sf.read(str(stems[StemType.VOCALS]), dtype="float32")
+        accompaniment, _ = sf.read(str(stems[StemType.NO_VOCALS]), dtype="float32")
+        assert np.abs(vocals - 0.4 * data).max() < 1e-3
+        assert np.abs(accompaniment - 0.6 * data).max() < 1e-3
+    
+    def test_unknown_stem(self, fake_model, stereo_wav, temp_dir):
+        """Stem inexistente no modelo deve gerar AudioProcessingError."""
+        from model.separator import AudioProcessingError
+        
+        input_path, _ = stereo_wav
+        engine = ResidentDemucsEngine("fake", shifts=0, segment_seconds=1.0, two_stems="guitar")
+        
+        with pytest.raises(AudioProcessingError):
+            engine.separate(input_path, temp_dir / "out")
+    
+    def test_cli_command(self, monkeypatch, temp_audio_file, temp_dir):
+        """A CLI deve receber --two-stems e retornar os dois stems."""
+        import subprocess
+        from model.demucs_engine import DemucsEngine
+        
+        commands = []
+        
+        def fake_run(cmd, **kwargs):
+            commands.append(cmd)
+            stem_dir = temp_dir / "out" / "htdemucs" / temp_audio_file.stem
+            stem_dir.mkdir(parents=True)
+            for name in ("vocals", "no_vocals"):
+                (stem_dir / f"{name}.wav").write_bytes(b"RIFF")
+            return subprocess.CompletedProcess(cmd, 0, "", "")
+        
+        monkeypatch.setattr(subprocess, "run", fake_run)
+        stems = DemucsEngine("htdemucs", two_stems="vocals").separate(temp_audio_file, temp_dir / "out")
+        
+        assert commands[0][1:3] == ["--two-stems", "vocals"]
+        assert set(stems) == {StemType.VOCALS, StemType.NO_VOCALS}
+
+
+class TestPlanWindows:
+    """Testes para a divisão da faixa em janelas."""
+    
+    def test_windows_cover_track(self):
+        """Janelas devem cobrir a faixa inteira com a sobreposição pedida."""
+        from model.segmentation import plan_windows
+        
+        windows = plan_windows(24000, 8000, 2000)
+        
+        assert windows[0][0] == 0
+        assert windows[-1][1] == 24000
+        for (_, prev_end), (start, _) in zip(windows, windows[1:]):
+            assert prev_end - start == 2000
+    
+    def test_short_track_single_window(self):
+        """Faixa menor que a janela deve gerar uma única janela."""
+        from model.segmentation import plan_windows
+        
+        assert plan_windows(5000, 8000, 2000) == [(0, 5000)]
+    
+    def test_invalid_overlap(self):
+        """Sobreposição maior que meia janela deve ser rejeitada."""
+        from model.segmentation import plan_windows
+        
+        with pytest.raises(ValueError):
+            plan_windows(24000, 4000, 2000)
+        with pytest.raises(ValueError):
+            plan_windows(24000, 4000, -1)
+
+
+class TestSegmentedSeparation:
+    """Testes para o modo segmentado com checkpoints."""
+    
+    def _read_stems(self, stems):
+        return {k: sf.read(str(p), dtype="float32")[0] for k, p in stems.items()}
+    
+    def test_segmented_matches_whole(self, fake_model, stereo_wav, temp_dir):
+        """Modo segmentado deve produzir o mesmo resultado da faixa inteira."""
+        input_path, data = stereo_wav
+        
+        whole = ResidentDemucsEngine("fake", shifts=0).separate(input_path, temp_dir / "whole")
+        segmented = ResidentDemucsEngine(
+            "fake", shifts=0, segment_seconds=1.0, segment_overlap=0.25
+        ).separate(input_path, temp_dir / "segmented")
+        
+        whole_data = self._read_stems(whole)
+        segmented_data = self._read_stems(segmented)
+        for stem_type in whole_data:
+            assert segmented_data[stem_type].shape == data.shape
+            assert np.abs(segmented_data[stem_type] - whole_data[stem_type]).max() < 1e-3
+    
+    def test_zero_overlap_matches_whole(self, fake_model, stereo_wav, temp_dir):
+        """Sem sobreposição, as janelas devem ser concatenadas sem perder amostras."""
+        input_path, data = stereo_wav
+        
+        whole = ResidentDemucsEngine("fake", shifts=0).separate(input_path, temp_dir / "whole")
+        segmented = ResidentDemucsEngine(
+            "fake", shifts=0, segment_seconds=1.0, segment_overlap=0
+        ).separate(input_path, temp_dir / "segmented")
+        
+        whole_data = self._read_stems(whole)
+        segmented_data = self._read_stems(segmented)
+        for stem_type in whole_data:
+            assert segmented_data[stem_type].shape == data.shape
+            assert np.abs(segmented_data[stem_type] - whole_data[stem_type]).max() < 1e-3
+    
+    def test_resume_after_interruption(self, fake_model, stereo_wav, temp_dir, monkeypatch):
+        """Após interrupção, a separação deve continuar da próxima janela."""
+        from celery.exceptions import SoftTimeLimitExceeded
+        
+        input_path, _ = stereo_wav
+        original = demucs_engine._separate_window
+        calls = []
+        
+        def interrupted(*args, seed, **kwargs):
+            calls.append(seed)
+            if len(calls) == 3:
+                raise SoftTimeLimitExceeded()
+            return original(*args, seed=seed, **kwargs)
+        
+        engine = ResidentDemucsEngine("fake", shifts=0, segment_seconds=1.0, segment_overlap=0.25)
+        assert engine.resumable
+        
+        monkeypatch.setattr(demucs_engine, "_separate_window", interrupted)
+        with pytest.raises(SoftTimeLimitExceeded):
+            engine.separate(input_path, temp_dir / "out")
+        
+        def counting(*args, seed, **kwargs):
+            calls.append(seed)
+            return original(*args, seed=seed, **kwargs)
+        
+        calls.clear()
+        monkeypatch.setattr(demucs_engine, "_separate_window", counting)
+        resumed = engine.separate(input_path, temp_dir / "out")
+        
+        # Janelas 0 e 1 já estavam no checkpoint
+        assert calls == [2, 3]
+        
+        reference = ResidentDemucsEngine(
+            "fake", shifts=0, segment_seconds=1.0, segment_overlap=0.25
+        ).separate(input_path, temp_dir / "reference")
+        resumed_data = self._read_stems(resumed)
+        for stem_type, expected in self._read_stems(reference).items():
+            assert np.array_equal(resumed_data[stem_type], expected)
+    
+    def test_completed_separation_is_not_redone(self, fake_model, stereo_wav, temp_dir, monkeypatch):
+        """Uma separação já concluída deve ser reaproveitada do checkpoint."""
+        input_path, _ = stereo_wav
+        engine = ResidentDemucsEngine("fake", shifts=0, segment_seconds=1.0, segment_overlap=0.25)
+        engine.separate(input_path, temp_dir / "out")
+        
+        def fail(*args, **kwargs):
+            raise AssertionError("janela reprocessada")
+        
+        monkeypatch.setattr(demucs_engine, "_separate_window", fail)
+        stems = engine.separate(input_path, temp_dir / "out")
+        
+        assert all(path.exists() for path in stems.values())
+
+
+class TestParallelSegments:
+    """Testes para a separação de janelas em pool de processos."""
+    
+    def test_parallel_matches_serial(self, fake_model, stereo_wav, temp_dir):
+        """Separação paralela deve gerar exatamente a mesma saída da serial."""
+        input_path, _ = stereo_wav
+        
+        serial = ResidentDemucsEngine(
+            "fake", shifts=1, segment_seconds=1.0, segment_overlap=0.25
+        ).separate(input_path, temp_dir / "serial")
+        parallel = ResidentDemucsEngine(
+            "fake", shifts=1, segment_seconds=1.0, segment_overlap=0.25, workers=2, cpu_cores=2
+        ).separate(input_path, temp_dir / "parallel")
+        
+        for stem_type, path in serial.items():
+            expected = sf.read(str(path), dtype="int16")[0]
+            actual = sf.read(str(parallel[stem_type]), dtype="int16")[0]
+            assert np.array_equal(actual, expected)
+    
+    def test_parallel_inside_billiard_worker(self, stereo_wav, temp_dir):
+        """Janelas paralelas devem funcionar dentro de um processo do pool prefork (daemônico)."""
+        import subprocess
+        import sys
+        from pathlib import Path
+        
+        pytest.importorskip("billiard")
+        input_path, _ = stereo_wav
+        
+        # Interpretador novo: o fork não herda threads deixadas por outros testes
+        subprocess.run(
+            [sys.executable, "-c", "from tests.test_demucs_engine import _billiard_worker_main; _billiard_worker_main()",
+             str(input_path), str(temp_dir)],
+            cwd=Path(__file__).resolve().parents[1],
+            check=True,
+            timeout=300,
+        )
+        
+        for name in ("vocals", "drums", "bass", "other"):
+            relative = Path("fake") / input_path.stem / f"{name}.wav"
+            expected = sf.read(str(temp_dir / "serial" / relative), dtype="int16")[0]
+            actual = sf.read(str(temp_dir / "parallel" / relative), dtype="int16")[0]
+            assert np.array_equal(actual, expected)
+
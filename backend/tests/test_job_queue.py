@@ -0,0 +1,93 @@
+"""
+Testes - Domain Layer: Job Queue
+
+Testa a posição na fila e a espera estimada por plano.
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from domain.models.processing_metric import ProcessingMetric
+from domain.models.project import Project, ProjectStatus
+from domain.services import job_queue
+from domain.services.job_queue import queue_position, plan_wait_estimates
+
+
+@pytest.fixture
+def enqueue(db_session):
+    """Cria projetos pendentes em ordem de envio."""
+    start = datetime.utcnow() - timedelta(hours=1)
+    created = []
+
+    def add(plan, duration=100, status=ProjectStatus.PENDING):
+        project = Project(
+            original_filename="song.wav",
+            original_file_path="/in/song.wav",
+            file_size_mb=1,
+            duration_seconds=duration,
+            status=status,
+            plan=plan,
+            created_at=start + timedelta(seconds=len(created)),
+        )
+        db_session.add(project)
+        db_session.commit()
+        created.append(project)
+        return project
+
+    return add
+
+
+class TestQueuePosition:
+    """Testes para a posição de um projeto na fila."""
+
+    def test_pro_skips_free_burst(self, db_session, enqueue):
+        """PRO enviado depois de uma rajada FREE deve ser o próximo."""
+        for _ in range(10):
+            enqueue("free")
+        pro = enqueue("pro")
+
+        position = queue_position(db_session, pro)
+
+        assert position["position"] == 1
+        assert position["jobs_ahead"] == 0
+
+    def test_free_not_starved(self, db_session, enqueue):
+        """FREE espera no máximo um PRO por job FREE à frente (filas alternadas)."""
+        first_free = enqueue("free")
+        second_free = enqueue("free")
+        for _ in range(10):
+            enqueue("pro")
+
+        assert queue_position(db_session, first_free)["jobs_ahead"] == 1
+        assert queue_position(db_session, second_free)["jobs_ahead"] == 3
+
+    def test_not_pending_has_no_position(self, db_session, enqueue):
+        """Projetos fora da fila não têm posição."""
+        project = enqueue("free", status=ProjectStatus.PROCESSING)
+
+        assert queue_position(db_session, project) is None
+
+    def test_wait_uses_measured_rate(self, db_session, enqueue, monkeypatch):
+        """A espera deve usar o tempo medido da separação por segundo de áudio."""
+        monkeypatch.setattr(job_queue, "SEPARATION_SLOTS", 1)
+        db_session.add(ProcessingMetric(project_id="p0", stage="separate", wall_seconds=60.0, cpu_seconds=60.0, audio_seconds=120.0))
+        db_session.commit()
+        enqueue("free", duration=200)
+        second = enqueue("free", duration=200)
+
+        assert queue_position(db_session, second)["estimated_wait_seconds"] == 100.0
+
+
+class TestPlanWaitEstimates:
+    """Testes para a espera estimada de novos uploads."""
+
+    def test_estimates_per_plan(self, db_session, enqueue):
+        """Novo upload PRO deve esperar menos que um FREE com fila FREE cheia."""
+        for _ in range(4):
+            enqueue("free")
+
+        estimates = plan_wait_estimates(db_session)
+
+        assert estimates["free"]["pending"] == 4
+        assert estimates["pro"]["jobs_ahead"] == 0
+        assert estimates["free"]["jobs_ahead"] == 4
+        assert estimates["pro"]["estimated_wait_seconds"] < estimates["free"]["estimated_wait_seconds"]
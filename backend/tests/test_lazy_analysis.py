@@ -0,0 +1,113 @@
+"""
+Testes - Domain Layer: Lazy Analysis
+
+Testa o enfileiramento deduplicado das análises sob demanda.
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from domain.models.analysis_job import AnalysisJob, AnalysisJobStatus
+from domain.models.project import Project
+from domain.services import lazy_analysis
+from domain.services.lazy_analysis import request_analysis, update_job
+
+
+@pytest.fixture
+def project(db_session):
+    project = Project(
+        id="project-1",
+        original_filename="song.wav",
+        original_file_path="/in/song.wav",
+        file_size_mb=1,
+    )
+    db_session.add(project)
+    db_session.commit()
+    return project
+
+
+def age_job(db_session, job, delta):
+    """Recua a última atualização do job."""
+    job.updated_at = datetime.utcnow() - delta
+    db_session.commit()
+
+
+class TestRequestAnalysis:
+    """Testes para o pedido de análises sob demanda."""
+
+    def test_first_request_enqueues(self, db_session, project):
+        """O primeiro pedido deve criar o job e enfileirar a tarefa."""
+        enqueue = MagicMock(return_value="task-1")
+
+        job = request_analysis(db_session, "project-1", "chords", enqueue)
+
+        assert job.status == AnalysisJobStatus.QUEUED
+        assert job.task_id == "task-1"
+        enqueue.assert_called_once()
+
+    def test_repeated_requests_share_job(self, db_session, project):
+        """Pedidos seguintes devem acompanhar o job sem enfileirar de novo."""
+        enqueue = MagicMock(return_value="task-1")
+
+        first = request_analysis(db_session, "project-1", "chords", enqueue)
+        second = request_analysis(db_session, "project-1", "chords", enqueue)
+
+        assert first.id == second.id
+        assert enqueue.call_count == 1
+        assert db_session.query(AnalysisJob).count() == 1
+
+    def test_concurrent_insert_shares_job(self, db_session, project, monkeypatch):
+        """Se outro pedido criou o job ao mesmo tempo, o existente deve ser usado."""
+        db_session.add(AnalysisJob(project_id="project-1", stage="lyrics", task_id="task-1"))
+        db_session.commit()
+        # Simula a corrida: a leitura inicial ainda não vê o job do outro pedido
+        real_get_job = lazy_analysis.get_job
+        calls = []
+
+        def racing_get_job(*args):
+            calls.append(args)
+            return None if len(calls) == 1 else real_get_job(*args)
+
+        monkeypatch.setattr(lazy_analysis, "get_job", racing_get_job)
+        enqueue = MagicMock(return_value="task-2")
+
+        job = request_analysis(db_session, "project-1", "lyrics", enqueue)
+
+        assert job.task_id == "task-1"
+        enqueue.assert_not_called()
+
+    def test_failed_job_retried_after_interval(self, db_session, project):
+        """Job que falhou só deve ser enfileirado de novo após o intervalo."""
+        enqueue = MagicMock(side_effect=["task-1", "task-2"])
+        job = request_analysis(db_session, "project-1", "chords", enqueue)
+        update_job(db_session, "project-1", "chords", AnalysisJobStatus.FAILED, "erro")
+
+        db_session.refresh(job)
+        assert request_analysis(db_session, "project-1", "chords", enqueue).status == AnalysisJobStatus.FAILED
+        assert enqueue.call_count == 1
+
+        age_job(db_session, job, lazy_analysis.RETRY_AFTER)
+        retried = request_analysis(db_session, "project-1", "chords", enqueue)
+
+        assert retried.status == AnalysisJobStatus.QUEUED
+        assert retried.task_id == "task-2"
+        assert retried.error_message is None
+
+    def test_stale_job_requeued(self, db_session, project):
+        """Job parado além do prazo (worker perdido) deve ser enfileirado de novo."""
+        enqueue = MagicMock(side_effect=["task-1", "task-2"])
+        job = request_analysis(db_session, "project-1", "transcription", enqueue)
+
+        age_job(db_session, job, lazy_analysis.STALE_AFTER)
+
+        assert request_analysis(db_session, "project-1", "transcription", enqueue).task_id == "task-2"
+
+    def test_enqueue_failure_marks_failed(self, db_session, project):
+        """Falha ao publicar a tarefa não deve deixar o job preso na fila."""
+        enqueue = MagicMock(side_effect=ConnectionError("broker"))
+
+        with pytest.raises(ConnectionError):
+            request_analysis(db_session, "project-1", "chords", enqueue)
+
+        job = db_session.query(AnalysisJob).one()
+        assert job.status == AnalysisJobStatus.FAILED
@@ -0,0 +1,131 @@
+"""
+Testes - Model Layer: OnnxEngine
+
+Testa o motor ONNX Runtime com um grafo mínimo construído no teste:
+cada fonte é uma fração fixa da mistura.
+"""
+import pytest
+import numpy as np
+
+ort = pytest.importorskip("onnxruntime")
+onnx = pytest.importorskip("onnx")
+sf = pytest.importorskip("soundfile")
+
+from onnx import helper, TensorProto
+
+from model import onnx_engine
+from model.onnx_engine import OnnxEngine
+from model.demucs_engine import create_separator
+from model.separator import StemType, AudioProcessingError
+
+GAINS = [0.1, 0.2, 0.3, 0.4]
+
+
+def build_graph(path, window_frames=None, samplerate=8000):
+    """Grafo (1, 2, T) -> (1, 4, 2, T) com ganhos fixos por fonte."""
+    time_axis = window_frames if window_frames else "time"
+    mix = helper.make_tensor_value_info("mix", TensorProto.FLOAT, [1, 2, time_axis])
+    sources = helper.make_tensor_value_info("sources", TensorProto.FLOAT, [1, 4, 2, time_axis])
+    
+    axes = helper.make_tensor("axes", TensorProto.INT64, [1], [1])
+    gains = helper.make_tensor("gains", TensorProto.FLOAT, [1, 4, 1, 1], GAINS)
+    nodes = [
+        helper.make_node("Unsqueeze", ["mix", "axes"], ["expanded"]),
+        helper.make_node("Mul", ["expanded", "gains"], ["sources"]),
+    ]
+    graph = helper.make_graph(nodes, "fake_separator", [mix], [sources], initializer=[axes, gains])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    helper.set_model_props(model, {
+        "sources": "drums,bass,other,vocals",
+        "samplerate": str(samplerate),
+    })
+    onnx.save(model, str(path))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clear_sessions(monkeypatch):
+    """Cada teste cria suas próprias sessões."""
+    monkeypatch.setattr(onnx_engine, "_sessions", {})
+
+
+@pytest.fixture
+def stereo_wav(temp_dir):
+    """Cria um WAV estéreo de 3 segundos a 8 kHz."""
+    rng = np.random.default_rng(0)
+    data = (rng.standard_normal((3 * 8000, 2)) * 0.1).astype(np.float32)
+    path = temp_dir / "song.wav"
+    sf.write(str(path), data, 8000, subtype="FLOAT")
+    return path, data
+
+
+class TestOnnxEngine:
+    """Testes para o OnnxEngine."""
+    
+    def test_factory(self, monkeypatch):
+        """Factory deve criar o motor ONNX a partir das variáveis de ambiente."""
+        monkeypatch.setenv("ONNX_MODEL_PATH", "/models/separator.onnx")
+        separator = create_separator("onnx")
+        
+        assert isinstance(separator, OnnxEngine)
+        assert separator.get_model_name() == "onnx-separator"
+        assert separator.resumable
+    
+    def test_stems_sum_to_mix(self, temp_dir, stereo_wav):
+        """Separação deve gerar os 4 stems que somam a mistura original."""
+        input_path, data = stereo_wav
+        engine = OnnxEngine(str(build_graph(temp_dir / "fake.onnx")), segment_seconds=1.0, segment_overlap=0.25)
+        
+        stems = engine.separate(input_path, temp_dir / "out")
+        
+        assert set(stems) == {StemType.VOCALS, StemType.DRUMS, StemType.BASS, StemType.OTHER}
+        assert stems[StemType.VOCALS].parent == temp_dir / "out" / "fake" / "song"
+        total = sum(sf.read(str(path), dtype="float32")[0] for path in stems.values())
+        assert total.shape == data.shape
+        assert np.abs(total - data).max() < 1e-3
+    
+    def test_fixed_window_graph(self, temp_dir, stereo_wav):
+        """Grafo com janela fixa deve processar a última janela com padding."""
+        input_path, data = stereo_wav
+        graph = build_graph(temp_dir / "fixed.onnx", window_frames=7000)
+        engine = OnnxEngine(str(graph), segment_overlap=0.25)
+        
+        stems = engine.separate(input_path, temp_dir / "out")
+        vocals, _ = sf.read(str(stems[StemType.VOCALS]), dtype="float32")
+        
+        assert vocals.shape == data.shape
+        assert np.abs(vocals - 0.4 * data).max() < 1e-3
+    
+    def test_two_stems(self, temp_dir, stereo_wav):
+        """Modo de dois stems deve gravar vocals e o acompanhamento."""
+        input_path, data = stereo_wav
+        engine = OnnxEngine(str(build_graph(temp_dir / "fake.onnx")), segment_seconds=1.0, segment_overlap=0.25, two_stems="vocals")
+        
+        stems = engine.separate(input_path, temp_dir / "out")
+        accompaniment, _ = sf.read(str(stems[StemType.NO_VOCALS]), dtype="float32")
+        
+        assert set(stems) == {StemType.VOCALS, StemType.NO_VOCALS}
+        assert np.abs(accompaniment - 0.6 * data).max() < 1e-3
+    
+    def test_dynamic_graph_requires_segment(self, temp_dir, stereo_wav):
+        """Grafo com eixo de tempo dinâmico sem segment_seconds deve falhar."""
+        input_path, _ = stereo_wav
+        engine = OnnxEngine(str(build_graph(temp_dir / "fake.onnx")))
+        
+        with pytest.raises(AudioProcessingError):
+            engine.separate(input_path, temp_dir / "out")
+    
+    def test_missing_graph(self, temp_dir, stereo_wav):
+        """Grafo inexistente deve gerar AudioProcessingError."""
+        input_path, _ = stereo_wav
+        engine = OnnxEngine(str(temp_dir / "missing.onnx"), segment_seconds=1.0)
+        
+        with pytest.raises(AudioProcessingError):
+            engine.separate(input_path, temp_dir / "out")
+    
+    def test_session_reused(self, temp_dir):
+        """A sessão deve ser criada uma vez por grafo e processo."""
+        graph = str(build_graph(temp_dir / "fake.onnx"))
+        
+        first = onnx_engine.get_onnx_session(graph, 1)
+        assert onnx_engine.get_onnx_session(graph, 1) is first
@@ -0,0 +1,126 @@
+"""
+Testes - Domain Layer: Processing Metrics
+
+Testa a medição por etapa e a agregação em percentis.
+"""
+import time
+
+import pytest
+
+from domain.models.processing_metric import ProcessingMetric
+from domain.services.processing_metrics import (
+    MetricsRecorder, STATUS_FAILED, STATUS_RESUMED, seconds_per_audio_second, stage_percentiles,
+)
+
+
+def _metric(stage, wall, audio_seconds=100.0, project_id="p1", status="ok"):
+    return ProcessingMetric(
+        project_id=project_id,
+        stage=stage,
+        wall_seconds=wall,
+        cpu_seconds=wall / 2,
+        peak_rss_mb=500.0,
+        audio_seconds=audio_seconds,
+        status=status,
+    )
+
+
+class TestMetricsRecorder:
+    """Testes para a medição das etapas de uma tarefa."""
+
+    def test_measures_stage(self):
+        """Etapa deve registrar tempo de parede, CPU e pico de memória."""
+        metrics = MetricsRecorder("p1", "task-1", audio_seconds=30.0)
+
+        with metrics.stage("chords"):
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        record = metrics.records[0]
+        assert record["stage"] == "chords"
+        assert record["wall_seconds"] >= 0.05
+        assert record["cpu_seconds"] > 0
+        assert record["peak_rss_mb"] > 0
+
+    def test_failed_stage_recorded(self):
+        """Etapa que falha também deve ser medida."""
+        metrics = MetricsRecorder("p1")
+
+        with pytest.raises(RuntimeError):
+            with metrics.stage("lyrics"):
+                raise RuntimeError("falhou")
+
+        assert [r["stage"] for r in metrics.records] == ["lyrics"]
+        assert metrics.records[0]["status"] == STATUS_FAILED
+
+    def test_stage_marked_resumed(self):
+        """O bloco pode marcar a etapa como retomada de checkpoint."""
+        metrics = MetricsRecorder("p1")
+
+        with metrics.stage("separate") as record:
+            record["status"] = STATUS_RESUMED
+
+        assert metrics.records[0]["status"] == STATUS_RESUMED
+
+    def test_flush_writes_rows(self, db_session):
+        """flush deve gravar as medições com projeto, tarefa e duração."""
+        metrics = MetricsRecorder("p1", "task-1", audio_seconds=30.0)
+        with metrics.stage("decode"):
+            pass
+        with metrics.stage("separate"):
+            pass
+
+        metrics.flush(db_session)
+
+        rows = db_session.query(ProcessingMetric).all()
+        assert [row.stage for row in rows] == ["decode", "separate"]
+        assert all(row.task_id == "task-1" and row.audio_seconds == 30.0 for row in rows)
+        assert metrics.records == []
+
+
+class TestStagePercentiles:
+    """Testes para a agregação das medições."""
+
+    def test_percentiles_per_stage(self, db_session):
+        """Percentis devem ser calculados por etapa, na ordem do pipeline."""
+        db_session.add_all([_metric("chords", wall) for wall in (1.0, 2.0, 3.0, 4.0, 5.0)])
+        db_session.add_all([_metric("separate", 60.0, project_id="p2")])
+        db_session.commit()
+
+        summary = stage_percentiles(db_session)
+
+        assert list(summary["stages"]) == ["separate", "chords"]
+        assert summary["samples"] == 6
+        assert summary["projects"] == 2
+        chords = summary["stages"]["chords"]
+        assert chords["count"] == 5
+        assert chords["wall_seconds"]["p50"] == 3.0
+        assert chords["wall_seconds"]["p90"] == pytest.approx(4.6)
+        assert chords["wall_per_audio_second"]["p50"] == pytest.approx(0.03)
+
+    def test_incomplete_samples_excluded(self, db_session):
+        """Etapas que falharam ou foram retomadas não entram nos percentis nem na taxa."""
+        db_session.add_all([
+            _metric("separate", 60.0),
+            _metric("separate", 5.0, status=STATUS_FAILED),
+            _metric("separate", 10.0, status=STATUS_RESUMED),
+        ])
+        db_session.commit()
+
+        separate = stage_percentiles(db_session)["stages"]["separate"]
+
+        assert separate["count"] == 1
+        assert separate["incomplete"] == 2
+        assert separate["wall_seconds"]["p50"] == 60.0
+        assert seconds_per_audio_second(db_session, "separate", q=0) == pytest.approx(0.6)
+
+    def test_without_audio_duration(self, db_session):
+        """Medições sem duração do áudio não entram na taxa por segundo."""
+        db_session.add(_metric("db_write", 0.2, audio_seconds=None))
+        db_session.commit()
+
+        stage = stage_percentiles(db_session)["stages"]["db_write"]
+
+        assert stage["wall_seconds"]["p50"] == 0.2
+        assert stage["wall_per_audio_second"] is None
@@ -0,0 +1,150 @@
+"""
+Testes - Application Layer: Progress Bridge
+
+Testa a ponte entre os eventos publicados pelos workers (Redis pub/sub)
+e os WebSockets locais da API.
+"""
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+
+from application.websocket.bridge import ProgressBridge
+from application.websocket.manager import ConnectionManager
+from domain.services.progress_events import PROGRESS_CHANNEL, publish_progress
+
+
+async def wait_for(condition, timeout=1.0):
+    """Aguarda a ponte processar os eventos pendentes."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "timeout aguardando evento"
+        await asyncio.sleep(0.01)
+
+
+@pytest_asyncio.fixture
+async def manager():
+    manager = ConnectionManager()
+    yield manager
+    await manager.shutdown()
+
+
+@pytest.mark.asyncio
+class TestProgressBridge:
+    """Testes para o repasse de eventos de progresso."""
+
+    async def test_worker_event_reaches_socket(self, manager, fake_redis, fake_websocket):
+        """Evento publicado pelo worker deve chegar aos sockets do projeto."""
+        websocket = fake_websocket()
+        await manager.connect(websocket, "p1")
+        bridge = ProgressBridge(manager, redis_factory=lambda: fake_redis, reconnect_delay=0)
+        bridge.start()
+        await wait_for(lambda: fake_redis.subscribers.get(PROGRESS_CHANNEL))
+
+        assert publish_progress("p1", "processing", 45, "Separando áudio...")
+        await wait_for(lambda: len(websocket.sent) == 2)
+        await bridge.stop()
+
+        event = websocket.sent[-1]
+        assert event["type"] == "project_status"
+        assert event["progress"] == 45
+        assert event["status"] == "processing"
+
+    async def test_other_projects_not_delivered(self, manager, fake_redis, fake_websocket):
+        """Eventos de projetos sem sockets neste processo são descartados."""
+        websocket = fake_websocket()
+        await manager.connect(websocket, "p1")
+        bridge = ProgressBridge(manager, redis_factory=lambda: fake_redis, reconnect_delay=0)
+
+        await bridge.dispatch(json.dumps({"project_id": "p2", "status": "ready"}))
+        await asyncio.sleep(0.05)
+
+        assert bridge.events_delivered == 0
+        assert [message["type"] for message in websocket.sent] == ["connected"]
+
+    async def test_invalid_event_ignored(self, manager, fake_redis, fake_websocket):
+        """Payload inválido não deve derrubar a ponte."""
+        websocket = fake_websocket()
+        await manager.connect(websocket, "p1")
+        bridge = ProgressBridge(manager, redis_factory=lambda: fake_redis, reconnect_delay=0)
+        bridge.start()
+        await wait_for(lambda: fake_redis.subscribers.get(PROGRESS_CHANNEL))
+
+        fake_redis.publish(PROGRESS_CHANNEL, b"not json")
+        publish_progress("p1", "ready", 100)
+        await wait_for(lambda: bridge.events_delivered == 1)
+
+        assert bridge.running
+        await bridge.stop()
+
+    async def test_reconnects_after_redis_failure(self, manager, fake_redis):
+        """A ponte deve reconectar quando o Redis fica indisponível."""
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("redis fora do ar")
+            return fake_redis
+
+        bridge = ProgressBridge(manager, redis_factory=factory, reconnect_delay=0)
+        bridge.start()
+        await wait_for(lambda: fake_redis.subscribers.get(PROGRESS_CHANNEL))
+        await bridge.stop()
+
+        assert len(attempts) == 2
+        assert not bridge.running
+
+    async def test_progress_coalesced_terminal_kept(self, manager, fake_redis, fake_websocket):
+        """Rajada de progresso chega agrupada, e o ready chega sempre."""
+        websocket = fake_websocket()
+        await manager.connect(websocket, "p1")
+        bridge = ProgressBridge(manager, redis_factory=lambda: fake_redis, reconnect_delay=0, max_per_second=5)
+
+        def event(status, progress):
+            return json.dumps({"type": "project_status", "project_id": "p1", "status": status, "progress": progress})
+
+        for progress in range(50):
+            await bridge.dispatch(event("processing", progress))
+        await bridge.dispatch(event("ready", 100))
+        await wait_for(lambda: len(websocket.sent) == 3)
+
+        assert [message["progress"] for message in websocket.sent[1:]] == [0, 100]
+
+
+    async def test_terminal_without_sockets_drops_pending(self, manager, fake_redis, fake_websocket):
+        """ready sem sockets descarta o progresso pendente: quem assina depois não o recebe."""
+        websocket = fake_websocket()
+        await manager.connect(websocket, "p1")
+        bridge = ProgressBridge(manager, redis_factory=lambda: fake_redis, reconnect_delay=0, max_per_second=10)
+
+        def event(status, progress):
+            return json.dumps({"type": "project_status", "project_id": "p1", "status": status, "progress": progress})
+
+        await bridge.dispatch(event("processing", 10))
+        await bridge.dispatch(event("processing", 50))
+        manager.disconnect(websocket, "p1")
+        await bridge.dispatch(event("ready", 100))
+
+        late = fake_websocket()
+        await manager.connect(late, "p1")
+        await asyncio.sleep(0.15)
+
+        assert bridge.coalescer.pending_count() == 0
+        assert [message["type"] for message in late.sent] == ["connected"]
+
+class TestPublishProgress:
+    """Testes para a publicação de eventos pelos workers."""
+
+    def test_publish_failure_swallowed(self, monkeypatch):
+        """Sem Redis, a publicação falha sem interromper o processamento."""
+        from domain.services import progress_events
+
+        def unavailable():
+            raise ConnectionError("redis fora do ar")
+
+        monkeypatch.setattr(progress_events, "get_redis", unavailable)
+
+        assert publish_progress("p1", "processing", 10) is False
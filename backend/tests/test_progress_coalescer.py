@@ -0,0 +1,76 @@
+"""
+Testes - Application Layer: Progress Coalescer
+
+Testa o agrupamento e o limite de eventos de progresso por projeto.
+"""
+import asyncio
+import json
+
+import pytest
+
+from application.websocket.coalescer import ProgressCoalescer
+
+
+def event(status="processing", progress=0):
+    return json.dumps({"type": "project_status", "project_id": "p1", "status": status, "progress": progress})
+
+
+@pytest.fixture
+def sent():
+    """Eventos enviados (project_id, progresso, status)."""
+    return []
+
+
+@pytest.fixture
+def coalescer(sent):
+    def send(project_id, text):
+        data = json.loads(text)
+        sent.append((project_id, data["progress"], data["status"]))
+        return 1
+
+    return ProgressCoalescer(send, max_per_second=10)
+
+
+@pytest.mark.asyncio
+class TestProgressCoalescer:
+    """Testes para o limite de eventos por projeto."""
+
+    async def test_burst_coalesced_to_latest(self, coalescer, sent):
+        """Rajada de progresso: o primeiro sai na hora e só o último depois."""
+        for progress in range(100):
+            coalescer.submit("p1", event(progress=progress))
+
+        assert sent == [("p1", 0, "processing")]
+        await asyncio.sleep(0.15)
+
+        assert sent == [("p1", 0, "processing"), ("p1", 99, "processing")]
+        assert coalescer.coalesced == 98
+
+    async def test_rate_bounded(self, coalescer, sent):
+        """Eventos contínuos respeitam o máximo por segundo."""
+        for progress in range(60):
+            coalescer.submit("p1", event(progress=progress))
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.15)
+
+        # ~0,3 s de eventos a 10/s
+        assert 3 <= len(sent) <= 6
+        assert sent[-1][1] == 59
+
+    async def test_terminal_sent_immediately(self, coalescer, sent):
+        """ready é enviado na hora e descarta o progresso pendente."""
+        coalescer.submit("p1", event(progress=10))
+        coalescer.submit("p1", event(progress=50))
+        coalescer.submit("p1", event("ready", 100), terminal=True)
+
+        assert sent == [("p1", 10, "processing"), ("p1", 100, "ready")]
+        await asyncio.sleep(0.15)
+        assert sent[-1] == ("p1", 100, "ready")
+        assert coalescer.pending_count() == 0
+
+    async def test_projects_independent(self, coalescer, sent):
+        """O limite é por projeto."""
+        coalescer.submit("p1", event(progress=1))
+        coalescer.submit("p2", event(progress=2))
+
+        assert [project_id for project_id, _, _ in sent] == ["p1", "p2"]
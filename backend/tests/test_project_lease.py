@@ -0,0 +1,67 @@
+"""
+Testes - Domain Layer: Project Lease
+
+Testa o lease que garante uma única execução de processamento por projeto.
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from domain.models.project import Project, ProjectStatus
+from domain.services.project_lease import acquire_lease, release_lease
+
+
+@pytest.fixture
+def project(db_session):
+    """Projeto aguardando processamento."""
+    project = Project(
+        id="project-1",
+        original_filename="song.wav",
+        original_file_path="/in/song.wav",
+        file_size_mb=1,
+        status=ProjectStatus.PENDING,
+    )
+    db_session.add(project)
+    db_session.commit()
+    return project
+
+
+class TestProjectLease:
+    """Testes para aquisição e liberação do lease."""
+
+    def test_acquire_free(self, db_session, project):
+        """Lease livre deve ser adquirido."""
+        assert acquire_lease(db_session, "project-1", "a", 60)
+
+        db_session.refresh(project)
+        assert project.lease_owner == "a"
+        assert project.lease_expires_at > datetime.utcnow()
+
+    def test_conflict(self, db_session, project):
+        """Segunda execução não deve adquirir um lease ativo."""
+        assert acquire_lease(db_session, "project-1", "a", 60)
+        assert not acquire_lease(db_session, "project-1", "b", 60)
+
+    def test_expired_lease_taken_over(self, db_session, project):
+        """Lease expirado (worker morto) pode ser assumido."""
+        project.lease_owner = "morto"
+        project.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db_session.commit()
+
+        assert acquire_lease(db_session, "project-1", "b", 60)
+
+    def test_release_only_by_owner(self, db_session, project):
+        """Só o dono libera o lease."""
+        acquire_lease(db_session, "project-1", "a", 60)
+
+        release_lease(db_session, "project-1", "b")
+        assert not acquire_lease(db_session, "project-1", "c", 60)
+
+        release_lease(db_session, "project-1", "a")
+        assert acquire_lease(db_session, "project-1", "c", 60)
+
+    def test_sets_status(self, db_session, project):
+        """O status do projeto pode ser gravado junto com o lease."""
+        assert acquire_lease(db_session, "project-1", "a", 60, status=ProjectStatus.PROCESSING)
+
+        db_session.refresh(project)
+        assert project.status == ProjectStatus.PROCESSING
@@ -0,0 +1,65 @@
+"""
+Testes - Domain Layer: Stage Checkpoints
+
+Testa os checkpoints por etapa do pipeline de processamento.
+"""
+import pytest
+
+from domain.models.project import Project
+from domain.services.stage_checkpoint import load_stage, save_stage, clear_stages
+
+
+@pytest.fixture
+def project(db_session):
+    project = Project(
+        id="project-1",
+        original_filename="song.wav",
+        original_file_path="/in/song.wav",
+        file_size_mb=1,
+    )
+    db_session.add(project)
+    db_session.commit()
+    return project
+
+
+class TestStageCheckpoints:
+    """Testes para gravar e reaproveitar etapas concluídas."""
+
+    def test_roundtrip(self, db_session, project, temp_dir):
+        """Etapa gravada deve ser reaproveitada com o mesmo resultado."""
+        click = temp_dir / "click.wav"
+        click.write_bytes(b"click")
+
+        save_stage(db_session, "project-1", "bpm", "bpm-1", {"bpm": 120.0}, [str(click)])
+
+        assert load_stage(db_session, "project-1", "bpm", "bpm-1") == {"bpm": 120.0}
+
+    def test_version_mismatch(self, db_session, project):
+        """Checkpoint de outra versão não deve ser reaproveitado."""
+        save_stage(db_session, "project-1", "bpm", "bpm-1", {"bpm": 120.0}, [])
+
+        assert load_stage(db_session, "project-1", "bpm", "bpm-2") is None
+
+    def test_missing_files(self, db_session, project, temp_dir):
+        """Checkpoint cujos arquivos sumiram não deve ser reaproveitado."""
+        save_stage(db_session, "project-1", "chords", "chords-1", {}, [str(temp_dir / "chords.json")])
+
+        assert load_stage(db_session, "project-1", "chords", "chords-1") is None
+
+    def test_save_replaces(self, db_session, project):
+        """Gravar de novo a mesma etapa deve substituir o checkpoint."""
+        save_stage(db_session, "project-1", "bpm", "bpm-1", {"bpm": 100.0}, [])
+        save_stage(db_session, "project-1", "bpm", "bpm-2", {"bpm": 120.0}, [])
+
+        assert load_stage(db_session, "project-1", "bpm", "bpm-2") == {"bpm": 120.0}
+        assert len(project.stages) == 1
+
+    def test_clear_selected_stages(self, db_session, project):
+        """clear_stages deve remover apenas as etapas indicadas."""
+        for stage in ("separation", "transcription", "lyrics"):
+            save_stage(db_session, "project-1", stage, "v1", {}, [])
+
+        clear_stages(db_session, "project-1", ["transcription", "lyrics"])
+
+        assert load_stage(db_session, "project-1", "separation", "v1") == {}
+        assert load_stage(db_session, "project-1", "lyrics", "v1") is None
@@ -0,0 +1,372 @@
+"""
+Testes - Model Layer: Tasks
+
+Testa os utilitários da tarefa de processamento.
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from model import tasks
+from model.tasks import SeparationProgress
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio controlado pelo teste."""
+    now = [0.0]
+    monkeypatch.setattr(tasks.time, "monotonic", lambda: now[0])
+    return now
+
+
+class TestSeparationProgress:
+    """Testes para o repasse de progresso da separação."""
+    
+    def test_maps_to_task_range(self, clock):
+        """Progresso por trecho deve ser mapeado para a faixa da separação."""
+        task = MagicMock()
+        progress = SeparationProgress(task, start=10, end=80, interval=0)
+        
+        progress(1, 2)
+        
+        meta = task.update_state.call_args.kwargs["meta"]
+        assert meta["progress"] == 45
+        assert "1/2" in meta["status"]
+    
+    def test_throttled(self, clock):
+        """Atualizações dentro do intervalo devem ser descartadas."""
+        task = MagicMock()
+        progress = SeparationProgress(task, interval=2.0)
+        
+        clock[0] = 10.0
+        progress(1, 10)
+        clock[0] = 11.0
+        progress(2, 10)
+        clock[0] = 12.5
+        progress(3, 10)
+        
+        published = [c.kwargs["meta"]["progress"] for c in task.update_state.call_args_list]
+        assert published == [17, 31]
+    
+    def test_completion_always_published(self, clock):
+        """A conclusão da separação deve ser publicada mesmo no intervalo."""
+        task = MagicMock()
+        progress = SeparationProgress(task, interval=60.0)
+        
+        clock[0] = 100.0
+        progress(1, 2)
+        progress(2, 2)
+        
+        assert task.update_state.call_args.kwargs["meta"]["progress"] == 80
+    
+    def test_published_to_websockets(self, clock, fake_redis):
+        """Com o projeto informado, o progresso também vai para o canal Redis."""
+        import json
+        
+        progress = SeparationProgress(MagicMock(), interval=0, project_id="p1")
+        
+        progress(1, 2)
+        
+        channel, data = fake_redis.published[-1]
+        assert json.loads(data)["project_id"] == "p1"
+        assert json.loads(data)["progress"] == 45
+    
+    def test_unchanged_progress_skipped(self, clock):
+        """Percentual repetido não deve gerar nova atualização."""
+        task = MagicMock()
+        progress = SeparationProgress(task, interval=0)
+        
+        progress(1, 1000)
+        progress(2, 1000)
+        
+        assert task.update_state.call_count == 1
+
+
+@pytest.fixture
+def project(db_session, monkeypatch, temp_dir):
+    """Projeto em processamento com o banco de teste nas tarefas."""
+    from domain.models.project import Project, ProjectStatus
+    
+    monkeypatch.setenv("STORAGE_PATH", str(temp_dir))
+    monkeypatch.setattr(tasks, "open_task_session", lambda: db_session)
+    monkeypatch.setattr(tasks.finalize_project, "update_state", MagicMock())
+    monkeypatch.setattr("domain.services.progress_events.publish_progress", MagicMock())
+    
+    project = Project(
+        id="project-1",
+        original_filename="song.wav",
+        original_file_path="/in/song.wav",
+        file_size_mb=1,
+        duration_seconds=2,
+        status=ProjectStatus.PROCESSING,
+    )
+    db_session.add(project)
+    db_session.commit()
+    return project
+
+
+class TestAnalysisWorkflow:
+    """Testes para o chord das análises pós-separação."""
+    
+    STEMS = {"vocals": "/stems/vocals.wav", "other": "/stems/other.wav"}
+    
+    def test_only_bpm_runs_before_ready(self):
+        """Só o BPM/click deve rodar antes do projeto ficar pronto."""
+        workflow = tasks.analysis_workflow("p1", "/in/song.wav", self.STEMS, "full", "htdemucs")
+        
+        assert [stage.task for stage in workflow.tasks] == ["model.tasks.analyze_bpm"]
+        assert workflow.tasks[0].args == ("p1", "/in/song.wav")
+        assert workflow.body.task == "model.tasks.finalize_project"
+    
+    def test_errback_marks_failed(self):
+        """Falhas do chord devem marcar o projeto como FAILED."""
+        workflow = tasks.analysis_workflow("p1", "/in/song.wav", self.STEMS, "full", "htdemucs")
+        
+        errbacks = workflow.body.options["link_error"]
+        assert [errback["task"] for errback in errbacks] == ["model.tasks.analysis_failed"]
+
+
+class TestFinalizeProject:
+    """Testes para a tarefa que conclui o projeto."""
+    
+    def test_merges_results_and_marks_ready(self, project, db_session):
+        """Artefatos de todas as etapas devem ser registrados e o projeto READY."""
+        from domain.models.project import ProjectStatus
+        from domain.models.stem import Stem
+        
+        results = [
+            {"artifacts": {"click": "/stems/click.wav"}, "bpm": 120.0},
+            {"artifacts": {}},
+            {"artifacts": {"midi": "/stems/other.mid"}},
+        ]
+        
+        result = tasks.finalize_project(
+            results, "project-1", "/in/song.wav", {"vocals": "/stems/vocals.wav"}, "full", "htdemucs"
+        )
+        
+        assert result["bpm"] == 120.0
+        assert list(result["stems"]) == ["vocals", "click", "midi"]
+        assert db_session.get(type(project), "project-1").status == ProjectStatus.READY
+        assert db_session.query(Stem).count() == 3
+    
+    def test_writes_manifest(self, project, temp_dir):
+        """O manifest deve listar stems, BPM e análises sob demanda."""
+        import json
+        
+        stems_dir = temp_dir / "stems" / "project-1"
+        tasks.finalize_project(
+            [{"artifacts": {"click": str(stems_dir / "click.wav")}, "bpm": 98.0}],
+            "project-1", "/in/song.wav", {"vocals": str(stems_dir / "vocals.wav")}, "two_stems", "htdemucs",
+        )
+        
+        manifest = json.loads((stems_dir / tasks.ANALYSIS_MANIFEST).read_text())
+        assert manifest["stems"] == {"vocals": "vocals.wav", "click": "click.wav"}
+        assert manifest["bpm"] == 98.0
+        assert manifest["on_demand"] == ["chords", "lyrics"]
+    
+    def test_cache_entry_uses_separation_model(self, project, db_session, temp_dir, temp_audio_file, monkeypatch):
+        """A entrada do cache deve usar o modelo calculado no worker de separação."""
+        from domain.models.analysis_cache import AnalysisCacheEntry
+        
+        # Worker de análise sem AI_MODEL: recalcular daria "htdemucs"
+        monkeypatch.delenv("AI_MODEL", raising=False)
+        vocals = temp_dir / "stems" / "project-1" / "vocals.wav"
+        vocals.parent.mkdir(parents=True)
+        vocals.write_bytes(b"v")
+        
+        tasks.finalize_project(
+            [], "project-1", str(temp_audio_file), {"vocals": str(vocals)}, "full", "demucs-htdemucs-int8-resident",
+            "k1", None, "htdemucs-int8",
+        )
+        
+        entry = db_session.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.key == "k1").one()
+        assert entry.model_name == "htdemucs-int8"
+    
+    def test_analysis_failed_marks_project(self, project, db_session):
+        """Errback deve marcar o projeto como FAILED com a mensagem do erro."""
+        from domain.models.project import ProjectStatus
+        
+        tasks.analysis_failed(None, RuntimeError("worker perdido"), None, "project-1")
+        
+        failed = db_session.get(type(project), "project-1")
+        assert failed.status == ProjectStatus.FAILED
+        assert failed.error_message == "worker perdido"
+    
+    def test_ready_published(self, project):
+        """A conclusão deve ser publicada para os WebSockets."""
+        from domain.services import progress_events
+        
+        tasks.finalize_project([], "project-1", "/in/song.wav", {}, "full", "htdemucs")
+        
+        progress_events.publish_progress.assert_called_with("project-1", "ready", 100, "Concluído!")
+
+
+class TestCompleteProject:
+    """Testes para a gravação final (stems + READY) em uma transação."""
+    
+    def test_stems_and_status_together(self, project, db_session, temp_dir):
+        """Stems e status READY devem ser gravados juntos, com o tamanho dos arquivos."""
+        from domain.models.project import ProjectStatus
+        from domain.models.stem import Stem
+        
+        vocals = temp_dir / "vocals.wav"
+        vocals.write_bytes(b"v" * 1024 * 1024)
+        
+        assert tasks.complete_project(db_session, "project-1", {"vocals": str(vocals), "midi": "/missing.mid"})
+        
+        stems = {stem.stem_type: stem.file_size_mb for stem in db_session.query(Stem).all()}
+        assert stems == {"vocals": 1.0, "midi": 0}
+        assert db_session.get(type(project), "project-1").status == ProjectStatus.READY
+    
+    def test_failure_rolls_back_stems(self, project, db_session, monkeypatch):
+        """Falha no UPDATE do projeto não deve deixar stems parciais visíveis."""
+        from domain.models.project import ProjectStatus
+        from domain.models.stem import Stem
+        
+        def broken_update(*args, **kwargs):
+            raise RuntimeError("conexão perdida")
+        
+        monkeypatch.setattr(db_session.query(type(project)).__class__, "update", broken_update)
+        
+        with pytest.raises(RuntimeError):
+            tasks.complete_project(db_session, "project-1", {"vocals": "/stems/vocals.wav"})
+        monkeypatch.undo()
+        
+        assert db_session.query(Stem).count() == 0
+        assert db_session.get(type(project), "project-1").status == ProjectStatus.PROCESSING
+    
+    def test_releases_only_own_lease(self, project, db_session):
+        """O lease de outra execução deve ser mantido."""
+        from domain.services.project_lease import acquire_lease
+        
+        assert acquire_lease(db_session, "project-1", "outra-execucao", 600)
+        
+        tasks.complete_project(db_session, "project-1", {}, lease_owner="execucao-1")
+        
+        assert db_session.get(type(project), "project-1").lease_owner == "outra-execucao"
+
+
+class TestStageCheckpoints:
+    """Testes para o reaproveitamento de etapas concluídas."""
+    
+    def test_completed_stage_skipped(self, project):
+        """Etapa concluída na versão atual não deve rodar de novo."""
+        run = MagicMock(return_value=({"artifacts": {}, "bpm": 120.0}, []))
+        
+        first = tasks.run_stage("project-1", "bpm", run)
+        second = tasks.run_stage("project-1", "bpm", run)
+        
+        assert first == second == {"artifacts": {}, "bpm": 120.0}
+        assert run.call_count == 1
+    
+    def test_failed_stage_not_recorded(self, project):
+        """Etapa que falhou deve rodar de novo no retry."""
+        run = MagicMock(return_value=({"artifacts": {}}, None))
+        
+        tasks.run_stage("project-1", "lyrics", run)
+        tasks.run_stage("project-1", "lyrics", run)
+        
+        assert run.call_count == 2
+    
+    def test_lazy_stage_updates_job(self, project, db_session):
+        """Etapa sob demanda deve marcar o job como concluído ou falho."""
+        from domain.models.analysis_job import AnalysisJob, AnalysisJobStatus
+        
+        db_session.add_all([
+            AnalysisJob(project_id="project-1", stage="chords", task_id="t1"),
+            AnalysisJob(project_id="project-1", stage="lyrics", task_id="t2"),
+        ])
+        db_session.commit()
+        
+        tasks.run_stage("project-1", "chords", MagicMock(return_value=({"artifacts": {}}, [])))
+        tasks.run_stage("project-1", "lyrics", MagicMock(return_value=({"artifacts": {}}, None)))
+        
+        jobs = {job.stage: job for job in db_session.query(AnalysisJob).all()}
+        for job in jobs.values():
+            db_session.refresh(job)
+        assert jobs["chords"].status == AnalysisJobStatus.DONE
+        assert jobs["lyrics"].status == AnalysisJobStatus.FAILED
+    
+    def test_retry_skips_separation(self, project, db_session, temp_dir, temp_audio_file, monkeypatch):
+        """Retry deve reaproveitar a separação gravada sem criar o separador."""
+        from domain.services.stage_checkpoint import save_stage
+        
+        vocals = temp_dir / "vocals.wav"
+        vocals.write_bytes(b"v")
+        version = f"{tasks.STAGE_VERSIONS['separation']}:{tasks.separation_model_name('full')}"
+        save_stage(db_session, "project-1", "separation", version,
+                   {"stems": {"vocals": str(vocals)}, "model_used": "htdemucs"}, [str(vocals)])
+        
+        monkeypatch.setattr("domain.services.analysis_cache.CACHE_ENABLED", False)
+        create_separator = MagicMock()
+        monkeypatch.setattr(tasks, "create_separator", create_separator)
+        workflow = MagicMock()
+        monkeypatch.setattr(tasks, "analysis_workflow", workflow)
+        monkeypatch.setattr(tasks.process_audio, "update_state", MagicMock())
+        monkeypatch.setattr(tasks.process_audio, "replace", MagicMock(return_value={"replaced": True}))
+        
+        tasks.process_audio("project-1", str(temp_audio_file))
+        
+        create_separator.assert_not_called()
+        args = workflow.call_args.args
+        assert args[2] == {"vocals": str(vocals)}
+        assert args[4] == "htdemucs"
+        assert args[7] == tasks.separation_model_name("full")
+
+
+class TestProcessingDedup:
+    """Testes para a deduplicação do processamento de um projeto."""
+    
+    def test_register_stems_upserts(self, project, db_session):
+        """Registrar os stems duas vezes não deve duplicar linhas."""
+        from domain.models.stem import Stem
+        
+        tasks.register_stems(db_session, "project-1", {"vocals": "/old/vocals.wav"})
+        tasks.register_stems(db_session, "project-1", {"vocals": "/new/vocals.wav", "drums": "/new/drums.wav"})
+        
+        stems = {stem.stem_type: stem.file_path for stem in db_session.query(Stem).all()}
+        assert stems == {"vocals": "/new/vocals.wav", "drums": "/new/drums.wav"}
+    
+    def test_task_id_deterministic(self):
+        """Mesmo projeto e tentativa geram o mesmo task ID."""
+        assert tasks.processing_task_id("p1") == tasks.processing_task_id("p1", 0)
+        assert tasks.processing_task_id("p1", 1) != tasks.processing_task_id("p1", 0)
+        assert tasks.processing_task_id("p2") != tasks.processing_task_id("p1")
+    
+    def test_skipped_while_leased(self, project, db_session, temp_audio_file, monkeypatch):
+        """Entrega duplicada não deve separar enquanto outra execução tem o lease."""
+        from domain.services.project_lease import acquire_lease
+        
+        assert acquire_lease(db_session, "project-1", "outra-execucao", 600)
+        create_separator = MagicMock()
+        monkeypatch.setattr(tasks, "create_separator", create_separator)
+        
+        result = tasks.process_audio("project-1", str(temp_audio_file))
+        
+        assert result["skipped"] is True
+        create_separator.assert_not_called()
+        assert db_session.get(type(project), "project-1").lease_owner == "outra-execucao"
+    
+    def test_skipped_when_ready(self, project, db_session, temp_audio_file, monkeypatch):
+        """Projeto já pronto não deve ser processado de novo."""
+        from domain.models.project import ProjectStatus
+        
+        project.status = ProjectStatus.READY
+        db_session.commit()
+        create_separator = MagicMock()
+        monkeypatch.setattr(tasks, "create_separator", create_separator)
+        
+        assert tasks.process_audio("project-1", str(temp_audio_file))["skipped"] is True
+        create_separator.assert_not_called()
+    
+    def test_finalize_releases_lease(self, project, db_session):
+        """O lease deve ser liberado quando o projeto fica pronto."""
+        from domain.services.project_lease import acquire_lease
+        
+        assert acquire_lease(db_session, "project-1", "execucao-1", 600)
+        
+        tasks.finalize_project(
+            [], "project-1", "/in/song.wav", {"vocals": "/stems/vocals.wav"}, "full", "htdemucs",
+            None, "execucao-1",
+        )
+        
+        assert db_session.get(type(project), "project-1").lease_owner is None
@@ -0,0 +1,89 @@
+"""
+Testes - Domain Layer: Time Budget
+
+Testa o orçamento de tempo por job e o controle de admissão.
+"""
+import pytest
+
+from domain.models.processing_metric import ProcessingMetric
+from domain.models.project import Project, ProjectStatus
+from domain.services import time_budget
+from domain.services.time_budget import separation_time_limits, check_admission
+
+
+@pytest.fixture
+def measured_rate(db_session):
+    """Separação medida a 1 segundo por segundo de áudio."""
+    db_session.add(ProcessingMetric(project_id="p0", stage="separate", wall_seconds=100.0, cpu_seconds=100.0, audio_seconds=100.0))
+    db_session.commit()
+
+
+class TestSeparationTimeLimits:
+    """Testes para o tempo limite proporcional à duração."""
+
+    def test_scales_with_duration(self, db_session, measured_rate):
+        """Limite deve ser overhead + duração x taxa medida x margem."""
+        limits = separation_time_limits(db_session, 600)
+
+        expected = time_budget.OVERHEAD_SECONDS + 600 * 1.0 * time_budget.SAFETY_FACTOR
+        assert limits["time_limit"] == int(expected)
+        assert limits["soft_time_limit"] == limits["time_limit"] - 60
+
+    def test_short_clip_gets_minimum(self, db_session, measured_rate):
+        """Trechos curtos não devem poder travar por 10 minutos."""
+        limits = separation_time_limits(db_session, 10)
+
+        assert limits["time_limit"] == time_budget.MIN_TIME_LIMIT
+
+    def test_clamped_to_maximum(self, db_session, measured_rate):
+        """Limite nunca deve passar do máximo configurado."""
+        assert separation_time_limits(db_session, 10 ** 6)["time_limit"] == time_budget.MAX_TIME_LIMIT
+
+    def test_timeouts_do_not_shrink_budget(self, db_session, measured_rate):
+        """Separações interrompidas ou retomadas não devem reduzir o limite."""
+        expected = separation_time_limits(db_session, 600)
+        db_session.add_all([
+            ProcessingMetric(project_id=f"p{i}", stage="separate", wall_seconds=10.0, cpu_seconds=10.0,
+                             audio_seconds=100.0, status=status)
+            for i, status in enumerate(["failed", "resumed"] * 5)
+        ])
+        db_session.commit()
+
+        assert separation_time_limits(db_session, 600) == expected
+        assert check_admission(db_session, 600, "free")["decision"] == "accept"
+
+    def test_long_pro_track_fits(self, db_session):
+        """Faixa PRO de 25 minutos deve caber no orçamento sem medições."""
+        assert separation_time_limits(db_session, 25 * 60)["time_limit"] > 600
+
+
+class TestAdmission:
+    """Testes para o controle de admissão de uploads."""
+
+    def test_accepts_with_empty_queue(self, db_session, measured_rate):
+        """Com a fila vazia o upload deve ser aceito."""
+        assert check_admission(db_session, 180, "free")["decision"] == "accept"
+
+    def test_rejects_when_budget_impossible(self, db_session, measured_rate):
+        """Áudio que não cabe no limite máximo deve ser recusado."""
+        assert check_admission(db_session, 3600, "pro")["decision"] == "reject"
+
+    def test_defers_under_deep_queue(self, db_session, measured_rate, monkeypatch):
+        """Fila funda deve adiar o upload com um tempo para nova tentativa."""
+        monkeypatch.setattr(time_budget, "MAX_TURNAROUND_SECONDS", {"free": 600, "pro": 600})
+        for _ in range(10):
+            db_session.add(Project(
+                original_filename="song.wav",
+                original_file_path="/in/song.wav",
+                file_size_mb=1,
+                duration_seconds=300,
+                status=ProjectStatus.PENDING,
+            ))
+        db_session.commit()
+
+        admission = check_admission(db_session, 180, "free")
+
+        assert admission["decision"] == "defer"
+        assert admission["retry_after"] > 0
+        # PRO não espera atrás da fila FREE
+        assert check_admission(db_session, 180, "pro")["decision"] == "accept"
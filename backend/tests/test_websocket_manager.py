@@ -0,0 +1,217 @@
+"""
+Testes - Application Layer: WebSocket Manager
+
+Testa o fan-out com fila de envio por conexão e a política para
+consumidores lentos.
+"""
+import asyncio
+import importlib
+
+import pytest
+import pytest_asyncio
+
+from application.websocket.manager import ConnectionManager, SLOW_CONSUMER_CLOSE_CODE
+
+# O pacote exporta a instância `manager` com o mesmo nome do módulo
+manager_module = importlib.import_module("application.websocket.manager")
+
+
+async def drain():
+    """Deixa as tarefas de envio rodarem."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest_asyncio.fixture
+async def make_manager():
+    """Fábrica de managers; ao final, encerra as conexões e aguarda as tarefas de envio."""
+    managers = []
+
+    def make(**kwargs):
+        managers.append(ConnectionManager(**kwargs))
+        return managers[-1]
+
+    yield make
+    for manager in managers:
+        await manager.shutdown()
+
+
+@pytest.mark.asyncio
+class TestFanOut:
+    """Testes para o envio concorrente aos conectados."""
+
+    async def test_slow_client_does_not_stall_others(self, make_manager, fake_websocket):
+        """Um cliente lento não deve atrasar a entrega aos demais."""
+        manager = make_manager()
+        slow = fake_websocket(delay=1.0)
+        fast = fake_websocket()
+        await manager.connect(slow, "p1")
+        await manager.connect(fast, "p1")
+
+        await manager.send_to_project("p1", {"type": "project_status", "progress": 10})
+        await asyncio.sleep(0.05)
+
+        assert [message["type"] for message in fast.sent] == ["connected", "project_status"]
+        assert slow.sent == []
+        manager.disconnect(slow)
+        manager.disconnect(fast)
+
+    async def test_serialized_once(self, make_manager, fake_websocket, monkeypatch):
+        """A mensagem deve ser serializada uma vez para todos os destinatários."""
+        manager = make_manager()
+        sockets = [fake_websocket() for _ in range(20)]
+        for websocket in sockets:
+            await manager.connect(websocket)
+
+        calls = []
+        serialize = manager_module.serialize
+        monkeypatch.setattr(manager_module, "serialize", lambda message: calls.append(1) or serialize(message))
+
+        assert await manager.broadcast({"type": "system"}) == 20
+        await drain()
+
+        assert len(calls) == 1
+        assert all(websocket.sent == [{"type": "system"}] for websocket in sockets)
+
+    async def test_dead_connection_removed(self, make_manager, fake_websocket):
+        """Conexões que falham no envio devem sair dos projetos."""
+        manager = make_manager()
+        dead = fake_websocket(fail=True)
+        await manager.connect(dead, "p1")
+        await drain()
+
+        assert manager.get_connection_count("p1") == 0
+        assert manager.get_connection_count() == 0
+
+
+    async def test_shutdown_awaits_writers(self, make_manager, fake_websocket):
+        """shutdown deve remover as conexões e aguardar as tarefas de envio canceladas."""
+        manager = make_manager()
+        sockets = [fake_websocket() for _ in range(5)]
+        for websocket in sockets:
+            await manager.connect(websocket, "p1")
+        manager.disconnect(sockets[0])
+        writers = [sender._writer for sender in manager.senders.values()]
+
+        await manager.shutdown()
+
+        assert manager.senders == {}
+        assert all(writer.done() for writer in writers)
+        assert manager._closing == set()
+
+
+@pytest.mark.asyncio
+class TestSlowConsumerPolicy:
+    """Testes para clientes cuja fila de envio enche."""
+
+    async def test_drop_oldest(self, make_manager, fake_websocket):
+        """drop_oldest mantém as mensagens mais recentes."""
+        manager = make_manager(max_queue=3, policy="drop_oldest")
+        websocket = fake_websocket(delay=0.2)
+        await manager.connect(websocket, "p1")
+        await drain()
+
+        for progress in range(10):
+            await manager.send_to_project("p1", {"progress": progress})
+
+        assert manager.dropped_messages() == 7
+        await asyncio.sleep(1.0)
+        assert [message.get("progress") for message in websocket.sent][-3:] == [7, 8, 9]
+        manager.disconnect(websocket)
+
+    async def test_disconnect(self, make_manager, fake_websocket):
+        """disconnect fecha a conexão do cliente lento."""
+        manager = make_manager(max_queue=2, policy="disconnect")
+        websocket = fake_websocket(delay=1.0)
+        await manager.connect(websocket, "p1")
+        await drain()
+
+        delivered = [await manager.send_to_project("p1", {"progress": progress}) for progress in range(4)]
+        await drain()
+
+        assert delivered == [1, 1, 0, 0]
+        assert manager.get_connection_count("p1") == 0
+        assert manager.slow_disconnects == 1
+        assert websocket.close_code == SLOW_CONSUMER_CLOSE_CODE
+
+
+@pytest.mark.asyncio
+class TestHeartbeat:
+    """Testes para o heartbeat e a remoção de conexões meio abertas."""
+
+    async def test_idle_pinged(self, make_manager, fake_websocket):
+        """Conexões sem atividade recebem ping."""
+        manager = make_manager(heartbeat_interval=0.05, idle_timeout=1.0)
+        websocket = fake_websocket()
+        await manager.connect(websocket)
+        await asyncio.sleep(0.06)
+
+        assert manager.heartbeat() == 0
+        await drain()
+
+        assert websocket.sent == [{"type": "ping"}]
+        assert manager.stats()["idle"] == 1
+        manager.disconnect(websocket)
+
+    async def test_half_open_evicted(self, make_manager, fake_websocket):
+        """Conexões que passam do tempo limite são removidas e fechadas."""
+        manager = make_manager(heartbeat_interval=0.02, idle_timeout=0.05)
+        silent = fake_websocket()
+        alive = fake_websocket()
+        await manager.connect(silent, "p1")
+        await manager.connect(alive, "p2")
+        await asyncio.sleep(0.06)
+        manager.senders[alive].touch()
+
+        assert manager.heartbeat() == 1
+        await drain()
+
+        assert silent.close_code == manager_module.IDLE_CLOSE_CODE
+        assert "p1" not in manager.project_connections
+        assert manager.stats()["open"] == 1
+        assert manager.stats()["evicted"] == 1
+        manager.disconnect(alive)
+
+    async def test_receive_timeout_evicts(self, make_manager, fake_websocket):
+        """Prazo do handler esgotado remove a conexão como o heartbeat, contando uma vez."""
+        manager = make_manager(heartbeat_interval=0.02, idle_timeout=0.05)
+        websocket = fake_websocket()
+
+        async def never():
+            await asyncio.sleep(10)
+
+        websocket.receive_json = never
+        await manager.connect(websocket, "p1")
+
+        with pytest.raises(asyncio.TimeoutError):
+            await manager.receive_json(websocket)
+        assert manager.heartbeat() == 0
+        # O handler também desconecta ao sair do loop
+        manager.disconnect(websocket)
+        await drain()
+
+        assert websocket.close_code == manager_module.IDLE_CLOSE_CODE
+        assert "p1" not in manager.project_connections
+        assert manager.stats()["open"] == 0
+        assert manager.stats()["evicted"] == 1
+
+    async def test_state_flat_after_churn(self, make_manager, fake_websocket):
+        """Após muitas conexões entrando e saindo, nenhum estado sobra."""
+        manager = make_manager(heartbeat_interval=0.01, idle_timeout=0.02)
+        for batch in range(20):
+            sockets = [fake_websocket() for _ in range(50)]
+            for i, websocket in enumerate(sockets):
+                await manager.connect(websocket, f"p{batch}-{i % 5}")
+            # Metade sai normalmente, a outra metade some sem fechar
+            for websocket in sockets[:25]:
+                manager.disconnect(websocket)
+            await asyncio.sleep(0.03)
+            manager.heartbeat()
+
+        await drain()
+        assert manager.active_connections == set()
+        assert manager.project_connections == {}
+        assert manager.senders == {}
+        assert manager.connection_projects == {}
+        assert manager.evicted == 20 * 25
+
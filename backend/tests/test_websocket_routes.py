@@ -0,0 +1,171 @@
+"""
+Testes - Application Layer: WebSocket Routes
+
+Testa o WebSocket autenticado por usuário (inscrições multiplexadas e
+status em cache).
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from application.routes import websocket as websocket_routes
+from application.websocket.status_cache import ProjectStatusCache
+from domain.models.project import Project, ProjectStatus
+from domain.services.auth_service import AuthService
+
+
+@pytest.fixture
+def ws_db(db_session, monkeypatch):
+    """Rotas WebSocket usando a sessão de teste (e um cache de status vazio)."""
+    monkeypatch.setattr(websocket_routes, "open_session", lambda: db_session)
+    monkeypatch.setattr(websocket_routes, "status_cache", ProjectStatusCache())
+    return db_session
+
+
+@pytest.fixture
+def user_token(ws_db):
+    """Usuário registrado e o seu access token."""
+    user, _ = AuthService.register_user(db=ws_db, email="ws@example.com", password="senha123", name="WS")
+    return user, AuthService.create_access_token(user.id, user.email, user.plan)
+
+
+@pytest.fixture
+def add_project(ws_db):
+    def add(project_id, user_id=None, status=ProjectStatus.PROCESSING):
+        ws_db.add(Project(
+            id=project_id,
+            user_id=user_id,
+            original_filename="song.wav",
+            original_file_path="/in/song.wav",
+            file_size_mb=1,
+            status=status,
+        ))
+        ws_db.commit()
+
+    return add
+
+
+class TestUserWebSocket:
+    """Testes para o WebSocket único por usuário."""
+
+    def test_requires_token(self, client, ws_db):
+        """Sem token válido a conexão é recusada."""
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect("/ws/user?token=invalido"):
+                pass
+
+        assert exc.value.code == websocket_routes.UNAUTHORIZED_CLOSE_CODE
+
+    def test_global_requires_token(self, client, ws_db):
+        """/ws/global também exige autenticação."""
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect("/ws/global"):
+                pass
+
+    def test_subscribes_active_projects(self, client, user_token, add_project):
+        """Ao conectar, a conexão acompanha os projetos em andamento do usuário."""
+        user, token = user_token
+        add_project("ativo", user.id)
+        add_project("pronto", user.id, ProjectStatus.READY)
+        add_project("de-outro", None)
+
+        with client.websocket_connect(f"/ws/user?token={token}") as ws:
+            connected = ws.receive_json()
+
+        assert connected["type"] == "connected"
+        assert connected["projects"] == ["ativo"]
+
+    def test_subscribe_and_unsubscribe(self, client, user_token, add_project):
+        """Inscrição manda o status atual; outro usuário não pode se inscrever."""
+        user, token = user_token
+        add_project("pronto", user.id, ProjectStatus.READY)
+        add_project("de-outro", None)
+
+        with client.websocket_connect(f"/ws/user?token={token}") as ws:
+            ws.receive_json()
+
+            ws.send_json({"type": "subscribe", "project_id": "pronto"})
+            assert ws.receive_json() == {"type": "subscribed", "project_id": "pronto"}
+            status = ws.receive_json()
+            assert (status["type"], status["status"], status["progress"]) == ("project_status", "ready", 100)
+
+            ws.send_json({"type": "subscribe", "project_id": "de-outro"})
+            assert ws.receive_json()["type"] == "error"
+
+            ws.send_json({"type": "unsubscribe", "project_id": "pronto"})
+            assert ws.receive_json()["type"] == "unsubscribed"
+            ws.send_json({"type": "get_status", "project_id": "pronto"})
+            assert ws.receive_json()["type"] == "error"
+
+    def test_get_status_from_cache(self, client, user_token, add_project, monkeypatch):
+        """get_status responde com o último evento em cache, sem ir ao banco."""
+        user, token = user_token
+        add_project("ativo", user.id)
+        websocket_routes.status_cache.update("ativo", '{"type":"project_status","project_id":"ativo","progress":42}')
+
+        with client.websocket_connect(f"/ws/user?token={token}") as ws:
+            ws.receive_json()
+            monkeypatch.setattr(websocket_routes, "open_session", None)
+
+            ws.send_json({"type": "get_status", "project_id": "ativo"})
+            assert ws.receive_json()["progress"] == 42
+
+
+    def test_queries_run_off_event_loop(self, client, user_token, add_project, ws_db, monkeypatch):
+        """Autenticação, inscrições e status lidos do banco não devem rodar no event loop."""
+        import asyncio
+
+        user, token = user_token
+        add_project("ativo", user.id)
+
+        def open_session():
+            with pytest.raises(RuntimeError):
+                asyncio.get_running_loop()
+            return ws_db
+
+        monkeypatch.setattr(websocket_routes, "open_session", open_session)
+
+        with client.websocket_connect(f"/ws/user?token={token}") as ws:
+            assert ws.receive_json()["projects"] == ["ativo"]
+            ws.send_json({"type": "subscribe", "project_id": "ativo"})
+            assert ws.receive_json()["type"] == "subscribed"
+            assert ws.receive_json()["project_id"] == "ativo"
+
+    def test_uploaded_project_subscribable(self, client, user_token, sample_audio_bytes, temp_dir, monkeypatch):
+        """Projeto enviado com login pertence ao usuário e pode ser acompanhado por /ws/user."""
+        user, token = user_token
+        monkeypatch.setenv("STORAGE_PATH", str(temp_dir))
+
+        with patch("model.tasks.process_audio.apply_async", return_value=MagicMock(id="task-1")), \
+                patch("domain.validators.audio.AudioValidator.validate_format", return_value=(True, None)), \
+                patch("domain.validators.audio.AudioValidator.get_audio_metadata", return_value={"duration_seconds": 180}):
+            upload = client.post(
+                "/api/upload",
+                files={"file": ("song.wav", sample_audio_bytes, "audio/wav")},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        project_id = upload.json()["project_id"]
+
+        with client.websocket_connect(f"/ws/user?token={token}") as ws:
+            assert ws.receive_json()["projects"] == [project_id]
+            ws.send_json({"type": "subscribe", "project_id": project_id})
+            assert ws.receive_json() == {"type": "subscribed", "project_id": project_id}
+            status = ws.receive_json()
+            assert (status["type"], status["status"]) == ("project_status", "pending")
+
+
+class TestProjectStatusCache:
+    """Testes para o cache do último status por projeto."""
+
+    def test_lru_bounded(self):
+        """O cache descarta os projetos menos recentes."""
+        cache = ProjectStatusCache(max_size=2)
+        cache.update("p1", "1")
+        cache.update("p2", "2")
+        cache.get("p1")
+        cache.update("p3", "3")
+
+        assert cache.get("p2") is None
+        assert cache.get("p1") == "1"
+        assert len(cache) == 2
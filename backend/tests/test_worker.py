@@ -0,0 +1,99 @@
+"""
+Testes - Model Layer: Celery Worker
+
+Testa o roteamento das tarefas para as filas por tipo de carga e o
+engine do banco compartilhado pelas tarefas de cada processo.
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from model import tasks, worker
+from model.worker import celery_app, consumes_queue, QUEUE_TIME_LIMITS
+
+
+def route(task_name):
+    """Fila para a qual a tarefa é publicada."""
+    return celery_app.amqp.router.route({}, task_name)["queue"].name
+
+
+class TestQueueRouting:
+    """Testes para as filas e limites de tempo."""
+
+    @pytest.mark.parametrize("task_name, queue", [
+        ("model.tasks.process_audio", "separation"),
+        ("model.tasks.analyze_bpm", "analysis"),
+        ("model.tasks.analyze_chords", "analysis"),
+        ("model.tasks.finalize_project", "analysis"),
+        ("model.tasks.transcribe_score", "transcription"),
+        ("model.tasks.transcribe_lyrics", "transcription"),
+        ("model.tasks.cleanup_old_files", "maintenance"),
+    ])
+    def test_task_routes(self, task_name, queue):
+        """Cada tarefa deve ser publicada na fila da sua carga."""
+        assert route(task_name) == queue
+
+    def test_unrouted_tasks_use_analysis(self):
+        """Tarefas sem rota (internas do Celery) vão para a fila de análise."""
+        assert route("celery.accumulate") == "analysis"
+
+    def test_time_limits_per_queue(self):
+        """Limites de tempo devem vir da fila da tarefa."""
+        assert tasks.analyze_bpm.time_limit == QUEUE_TIME_LIMITS["analysis"]
+        assert tasks.transcribe_lyrics.time_limit == QUEUE_TIME_LIMITS["transcription"]
+        assert tasks.process_audio.soft_time_limit == QUEUE_TIME_LIMITS["separation"] - 60
+
+    def test_plan_queues(self):
+        """PRO deve ir para a fila prioritária; FREE e desconhecidos para a padrão."""
+        assert worker.queue_for_plan("pro") == "separation_priority"
+        assert worker.queue_for_plan("free") == "separation"
+        assert worker.queue_for_plan("enterprise") == "separation"
+        assert QUEUE_TIME_LIMITS["separation_priority"] == QUEUE_TIME_LIMITS["separation"]
+    
+    def test_consumes_queue(self, monkeypatch):
+        """Worker com -Q deve consumir apenas as filas selecionadas."""
+        queues = celery_app.amqp.queues
+        assert consumes_queue("separation")
+
+        monkeypatch.setattr(queues, "_consume_from", {"analysis": queues["analysis"]})
+        assert consumes_queue("analysis")
+        assert not consumes_queue("separation")
+
+
+class TestTaskEngine:
+    """Testes para o engine do banco do processo do worker."""
+
+    @pytest.fixture(autouse=True)
+    def isolated_engine(self, monkeypatch, temp_dir):
+        """Cada teste começa sem engine, com um SQLite próprio."""
+        monkeypatch.setenv("DATABASE_URL", f"sqlite:///{temp_dir / 'tasks.db'}")
+        monkeypatch.setattr(worker, "_task_engine", None)
+        monkeypatch.setattr(worker, "_task_session_factory", None)
+        monkeypatch.setattr(worker, "_worker_pool", {"concurrency": 1, "threaded": False})
+
+    def test_engine_reused_across_tasks(self):
+        """Sessões de tarefas diferentes devem usar o mesmo engine."""
+        first = worker.task_session_factory()()
+        second = worker.task_session_factory()()
+
+        assert first.get_bind() is second.get_bind()
+        first.close()
+        second.close()
+
+    def test_process_init_creates_new_engine(self):
+        """Após o fork cada processo deve criar seu próprio engine."""
+        inherited = worker.task_session_factory()().get_bind()
+
+        worker.init_worker_process_database()
+
+        assert worker.task_session_factory()().get_bind() is not inherited
+
+    def test_pool_size_follows_concurrency(self, monkeypatch):
+        """Prefork usa uma conexão por processo; threads, uma por tarefa concorrente."""
+        monkeypatch.delenv("TASK_DB_POOL_SIZE", raising=False)
+        assert worker.task_db_pool_size() == 1
+
+        worker.record_worker_pool(sender=None, instance=MagicMock(pool_cls="threads", concurrency=8))
+        assert worker.task_db_pool_size() == 8
+
+        monkeypatch.setenv("TASK_DB_POOL_SIZE", "3")
+        assert worker.task_db_pool_size() == 3
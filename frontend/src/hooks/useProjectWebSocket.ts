@@ -2,8 +2,15 @@
  * Hook useProjectWebSocket - Frontend
  * 
  * Hook para conexão WebSocket com status do projeto em tempo real.
+ * 
+ * Usuários autenticados compartilham uma única conexão (/ws/user) para
+ * todos os projetos; sem login, é aberta uma conexão por projeto. Se o
+ * servidor recusar a inscrição, o hook se reporta desconectado e a página
+ * volta ao polling.
  */
 import { useEffect, useRef, useState, useCallback } from 'react'
+import { useAuthStore } from '@/store/authStore'
+import { userSocket } from '@/services/userSocket'
 
 const WS_URL = import.meta.env.VITE_WS_URL || 'ws://localhost:8000'
 
@@ -28,7 +35,7 @@ interface UseProjectWebSocketProps {
 interface UseProjectWebSocketReturn {
     isConnected: boolean
     lastStatus: ProjectStatus | null
-    send: (message: object) => void
+    send: (message: { type: string }) => void
     reconnect: () => void
 }
 
@@ -47,9 +54,43 @@ export const useProjectWebSocket = ({
     const reconnectAttempts = useRef(0)
     const maxReconnectAttempts = 5
     const reconnectDelay = 3000
+    const accessToken = useAuthStore(state => state.accessToken)
+    const multiplexed = Boolean(accessToken)
+
+    // Conexão compartilhada do usuário
+    useEffect(() => {
+        if (!enabled || !projectId || !multiplexed) return
+
+        let rejected = false
+        const offConnection = userSocket.onConnectionChange((connected) => {
+            if (rejected) return
+            setIsConnected(connected)
+            if (connected) {
+                onConnected?.()
+            } else {
+                onDisconnected?.()
+            }
+        })
+        const unsubscribe = userSocket.subscribe(projectId, (data) => {
+            setLastStatus(data)
+            onStatusUpdate?.(data)
+        }, () => {
+            // Sem eventos deste projeto: tratar como desconectado
+            if (rejected) return
+            rejected = true
+            setIsConnected(false)
+            onDisconnected?.()
+        })
+        setIsConnected(userSocket.isConnected)
+
+        return () => {
+            unsubscribe()
+            offConnection()
+        }
+    }, [projectId, enabled, multiplexed, onStatusUpdate, onConnected, onDisconnected])
 
     const connect = useCallback(() => {
-        if (!enabled || !projectId) return
+        if (!enabled || !projectId || multiplexed) return
 
         // Limpar conexão anterior
         if (wsRef.current) {
@@ -71,7 +112,10 @@ export const useProjectWebSocket = ({
                     const data = JSON.parse(event.data) as ProjectStatus
                     console.log(`[WS] Mensagem recebida:`, data)
 
-                    if (data.type === 'project_status') {
+                    if (data.type === 'ping') {
+                        // Heartbeat do servidor
+                        ws.send(JSON.stringify({ type: 'pong' }))
+                    } else if (data.type === 'project_status') {
                         setLastStatus(data)
                         onStatusUpdate?.(data)
                     }
@@ -105,7 +149,7 @@ export const useProjectWebSocket = ({
         } catch (error) {
             console.error('[WS] Erro ao criar conexão:', error)
         }
-    }, [projectId, enabled, onStatusUpdate, onConnected, onDisconnected, onError])
+    }, [projectId, enabled, multiplexed, onStatusUpdate, onConnected, onDisconnected, onError])
 
     // Conectar automaticamente quando habilitado
     useEffect(() => {
@@ -122,11 +166,16 @@ export const useProjectWebSocket = ({
     }, [connect])
 
     // Enviar mensagem
-    const send = useCallback((message: object) => {
+    const send = useCallback((message: { type: string }) => {
+        if (multiplexed) {
+            // A conexão compartilhada cuida de ping e inscrições
+            if (message.type === 'get_status') userSocket.requestStatus(projectId)
+            return
+        }
         if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
             wsRef.current.send(JSON.stringify(message))
         }
-    }, [])
+    }, [multiplexed, projectId])
 
     // Reconectar manualmente
     const reconnect = useCallback(() => {
@@ -136,14 +185,14 @@ export const useProjectWebSocket = ({
 
     // Ping para manter conexão viva
     useEffect(() => {
-        if (!isConnected) return
+        if (!isConnected || multiplexed) return
 
         const pingInterval = setInterval(() => {
             send({ type: 'ping' })
         }, 30000) // Ping a cada 30s
 
         return () => clearInterval(pingInterval)
-    }, [isConnected, send])
+    }, [isConnected, multiplexed, send])
 
     return {
         isConnected,
@@ -10,12 +10,13 @@
  * - Chord Display (acordes em tempo real)
  * - Waveform visualization
  */
-import { useState, useEffect, useRef } from 'react'
+import { useState, useEffect, useRef, useCallback } from 'react'
 import {
     ArrowLeft, Download, Loader2, Play, Pause, Square, RotateCcw, Headphones,
     Repeat, Guitar, Waves, Zap, Music, FileText
 } from 'lucide-react'
 import { apiService } from '@/services/api'
+import { useProjectWebSocket } from '@/hooks/useProjectWebSocket'
 import { ProjectStatus, StemType, type Project, type ChordInfo } from '@/types'
 import WaveformTrack from '@/components/WaveformTrack'
 import PitchControl from '@/components/PitchControl'
@@ -67,6 +68,21 @@ export default function MixerPage({ projectId, onBack }: MixerPageProps) {
         }
     }
 
+    // Partitura é transcrita sob demanda; ao concluir, os stems MIDI/score aparecem no projeto
+    const [generatingScore, setGeneratingScore] = useState(false)
+
+    const generateScore = async () => {
+        setGeneratingScore(true)
+        try {
+            await apiService.getScore(projectId)
+            setProject(await apiService.getProjectStatus(projectId))
+        } catch (error) {
+            console.error('Erro ao gerar partitura:', error)
+        } finally {
+            setGeneratingScore(false)
+        }
+    }
+
     const fetchLyrics = async () => {
         try {
             const data = await apiService.getLyrics(projectId)
@@ -124,7 +140,23 @@ export default function MixerPage({ projectId, onBack }: MixerPageProps) {
         }
     }, [])
 
-    // Polling para verificar status
+    // Status em tempo real via WebSocket (publicado pelos workers)
+    const [statusCheck, setStatusCheck] = useState(0)
+    const handleStatusUpdate = useCallback((event: { status: string, progress: number, message: string }) => {
+        if (event.status === ProjectStatus.READY || event.status === ProjectStatus.FAILED) {
+            // Buscar stems/erro completos uma única vez
+            setStatusCheck(count => count + 1)
+        } else {
+            setProject(prev => prev ? { ...prev, progress: event.progress, message: event.message } : prev)
+        }
+    }, [])
+    const { isConnected: wsConnected } = useProjectWebSocket({
+        projectId,
+        onStatusUpdate: handleStatusUpdate,
+        enabled: loading,
+    })
+
+    // Status inicial; polling apenas enquanto o WebSocket está desconectado
     useEffect(() => {
         const checkStatus = async () => {
             try {
@@ -147,13 +179,13 @@ export default function MixerPage({ projectId, onBack }: MixerPageProps) {
         checkStatus()
 
         const interval = setInterval(() => {
-            if (loading) {
+            if (loading && !wsConnected) {
                 checkStatus()
             }
         }, 3000)
 
         return () => clearInterval(interval)
-    }, [projectId, loading])
+    }, [projectId, loading, wsConnected, statusCheck])
 
     // Buscar acordes quando o projeto estiver pronto
     useEffect(() => {
@@ -492,6 +524,15 @@ export default function MixerPage({ projectId, onBack }: MixerPageProps) {
                         </div>
                     )}
 
+                    {!project.stems?.some(s => s.type === StemType.MIDI) && (
+                        <button onClick={generateScore} disabled={generatingScore}
+                            className="flex items-center gap-2 px-4 py-3 bg-white/5 text-gray-300 font-semibold rounded-xl hover:bg-white/10 transition-all border border-white/10 disabled:opacity-50"
+                        >
+                            {generatingScore ? <Loader2 className="w-5 h-5 animate-spin text-purple-400" /> : <Zap className="w-5 h-5 text-purple-400" />}
+                            <span>{generatingScore ? 'Gerando Partitura...' : 'Gerar Partitura'}</span>
+                        </button>
+                    )}
+
                     {project.stems?.some(s => s.type === StemType.MIDI) && (
                         <button
                             onClick={() => {
@@ -15,6 +15,22 @@ const api = axios.create({
     },
 })
 
+// Análises sob demanda (acordes, letra, partitura): o backend responde 202
+// enquanto calcula; consultar de novo até o resultado ficar pronto
+const ANALYSIS_POLL_INTERVAL_MS = 3000
+const ANALYSIS_POLL_MAX_ATTEMPTS = 300
+
+async function getOnDemandAnalysis<T>(path: string): Promise<T> {
+    for (let attempt = 0; attempt < ANALYSIS_POLL_MAX_ATTEMPTS; attempt++) {
+        const response = await api.get<T>(path)
+        if (response.status !== 202) {
+            return response.data
+        }
+        await new Promise((resolve) => setTimeout(resolve, ANALYSIS_POLL_INTERVAL_MS))
+    }
+    throw new Error('Tempo esgotado aguardando a análise')
+}
+
 export const apiService = {
     /**
      * Upload de arquivo de áudio
@@ -59,15 +75,20 @@ export const apiService = {
      * Buscar acordes detectados
      */
     async getChords(projectId: string): Promise<{ chords: ChordInfo[], count: number }> {
-        const { data } = await api.get(`/chords/${projectId}`)
-        return data
+        return getOnDemandAnalysis(`/chords/${projectId}`)
     },
 
     /**
      * Buscar letra transcrita
      */
     async getLyrics(projectId: string): Promise<{ lyrics: { start: number, end: number, text: string }[], count: number }> {
-        const { data } = await api.get(`/lyrics/${projectId}`)
-        return data
+        return getOnDemandAnalysis(`/lyrics/${projectId}`)
+    },
+
+    /**
+     * Buscar links da partitura (MIDI e MusicXML)
+     */
+    async getScore(projectId: string): Promise<{ midi?: string, score?: string }> {
+        return getOnDemandAnalysis(`/score/${projectId}`)
     },
 }
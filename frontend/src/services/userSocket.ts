@@ -0,0 +1,174 @@
+/**
+ * User Socket - Frontend
+ *
+ * Conexão WebSocket única por usuário (/ws/user), compartilhada por todos
+ * os projetos acompanhados na aplicação. Cada projeto é inscrito com
+ * `subscribe` e cancelado com `unsubscribe` quando o último ouvinte sai;
+ * após reconectar, as inscrições são refeitas.
+ */
+import { useAuthStore } from '@/store/authStore'
+
+const WS_URL = import.meta.env.VITE_WS_URL || 'ws://localhost:8000'
+
+export interface ProjectStatusEvent {
+    type: string
+    project_id: string
+    status: 'pending' | 'processing' | 'ready' | 'failed'
+    progress: number
+    message: string
+    error?: string
+}
+
+type StatusListener = (event: ProjectStatusEvent) => void
+type RejectListener = (message: string) => void
+type ConnectionListener = (connected: boolean) => void
+
+class UserSocket {
+    private ws: WebSocket | null = null
+    private token: string | null = null
+    private listeners = new Map<string, Set<StatusListener>>()
+    private rejectListeners = new Map<StatusListener, RejectListener>()
+    private connectionListeners = new Set<ConnectionListener>()
+    private reconnectTimeout: ReturnType<typeof setTimeout> | null = null
+    private pingInterval: ReturnType<typeof setInterval> | null = null
+    private reconnectAttempts = 0
+    private readonly maxReconnectAttempts = 5
+    private readonly reconnectDelay = 3000
+
+    get isConnected(): boolean {
+        return this.ws?.readyState === WebSocket.OPEN
+    }
+
+    /**
+     * Acompanha um projeto; retorna a função que cancela a inscrição.
+     *
+     * `onRejected` é chamado quando o servidor recusa a inscrição (projeto
+     * de outro usuário, sem dono ou limite de projetos): o chamador deve
+     * acompanhar o projeto por polling.
+     */
+    subscribe(projectId: string, listener: StatusListener, onRejected?: RejectListener): () => void {
+        let projectListeners = this.listeners.get(projectId)
+        if (!projectListeners) {
+            projectListeners = new Set()
+            this.listeners.set(projectId, projectListeners)
+            this.send({ type: 'subscribe', project_id: projectId })
+        }
+        projectListeners.add(listener)
+        if (onRejected) this.rejectListeners.set(listener, onRejected)
+        this.ensureConnected()
+
+        return () => {
+            this.rejectListeners.delete(listener)
+            const current = this.listeners.get(projectId)
+            if (!current) return
+            current.delete(listener)
+            if (current.size === 0) {
+                this.listeners.delete(projectId)
+                this.send({ type: 'unsubscribe', project_id: projectId })
+                if (this.listeners.size === 0) this.close()
+            }
+        }
+    }
+
+    /** Último status do projeto (respondido pelo cache do servidor). */
+    requestStatus(projectId: string) {
+        this.send({ type: 'get_status', project_id: projectId })
+    }
+
+    onConnectionChange(listener: ConnectionListener): () => void {
+        this.connectionListeners.add(listener)
+        return () => {
+            this.connectionListeners.delete(listener)
+        }
+    }
+
+    private ensureConnected() {
+        const token = useAuthStore.getState().accessToken
+        if (!token) return
+
+        // Token trocado (refresh/login): reconectar com o novo
+        if (this.ws && this.token === token) return
+        this.close()
+
+        this.token = token
+        const ws = new WebSocket(`${WS_URL}/ws/user?token=${encodeURIComponent(token)}`)
+
+        ws.onopen = () => {
+            this.reconnectAttempts = 0
+            // Refazer as inscrições (o servidor só inscreve os projetos em andamento)
+            this.listeners.forEach((_, projectId) => {
+                this.send({ type: 'subscribe', project_id: projectId })
+            })
+            this.pingInterval = setInterval(() => this.send({ type: 'ping' }), 30000)
+            this.connectionListeners.forEach(listener => listener(true))
+        }
+
+        ws.onmessage = (event) => {
+            try {
+                const data = JSON.parse(event.data)
+                if (data.type === 'ping') {
+                    // Heartbeat do servidor
+                    this.send({ type: 'pong' })
+                } else if (data.type === 'project_status') {
+                    this.listeners.get(data.project_id)?.forEach(listener => listener(data))
+                } else if (data.type === 'error' && data.project_id) {
+                    // Inscrição recusada: o servidor não enviará eventos deste projeto
+                    console.warn(`[WS] Projeto ${data.project_id}: ${data.message}`)
+                    this.listeners.get(data.project_id)?.forEach(listener => {
+                        this.rejectListeners.get(listener)?.(data.message)
+                    })
+                }
+            } catch (e) {
+                console.error('[WS] Erro ao parsear mensagem:', e)
+            }
+        }
+
+        ws.onclose = (event) => {
+            // Conexão antiga substituída por close()/ensureConnected()
+            if (this.ws !== ws) return
+            this.stopPing()
+            this.ws = null
+            this.token = null
+            this.connectionListeners.forEach(listener => listener(false))
+
+            // 1008: token inválido; 1000: fechamento intencional
+            if (event.code !== 1000 && event.code !== 1008 && this.listeners.size > 0
+                && this.reconnectAttempts < this.maxReconnectAttempts) {
+                this.reconnectAttempts++
+                this.reconnectTimeout = setTimeout(() => this.ensureConnected(), this.reconnectDelay)
+            }
+        }
+
+        this.ws = ws
+    }
+
+    private send(message: object) {
+        if (this.isConnected) {
+            this.ws!.send(JSON.stringify(message))
+        }
+    }
+
+    private stopPing() {
+        if (this.pingInterval) {
+            clearInterval(this.pingInterval)
+            this.pingInterval = null
+        }
+    }
+
+    private close() {
+        if (this.reconnectTimeout) {
+            clearTimeout(this.reconnectTimeout)
+            this.reconnectTimeout = null
+        }
+        this.stopPing()
+        if (this.ws) {
+            this.ws.close(1000)
+            this.ws = null
+            this.token = null
+        }
+    }
+}
+
+export const userSocket = new UserSocket()
+
+export default userSocket
@@ -25,6 +25,13 @@ export interface StemInfo {
     size_mb?: number
 }
 
+export interface QueueInfo {
+    plan: 'free' | 'pro'
+    position: number
+    jobs_ahead: number
+    estimated_wait_seconds: number
+}
+
 export interface Project {
     project_id: string
     status: ProjectStatus
@@ -32,6 +39,7 @@ export interface Project {
     message?: string
     error?: string
     stems?: StemInfo[]
+    queue?: QueueInfo
     created_at: string
 }
 